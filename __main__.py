@@ -1,5 +1,7 @@
 import os
 import logging
+import argparse
+import subprocess
 from django.core.wsgi import get_wsgi_application
 import discord
 import json
@@ -8,14 +10,46 @@ import sys
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
 # Ensure settings are read
 application = get_wsgi_application()
-from discord_handler.handler import removeOldChannels,Scheduler
+from discord_handler.handler import removeOldChannels,Scheduler,setupDiscordBridge,forwardEmojis,updateServerEmojis
 from discord_handler.cdos import cmdHandler
+from discord_handler.cdo_meta import loadCommandoCaches
 from loghandler.loghandler import setup_logging
 from discord_handler.client import client
+from support.helper import loopLagMonitor
+from discord_handler.livePoller import livePoller
+from discord_handler.messageQueue import messageQueue
+from discord_handler.jobScheduler import jobScheduler
+from discord_handler.channelRegistry import ChannelRegistry
+from discord_handler.guildRouting import GuildRouting
+from discord_handler.scoreboard import Scoreboards
+from discord_handler.bridge import bridge
+from discord_handler.coordinator import coordinator, Coordinator, DatabaseLeaseStore
+from database.executor import runDB
 
 
+argParser = argparse.ArgumentParser(description="Soccerbot")
+argParser.add_argument("--split", action="store_true",
+                       help="Runs the live poller in a separate process (poller.py), this process only talks to discord")
+argParser.add_argument("--coordinate", action="store_true",
+                       help="Shares the competitions with the other nodes running on the same database")
+args = argParser.parse_args()
+if args.split and args.coordinate:
+    argParser.error("--coordinate is only available in the single process mode")
+if args.coordinate:
+    coordinator.store = DatabaseLeaseStore()
+
 setup_logging()
 logger = logging.getLogger(__name__)
+path = os.path.dirname(os.path.realpath(__file__))
+bridgePath = path + "/poller.sock"
+pollerProcess = None
+
+def updateEmojis():
+    """
+    Compiles the stylesheets against the emojis of all servers
+    """
+    updateServerEmojis(dict((i.name, str(i)) for i in client.get_all_emojis()))
+
 
 @client.event
 async def on_ready():
@@ -24,29 +58,94 @@ async def on_ready():
     :return:
     """
     logger.info(f"Logged in as {client.user.name} with id {client.user.id}")
-    logger.debug("Removing all channels")
-    await removeOldChannels()
+    loopLagMonitor.start(client.loop)
+    messageQueue.start(client.loop)
+    ChannelRegistry.rebuild(client.servers)
+    updateEmojis()
+    await runDB(loadCommandoCaches)
+    if not coordinator.enabled:
+        # with several nodes, the channels of the other nodes are still in use
+        logger.debug("Removing all channels")
+        await removeOldChannels()
+    if args.split:
+        await startPollerProcess()
+        return
     logger.debug("Starting maintanance scheduler")
     client.loop.create_task(Scheduler.maintananceScheduler())
     logger.debug("Starting matchScheduler")
     client.loop.create_task(Scheduler.matchScheduler())
+    logger.debug("Starting live poller")
+    livePoller.start(client.loop)
+    logger.debug("Starting job scheduler")
+    jobScheduler.start(client.loop)
     logger.info("Update complete")
 
 
+async def startPollerProcess():
+    """
+    Starts the poller process of the multi process mode and waits for its events on the bridge.
+    """
+    global pollerProcess
+    await runDB(Scoreboards.load)
+    await runDB(GuildRouting.load, dict((i.name, i.id) for i in list(client.servers)))
+    if bridge.server is None:
+        if os.path.exists(bridgePath):
+            os.remove(bridgePath)
+        setupDiscordBridge()
+        await bridge.serve(bridgePath, onConnect=forwardEmojis)
+    if pollerProcess is None or pollerProcess.poll() is not None:
+        logger.info("Starting poller process")
+        pollerProcess = subprocess.Popen([sys.executable, path + "/poller.py", bridgePath])
+    logger.info("Update complete")
+
+
+@client.event
+async def on_channel_create(channel : discord.Channel):
+    ChannelRegistry.add(channel)
+
+
+@client.event
+async def on_channel_delete(channel : discord.Channel):
+    ChannelRegistry.remove(channel)
+
+
+@client.event
+async def on_channel_update(before : discord.Channel, after : discord.Channel):
+    ChannelRegistry.update(before, after)
+
+
+@client.event
+async def on_server_join(server : discord.Server):
+    ChannelRegistry.addServer(server)
+    updateEmojis()
+
+
+@client.event
+async def on_server_remove(server : discord.Server):
+    ChannelRegistry.removeServer(server)
+    updateEmojis()
+
+
+@client.event
+async def on_server_emojis_update(before : list, after : list):
+    updateEmojis()
+
+
 @client.event
 async def on_message(message : discord.Message):
     """
-    All messages are directly handled by cmdHandler
+    All messages are directly handled by cmdHandler. With several nodes only the one owning the commands answers.
     :param message:
     :return:
     """
+    if not coordinator.ownsDuty(Coordinator.commandsDuty):
+        return
     try:
         await cmdHandler(message)
     except discord.errors.HTTPException:
         pass
 
 logger.info("------------------Soccerbot is starting-----------------------")
-path = os.path.dirname(os.path.realpath(__file__))
 
 #secret file contains secret of bot as well as other stuff (masterUser)
 try:
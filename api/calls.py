@@ -1,11 +1,21 @@
 import requests
+from requests.adapters import HTTPAdapter
+import aiohttp
+import asyncio
 import json
-from typing import Dict, List, Callable, Union
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Dict, List, Callable, Union, Iterator, Iterable
 from dateutil import parser
 from pytz import utc
 
 from database.models import Federation,Competition,Association,Match,Season,Team
 
+logger = logging.getLogger(__name__)
+
 
 class ApiCalls:
     """
@@ -45,32 +55,401 @@ def loop(func: Callable, reqList: List) -> List:
     return returnList
 
 
+def streamLoop(func: Callable, reqIterable: Iterable) -> Iterator:
+    """
+    Streaming version of loop. Parses every result of the given iterable with func as soon as it is available,
+    without holding the full list in memory.
+    :param func: This function is called within the iteration. It should return the proper model object
+    :param reqIterable: Iterable of result dicts, usually from makePagedAPICall
+    :return: Generator yielding model objects from django models
+    """
+    for resDict in reqIterable:
+        yield func(resDict=resDict)
+
+
+def parseAPIContent(content: bytes) -> Union[List, Dict]:
+    """
+    Parses the raw content of an API response. Returns the Results list if available, otherwise the full document
+    :param content: Raw content of the response
+    :return: List or dict containing the data
+    """
+    try:
+        return json.loads(content.decode())['Results']
+    except (KeyError, TypeError) as e:
+        return json.loads(content.decode())
+
+
+def parseMiddlewareContent(content: bytes) -> Dict:
+    """
+    Parses the raw content of a middleware response, which is wrapped in a javascript callback.
+    :param content: Raw content of the response
+    :return: Dictionary containing data
+    """
+    return json.loads(content.decode().replace("_matchInfoCallBack", "").replace("(", "").replace(")", ""))
+
+
+class CountingConnector(aiohttp.TCPConnector):
+    """
+    TCPConnector that counts the connections it had to open, used for the pool statistics of the async session
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.createdConnections = 0
+
+    async def _create_connection(self, req):
+        self.createdConnections += 1
+        return await super()._create_connection(req)
+
+
+class SessionManager:
+    """
+    Holds the pooled keep-alive sessions used for all calls to api.fifa.com and data.fifa.com. There is one requests
+    session for the synchronous calls and one aiohttp session for the async calls, both are created lazily. Use
+    configure to change the pool settings, this closes the existing sessions.
+    """
+    poolSize = 10
+    keepAlive = 30
+    connectTimeout = 5
+    readTimeout = 30
+    headers = {
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    }
+
+    syncSession = None
+    asyncSession = None
+    asyncRequests = 0
+
+    @staticmethod
+    def configure(poolSize: int = None, keepAlive: int = None, connectTimeout: float = None,
+                  readTimeout: float = None):
+        """
+        Sets the pool settings. All parameters that are None keep their current value.
+        :param poolSize: Maximum number of connections per host
+        :param keepAlive: Seconds an idle connection is kept open (async session)
+        :param connectTimeout: Timeout for establishing a connection in seconds
+        :param readTimeout: Timeout for reading the response in seconds
+        """
+        if poolSize != None:
+            SessionManager.poolSize = poolSize
+        if keepAlive != None:
+            SessionManager.keepAlive = keepAlive
+        if connectTimeout != None:
+            SessionManager.connectTimeout = connectTimeout
+        if readTimeout != None:
+            SessionManager.readTimeout = readTimeout
+        SessionManager.close()
+
+    @staticmethod
+    def session() -> requests.Session:
+        """
+        Returns the pooled requests session, creating it if necessary
+        """
+        if SessionManager.syncSession is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=SessionManager.poolSize)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update(SessionManager.headers)
+            SessionManager.syncSession = session
+        return SessionManager.syncSession
+
+    @staticmethod
+    def getAsyncSession() -> aiohttp.ClientSession:
+        """
+        Returns the pooled aiohttp session. The session is bound to an event loop, so a new one is created if the
+        current loop differs from the one the session was created on.
+        """
+        loop = asyncio.get_event_loop()
+        session = SessionManager.asyncSession
+        if session is None or session.closed or session._loop is not loop:
+            connector = CountingConnector(limit=SessionManager.poolSize, keepalive_timeout=SessionManager.keepAlive,
+                                          conn_timeout=SessionManager.connectTimeout, loop=loop)
+            SessionManager.asyncSession = aiohttp.ClientSession(connector=connector, headers=SessionManager.headers,
+                                                                loop=loop)
+            SessionManager.asyncRequests = 0
+        return SessionManager.asyncSession
+
+    @staticmethod
+    def timeout():
+        """
+        Timeout tuple for the requests session
+        """
+        return (SessionManager.connectTimeout, SessionManager.readTimeout)
+
+    @staticmethod
+    def close():
+        """
+        Closes both sessions and their pools. They are recreated on the next call.
+        """
+        if SessionManager.syncSession is not None:
+            SessionManager.syncSession.close()
+            SessionManager.syncSession = None
+        if SessionManager.asyncSession is not None and not SessionManager.asyncSession.closed:
+            SessionManager.asyncSession.close()
+        SessionManager.asyncSession = None
+        SessionManager.asyncRequests = 0
+
+    @staticmethod
+    def poolStatistics() -> Dict[str, Dict]:
+        """
+        Statistics for both connection pools. requests is the number of requests made, connections the number of
+        connections that had to be opened for them, reuseRatio the share of requests that were served by an already
+        open connection and openConnections the number of connections currently held by the pool.
+        :return: Dictionary with the statistics for the sync and async session
+        """
+        def stats(requestCount, connectionCount, openConnections):
+            return {
+                'requests': requestCount,
+                'connections': connectionCount,
+                'reuseRatio': 0.0 if requestCount == 0 else max(0.0, 1 - connectionCount / requestCount),
+                'openConnections': openConnections,
+            }
+
+        requestCount = connectionCount = openConnections = 0
+        if SessionManager.syncSession is not None:
+            for adapter in set(SessionManager.syncSession.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools[key]
+                    requestCount += pool.num_requests
+                    connectionCount += pool.num_connections
+                    openConnections += len([i for i in list(pool.pool.queue) if i is not None])
+        syncStats = stats(requestCount, connectionCount, openConnections)
+
+        requestCount = connectionCount = openConnections = 0
+        session = SessionManager.asyncSession
+        if session is not None and not session.closed:
+            connector = session.connector
+            requestCount = SessionManager.asyncRequests
+            connectionCount = connector.createdConnections
+            openConnections = sum(len(i) for i in connector._conns.values()) + \
+                              sum(len(i) for i in connector._acquired.values())
+        asyncStats = stats(requestCount, connectionCount, openConnections)
+
+        return {'sync': syncStats, 'async': asyncStats}
+
+
 def makeAPICall(keyword: str, payload: Dict = None) -> Union[List, Dict]:
     """
-    Makes a call to the API using the requests library. Returns the machine
+    Makes a call to the API using the pooled requests session. Returns the machine
     readable result for further processing
     :param keyword: API keyword from ApiCalls, appended to ApiCalls.api_home
     :param payload: parameters for the API call
     :return: List or dict containing the data
     """
     params = payload if payload != None else {}
-    req = requests.get(ApiCalls.api_home + keyword, params=params)
-    try:
-        return json.loads(req.content.decode())['Results']
-    except (KeyError, TypeError) as e:
-        return json.loads(req.content.decode())
+    req = SessionManager.session().get(ApiCalls.api_home + keyword, params=params, timeout=SessionManager.timeout())
+    return parseAPIContent(req.content)
 
 def makeMiddlewareCall(keyword: str, payload: Dict = None) -> Dict:
     """
-    Makes a call to FIFA middleware using requests library. Returns the machine readable
+    Makes a call to FIFA middleware using the pooled requests session. Returns the machine readable
     result for further processing
     :param keyword: Keyword for middleware
     :param payload: parameter for request
     :return: Dictionary containing data
     """
     params = payload if payload != None else {}
-    req = requests.get(DataCalls.data_home + keyword, params=params)
-    return json.loads(req.content.decode().replace("_matchInfoCallBack", "").replace("(", "").replace(")", ""))
+    req = SessionManager.session().get(DataCalls.data_home + keyword, params=params,
+                                       timeout=SessionManager.timeout())
+    return parseMiddlewareContent(req.content)
+
+
+async def asyncFetch(url: str, params: Dict) -> bytes:
+    """
+    Fetches the raw content of a given url with the pooled aiohttp session, without blocking the event loop.
+    :param url: Full url of the request
+    :param params: parameters for the request
+    :return: Raw content of the response
+    """
+    session = SessionManager.getAsyncSession()
+    SessionManager.asyncRequests += 1
+    async with session.get(url, params=params,
+                           timeout=SessionManager.connectTimeout + SessionManager.readTimeout) as resp:
+        return await resp.read()
+
+
+async def asyncMakeAPICall(keyword: str, payload: Dict = None) -> Union[List, Dict]:
+    """
+    Async version of makeAPICall, using aiohttp. Should be used from within coroutines.
+    :param keyword: API keyword from ApiCalls, appended to ApiCalls.api_home
+    :param payload: parameters for the API call
+    :return: List or dict containing the data
+    """
+    params = payload if payload != None else {}
+    content = await asyncFetch(ApiCalls.api_home + keyword, params)
+    return parseAPIContent(content)
+
+
+async def asyncMakeMiddlewareCall(keyword: str, payload: Dict = None) -> Dict:
+    """
+    Async version of makeMiddlewareCall, using aiohttp. Should be used from within coroutines.
+    :param keyword: Keyword for middleware
+    :param payload: parameter for request
+    :return: Dictionary containing data
+    """
+    params = payload if payload != None else {}
+    content = await asyncFetch(DataCalls.data_home + keyword, params)
+    return parseMiddlewareContent(content)
+
+
+class PagedCalls:
+    """
+    Settings for paginated API calls. The API returns at most pageSize results per call together with a
+    ContinuationToken for the next page. Pages are requested on a shared executor, which bounds the number of
+    page requests that run at the same time.
+    """
+    pageSize = 1000
+    parallelism = 4
+    executor = None
+
+    @staticmethod
+    def getExecutor() -> ThreadPoolExecutor:
+        if PagedCalls.executor is None:
+            PagedCalls.executor = ThreadPoolExecutor(max_workers=PagedCalls.parallelism)
+        return PagedCalls.executor
+
+    @staticmethod
+    def configure(pageSize: int = None, parallelism: int = None):
+        """
+        Sets the page size and the maximum number of parallel page requests
+        """
+        if pageSize != None:
+            PagedCalls.pageSize = pageSize
+        if parallelism != None:
+            PagedCalls.parallelism = parallelism
+            if PagedCalls.executor is not None:
+                PagedCalls.executor.shutdown(wait=False)
+                PagedCalls.executor = None
+
+
+def makeAPIPageCall(keyword: str, payload: Dict) -> Dict:
+    """
+    Makes a call to the API and returns the full document, including the continuation token
+    :param keyword: API keyword from ApiCalls, appended to ApiCalls.api_home
+    :param payload: parameters for the API call
+    :return: Dictionary containing the page
+    """
+    req = SessionManager.session().get(ApiCalls.api_home + keyword, params=payload, timeout=SessionManager.timeout())
+    return json.loads(req.content.decode())
+
+
+def makePagedAPICall(keyword: str, payload: Dict = None) -> Iterator[Dict]:
+    """
+    Reads all pages of an API call by following the ContinuationToken and yields the results one by one. The next
+    page is already requested on the PagedCalls executor while the results of the current one are consumed.
+    :param keyword: API keyword from ApiCalls, appended to ApiCalls.api_home
+    :param payload: parameters for the API call. count is set to PagedCalls.pageSize if not given.
+    :return: Generator yielding the result dicts of all pages
+    """
+    params = dict(payload) if payload != None else {}
+    params.setdefault('count', PagedCalls.pageSize)
+    executor = PagedCalls.getExecutor()
+    seenTokens = set()
+
+    nextPage = executor.submit(makeAPIPageCall, keyword, params)
+    while nextPage is not None:
+        page = nextPage.result()
+        nextPage = None
+        if not isinstance(page, dict):
+            return
+        results = page.get('Results') or []
+        token = page.get('ContinuationToken')
+
+        if token and results:
+            if token in seenTokens:
+                logger.warning(f"ContinuationToken for {keyword} repeated, stopping")
+            else:
+                seenTokens.add(token)
+                nextPage = executor.submit(makeAPIPageCall, keyword, dict(params, continuationToken=token))
+
+        for resDict in results:
+            yield resDict
+
+
+class LiveDataCache:
+    """
+    Cache for the live documents of the middleware (DataCalls.liveData), keyed by match id. Entries expire after
+    ttl seconds, callers polling more often pass their poll interval as maximum age. The least recently used entries
+    are dropped once maxSize is reached. Concurrent callers for the same match share one in flight request.
+    """
+    def __init__(self, ttl: float = 20, maxSize: int = 256, clock: Callable = time.monotonic):
+        self.ttl = ttl
+        self.maxSize = maxSize
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.inFlight = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    async def get(self, matchID: int, maxAge: float = None) -> Dict:
+        """
+        Returns the live document for a given match, either from the cache or from the middleware
+        :param matchID: Id of the match
+        :param maxAge: Seconds a cached document may be old, e.g. the poll interval of the match. At most ttl.
+        :return: Dictionary containing data
+        """
+        entry = self.entries.get(matchID)
+        if entry is not None:
+            fetched, data = entry
+            if self.clock() - fetched < (self.ttl if maxAge is None else min(maxAge, self.ttl)):
+                self.entries.move_to_end(matchID)
+                self.hits += 1
+                return data
+            del self.entries[matchID]
+
+        future = self.inFlight.get(matchID)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.ensure_future(self.fetch(matchID))
+        self.inFlight[matchID] = future
+        return await asyncio.shield(future)
+
+    async def fetch(self, matchID: int) -> Dict:
+        """
+        Requests the document from the middleware and stores it, dropping the oldest entries if necessary
+        """
+        try:
+            data = await asyncMakeMiddlewareCall(DataCalls.liveData + f"/{matchID}")
+        finally:
+            del self.inFlight[matchID]
+        self.entries[matchID] = (self.clock(), data)
+        self.entries.move_to_end(matchID)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+        return data
+
+    def invalidate(self, matchID: int):
+        """
+        Removes a match from the cache, the next get will fetch it again
+        :param matchID: Id of the match
+        """
+        self.entries.pop(matchID, None)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def statistics(self) -> Dict[str, int]:
+        """
+        hits are answered from the cache, misses needed a request and shared waited on the request of another caller
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'size': len(self.entries),
+        }
+
+
+liveDataCache = LiveDataCache()
 
 
 def getAllFederations(**kwargs) -> Union[List, Federation]:
@@ -81,13 +460,12 @@ def getAllFederations(**kwargs) -> Union[List, Federation]:
     with empty kwargs starts the loop, the same function will be called again to
     actually parse the result.
     :param kwargs: Empty or resDict from loop
-    :return: Full List of Federation objects or single Federation object.
+    :return: Generator of all Federation objects or single Federation object.
     """
     if len(kwargs.keys()) == 0:
-        reqDict = makeAPICall(ApiCalls.federations)
-        retList =  loop(getAllFederations, reqDict)
-        retList.append(Federation(id="FIFA",clear_name="Fédération Internationale de Football Association"))
-        return retList
+        reqIter = makePagedAPICall(ApiCalls.federations)
+        return chain(streamLoop(getAllFederations, reqIter),
+                     [Federation(id="FIFA",clear_name="Fédération Internationale de Football Association")])
 
     elif 'resDict' in kwargs.keys() and len(kwargs.keys()) == 1:
         apiResults = kwargs['resDict']
@@ -107,21 +485,15 @@ def getAllCountries(**kwargs) -> Union[List, Association]:
     with empty kwargs starts the loop, the same function will be called again to
     actually parse the result.
     :param kwargs: Empty or resDict from loop
-    :return: Full List of Country objects or single Country object.
+    :return: Generator of all Country objects or single Country object.
     """
     if len(kwargs.keys()) == 0:
         payload = {
-            'count': 1000
+            'count': PagedCalls.pageSize
         }
-        reqDict = makeAPICall(ApiCalls.countries, payload=payload)
-        returnList = loop(getAllCountries, reqDict)
-        federationList = getAllFederations()
-
-        for fed in federationList:
-            returnList.append(Association(id=fed.id, clear_name=fed.clear_name))
-
-        return returnList
-
+        reqIter = makePagedAPICall(ApiCalls.countries, payload=payload)
+        federationAssociations = (Association(id=fed.id, clear_name=fed.clear_name) for fed in getAllFederations())
+        return chain(streamLoop(getAllCountries, reqIter), federationAssociations)
 
     elif 'resDict' in kwargs.keys() and len(kwargs.keys()) == 1:
         apiResults = kwargs['resDict']
@@ -141,16 +513,16 @@ def getAllCompetitions(**kwargs) -> Union[List, Competition]:
     with empty kwargs starts the loop, the same function will be called again to
     actually parse the result.
     :param kwargs: Either idFederation (Identifier for federation) or resDict from loop
-    :return: Full List of Competition objects or single Competition object.
+    :return: Generator of all Competition objects or single Competition object.
     """
     if 'idFederation' in kwargs.keys() and len(kwargs.keys()) == 1:
         payload = {
             'owner': kwargs['idFederation'],
-            'count': 1000,
+            'count': PagedCalls.pageSize,
             'footballType': 0
         }
-        reqDict = makeAPICall(ApiCalls.competitions, payload)
-        return loop(getAllCompetitions, reqDict)
+        reqIter = makePagedAPICall(ApiCalls.competitions, payload)
+        return streamLoop(getAllCompetitions, reqIter)
 
     elif 'resDict' in kwargs.keys() and len(kwargs.keys()) == 1:
         apiResults = kwargs['resDict']
@@ -182,15 +554,15 @@ def getAllSeasons(**kwargs) -> Union[List, Season]:
     with empty kwargs starts the loop, the same function will be called again to
     actually parse the result.
     :param kwargs: Either idCompetitions (Identifier for the competition) or resDict from loop
-    :return: Full list of Season objects or single Season object
+    :return: Generator of all Season objects or single Season object
     """
     if 'idCompetitions' in kwargs.keys() and len(kwargs.keys()) == 1:
         payload = {
             'idCompetition': kwargs['idCompetitions'],
-            'count': 1000
+            'count': PagedCalls.pageSize
         }
-        reqDict = makeAPICall(ApiCalls.seasons, payload)
-        return loop(getAllSeasons, reqDict)
+        reqIter = makePagedAPICall(ApiCalls.seasons, payload)
+        return streamLoop(getAllSeasons, reqIter)
     elif 'resDict' in kwargs.keys() and len(kwargs.keys()) == 1:
         apiResults = kwargs['resDict']
         return Season(
@@ -207,21 +579,20 @@ def getAllSeasons(**kwargs) -> Union[List, Season]:
 
 def getAllTeams(**kwargs) -> Union[List, Team]:
     """
-    Gets 1000 teams from the API
+    Gets all teams from the API, page by page
 
     Structurally the same as all other initialize API functions. The initial call
     with empty kwargs starts the loop, the same function will be called again to
     actually parse the result.
     :param kwargs: Either empty or resDict from loop
-    :return: Full list of Team objects, or single Team object
-    :todo: this could probably be removed and simply call getSpecificTeam in updateDB
+    :return: Generator of all Team objects, or single Team object
     """
     if len(kwargs.keys()) == 0:
         payload = {
-            'count': 1000
+            'count': PagedCalls.pageSize
         }
-        reqDict = makeAPICall(ApiCalls.teams, payload=payload)
-        return loop(getAllTeams, reqDict)
+        reqIter = makePagedAPICall(ApiCalls.teams, payload=payload)
+        return streamLoop(getAllTeams, reqIter)
     elif 'resDict' in kwargs.keys() and len(kwargs.keys()) == 1:
         apiResults = kwargs['resDict']
         return Team(
@@ -236,22 +607,22 @@ def getAllTeams(**kwargs) -> Union[List, Team]:
 
 def getAllMatches(**kwargs) -> Union[List, Match]:
     """
-    Gets 1000 matches from the API
+    Gets all matches of a season from the API, page by page
 
     Structurally the same as all other initialize API functions. The initial call
     with empty kwargs starts the loop, the same function will be called again to
     actually parse the result.
     :param kwargs: either idCompetitions and id Season or resDict from loop
-    :return: Full List of Match objects, or single Match object
+    :return: Generator of all Match objects, or single Match object
     """
     if 'idCompetitions' in kwargs.keys() and 'idSeason' in kwargs.keys() and len(kwargs.keys()) == 2:
         payload = {
             'idCompetition': kwargs['idCompetitions'],
             'idSeason': kwargs['idSeason'],
-            'count': 1000
+            'count': PagedCalls.pageSize
         }
-        reqDict = makeAPICall(ApiCalls.matches, payload)
-        return loop(getAllMatches, reqDict)
+        reqIter = makePagedAPICall(ApiCalls.matches, payload)
+        return streamLoop(getAllMatches, reqIter)
     elif 'resDict' in kwargs.keys() and len(kwargs.keys()) == 1:
         apiResults = kwargs['resDict']
         match = Match(
@@ -299,25 +670,45 @@ def getSpecificTeam(teamID: int) -> Team:
         short_name=apiResults['ShortClubName']
     )
 
-def getLiveMatches(competitionID : int = None, teamID : int = None) -> List[int]:
+def liveMatchesPayload(competitionID: int = None, teamID: int = None) -> Dict:
     """
-    Returns all match ids for a given competition that is currently running.
+    Creates the payload for the live matches call
     :param competitionID: Competition id
-    :return:
+    :param teamID: Team id
+    :return: payload dictionary
     """
     payload = {}
     if competitionID != None:
         payload["idCompetition"] = competitionID
     if teamID != None:
         payload["idTeam"] = teamID
+    return payload
 
-    reqDict = makeAPICall(ApiCalls.live,payload=payload)
-    resultList = []
-    for i in reqDict:
-        resultList.append(int(i['IdMatch']))
-    return resultList
+def getLiveMatches(competitionID : int = None, teamID : int = None) -> List[int]:
+    """
+    Returns all match ids for a given competition that is currently running.
+    :param competitionID: Competition id
+    :return:
+    """
+    reqDict = makeAPICall(ApiCalls.live,payload=liveMatchesPayload(competitionID, teamID))
+    return [int(i['IdMatch']) for i in reqDict]
+
+async def asyncGetLiveMatches(competitionID : int = None, teamID : int = None) -> List[int]:
+    """
+    Async version of getLiveMatches
+    :param competitionID: Competition id
+    :param teamID: Team id
+    :return: List of match ids
+    """
+    reqDict = await asyncMakeAPICall(ApiCalls.live,payload=liveMatchesPayload(competitionID, teamID))
+    return [int(i['IdMatch']) for i in reqDict]
 
 def getTeamsSearchedByName(name : str) -> List:
     payload = {"name":name}
     reqDict = makeAPICall(ApiCalls.teamSearch,payload=payload)
     return reqDict
+
+async def asyncGetTeamsSearchedByName(name : str) -> List:
+    payload = {"name":name}
+    reqDict = await asyncMakeAPICall(ApiCalls.teamSearch,payload=payload)
+    return reqDict
@@ -0,0 +1,136 @@
+"""
+Throughput of the single process mode against the multi process mode. Every match polls its live document (a json
+string, decoded like a response of the api), diffs the events and renders the new ones. In the single process mode
+all of it runs on the loop of the discord process, in the multi process mode a poller process does it and forwards
+the embeds over the bridge, the discord process only rebuilds them. Besides the events/sec reaching the discord
+process, a LoopLagMonitor measures how long its loop (which also keeps the gateway alive) was blocked.
+
+    python -m benchmarks.bench_bridge --matches 10 50 --events 200
+"""
+import argparse
+import asyncio
+import copy
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.bench_parse_events import matchFeed, path
+from benchmarks.common import printTable
+from discord import Embed
+from discord_handler.bridge import Bridge
+from discord_handler.liveMatch import EventTracker, LiveMatch, MatchState
+from discord_handler.messageQueue import MessagePriority
+from support.helper import LoopLagMonitor
+
+benchMatch = type("Match", (), {"competition": type("Competition", (), {"clear_name": "Bench League"})})
+
+
+def matchDocuments(eventCount: int, pollsPerEvent: int) -> list:
+    """
+    Returns the live documents of every poll of a match as json strings.
+    """
+    with open(path, encoding="utf-8") as f:
+        document = json.loads(f.read())
+    documents = []
+    for events in matchFeed(eventCount, pollsPerEvent):
+        data = copy.deepcopy(document)
+        data["match"]["events"] = events
+        documents.append(json.dumps(data))
+    return documents
+
+
+async def pollMatch(documents: list, publish):
+    tracker = EventTracker()
+    for document in documents:
+        data = json.loads(document)["match"]
+        events = tracker.update(data["events"])
+        if events != []:
+            state = MatchState.fromLiveData(data)
+            rendered = [(i,) + LiveMatch.beautifyEvent(i, state)[:2] for i in events]
+            publish(LiveMatch.eventEmbeds(benchMatch, rendered, False))
+        # the next poll of any match may run
+        await asyncio.sleep(0)
+
+
+async def runSingle(matches: int, documents: list):
+    counter = {'events': 0}
+
+    def publish(embeds):
+        counter['events'] += len(embeds)
+
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[pollMatch(documents, publish) for i in range(matches)])
+    duration = time.perf_counter() - start
+    monitor.stop()
+    return counter['events'], duration, monitor.statistics()
+
+
+def pollerProcess(bridgePath: str, matches: int, documents: list):
+    async def run():
+        poller = Bridge()
+        await poller.connect(bridgePath)
+
+        def publish(embeds):
+            poller.send("post", embeds=[(embObj.to_dict(), int(priority)) for embObj, priority in embeds])
+
+        await asyncio.gather(*[pollMatch(documents, publish) for i in range(matches)])
+        poller.send("done")
+        await poller.drain()
+        poller.close()
+
+    # the forked process must not reuse the running loop of the discord process
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(run())
+
+
+async def runSplit(matches: int, documents: list):
+    counter = {'events': 0}
+    done = asyncio.Event()
+
+    def post(embeds):
+        for data, priority in embeds:
+            Embed.from_data(data)
+            MessagePriority(priority)
+            counter['events'] += 1
+
+    bridgePath = tempfile.mktemp(suffix=".sock")
+    discord = Bridge()
+    discord.on("post", post)
+    discord.on("done", done.set)
+    await discord.serve(bridgePath)
+
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    start = time.perf_counter()
+    process = multiprocessing.Process(target=pollerProcess, args=(bridgePath, matches, documents))
+    process.start()
+    await done.wait()
+    duration = time.perf_counter() - start
+    monitor.stop()
+    process.join()
+    discord.close()
+    os.remove(bridgePath)
+    return counter['events'], duration, monitor.statistics()
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description=__doc__)
+    argParser.add_argument("--matches", type=int, nargs="+", default=[10, 50])
+    argParser.add_argument("--events", type=int, default=200)
+    argParser.add_argument("--pollsPerEvent", type=int, default=3)
+    args = argParser.parse_args()
+
+    documents = matchDocuments(args.events, args.pollsPerEvent)
+    loop = asyncio.get_event_loop()
+    rows = []
+    for matches in args.matches:
+        for label, runner in [("single process", runSingle), ("poller process", runSplit)]:
+            events, duration, lag = loop.run_until_complete(runner(matches, documents))
+            rows.append([matches, label, events, f"{duration:.2f}", f"{events / duration:.0f}",
+                         f"{lag['maxLag'] * 1000:.1f}", f"{lag['blocked']:.2f}"])
+    printTable(["matches", "mode", "events", "duration (s)", "events/s", "max lag (ms)", "blocked (s)"], rows)
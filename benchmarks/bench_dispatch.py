@@ -0,0 +1,67 @@
+"""
+Messages/sec of the commando dispatch on a chat heavy server, where only a small share of the messages are
+commandos. The scan reads the prefix from the database and tests every commando with startswith for every message
+(the dispatch before the CommandoIndex), the index keeps the prefix in memory and looks up the first token. Only
+the dispatch is measured, the commandos aren't run.
+
+    python -m benchmarks.bench_dispatch --messages 20000 --commandShare 0.02 0.2
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import setupDjango, printTable
+
+chatLines = ["good game", "what a goal!", "!!! penalty !!!", "anyone watching the derby?", "ref is blind",
+             "!scoresXYZ", "lol", "see you at the stadium", "!scoreboards are great", "2-1 incoming"]
+commandLines = ["!scores Bundesliga", "!currentGames", "!upcomingGames Serie A", "!help", "!monitoredCompetitions"]
+
+
+def messages(count: int, commandShare: float) -> list:
+    rand = random.Random(0)
+    return [rand.choice(commandLines) if rand.random() < commandShare else rand.choice(chatLines)
+            for i in range(count)]
+
+
+def scanDispatch(content: str):
+    from discord_handler.cdo_meta import DiscordCommando, getPrefix
+
+    prefix = getPrefix()
+    for cdos in DiscordCommando.allCommandos():
+        if content.startswith(prefix + cdos.commando):
+            return cdos
+
+
+def indexDispatch(content: str):
+    from discord_handler.cdo_meta import CommandoIndex
+
+    return CommandoIndex.resolve(content, CommandoIndex.prefix)
+
+
+def run(dispatch, contents: list):
+    start = time.perf_counter()
+    dispatched = sum(1 for i in contents if dispatch(i) is not None)
+    return dispatched, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description=__doc__)
+    argParser.add_argument("--messages", type=int, default=20000)
+    argParser.add_argument("--commandShare", type=float, nargs="+", default=[0.02, 0.2])
+    args = argParser.parse_args()
+
+    setupDjango()
+    from database.models import Settings
+    from discord_handler.cdo_meta import CommandoIndex
+    import discord_handler.cdos
+
+    Settings(name="prefix", value="!").save()
+    CommandoIndex.loadPrefix()
+    rows = []
+    for commandShare in args.commandShare:
+        contents = messages(args.messages, commandShare)
+        for label, dispatch in [("scan", scanDispatch), ("index", indexDispatch)]:
+            dispatched, duration = run(dispatch, contents)
+            rows.append([f"{commandShare:.0%}", label, dispatched, f"{duration:.3f}",
+                         f"{len(contents) / duration:.0f}"])
+    printTable(["commandos", "dispatch", "dispatched", "duration (s)", "messages/s"], rows)
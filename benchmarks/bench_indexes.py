@@ -0,0 +1,113 @@
+"""
+Query plans and timings of the hot ORM queries of the scheduler, the live matches and the commandos, with and without
+the indexes of migration 0006_indexes. The sqlite database is filled with a full catalog of competitions and several
+seasons of matches for every watched competition.
+
+    python -m benchmarks.bench_indexes --competitions 20 --seasons 5
+"""
+import argparse
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from pytz import UTC
+
+from benchmarks.common import setupDjango, measure, printTable
+
+kickoff = datetime(2018, 8, 24, 18, 30, tzinfo=UTC)
+
+
+def fillDatabase(competitions: int, seasons: int):
+    from database.models import Federation, Association, Competition, Season, Team, Match, Settings, DiscordUsers
+
+    Federation(id="UEFA", clear_name="Union of European Football Associations").save()
+    Association.objects.bulk_create([Association(id=f"A{i:02d}", clear_name=f"Country {i}") for i in range(200)])
+    # the catalog is a lot bigger than the watched competitions and has a lot of shared names
+    Competition.objects.bulk_create([Competition(id=i, federation_id="UEFA", association_id=f"A{i % 200:02d}",
+                                                 clear_name=f"League {i % 500}") for i in range(3000)])
+    Settings.objects.bulk_create([Settings(name=f"setting{i}", value="") for i in range(20)] +
+                                 [Settings(name="prefix", value="!")])
+    DiscordUsers.objects.bulk_create([DiscordUsers(id=i, name=f"user{i}", userLevel=i % 6) for i in range(1000)])
+
+    seasonList = []
+    teamList = []
+    matchList = []
+    for comp in range(competitions):
+        teams = [comp * 100 + i for i in range(20)]
+        teamList += [Team(id=i, clear_name=f"Team {i}") for i in teams]
+        for seasonIndex in range(seasons):
+            seasonID = comp * 100 + seasonIndex
+            seasonStart = kickoff - timedelta(days=365 * (seasons - seasonIndex - 1))
+            seasonList.append(Season(id=seasonID, federation_id="UEFA", competition_id=comp, clear_name=f"{seasonID}",
+                                     start_date=seasonStart, end_date=seasonStart + timedelta(days=300)))
+            # 38 matchdays with 10 matches each, like a league with 20 teams
+            for md in range(1, 39):
+                for game in range(10):
+                    date = seasonStart + timedelta(days=7 * (md - 1), hours=game % 3)
+                    matchList.append(Match(id=len(matchList), competition_id=comp, season_id=seasonID,
+                                           home_team_id=teams[game], away_team_id=teams[19 - game], matchday=md,
+                                           match_status=0 if date < kickoff else 1, stage=0, date=date))
+    Season.objects.bulk_create(seasonList)
+    Team.objects.bulk_create(teamList)
+    Match.objects.bulk_create(matchList, batch_size=500)
+    return len(matchList)
+
+
+def hotQueries(competitions: int, seasons: int) -> OrderedDict:
+    from database.models import Competition, Season, Match, Settings, DiscordUsers
+
+    comp = competitions // 2
+    season = comp * 100 + seasons - 1
+    return OrderedDict([
+        ("compDict season", lambda: Match.objects.filter(competition_id=comp, season_id=season)
+            .select_related('home_team', 'away_team', 'competition').order_by('date')),
+        ("matchday", lambda: Match.objects.filter(competition_id=comp, season_id=season, matchday=20)
+            .order_by('date')),
+        ("match status", lambda: Match.objects.filter(match_status=1).order_by('date')[:50]),
+        ("date range", lambda: Match.objects.filter(date__gte=kickoff, date__lt=kickoff + timedelta(days=7))
+            .order_by('date')),
+        ("competition by name", lambda: Competition.objects.filter(clear_name="League 10", association_id="A10")),
+        ("current season", lambda: Season.objects.filter(competition_id=comp).order_by('start_date')[:1]),
+        ("prefix", lambda: Settings.objects.filter(name="prefix")),
+        ("user level", lambda: DiscordUsers.objects.filter(id=500)),
+    ])
+
+
+def queryPlan(queryset) -> str:
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return " | ".join(row[-1] for row in cursor.fetchall())
+
+
+def run(competitions: int, seasons: int, repeat: int):
+    from django.core.management import call_command
+
+    dbPath = setupDjango()
+    matchCount = fillDatabase(competitions, seasons)
+    print(f"Database {dbPath}: {matchCount} matches, {competitions} competitions with {seasons} seasons each\n")
+    queries = hotQueries(competitions, seasons)
+
+    results = OrderedDict()
+    for label, migration in [("without indexes", "0005_auto_20180817_1156"), ("with indexes", "0006_indexes")]:
+        call_command("migrate", "database", migration, verbosity=0)
+        print(f"Query plans {label}:")
+        for name, query in queries.items():
+            print(f"  {name}: {queryPlan(query())}")
+            results.setdefault(name, []).append(measure(lambda: list(query()), repeat))
+        print()
+
+    rows = []
+    for name, (without, withIndex) in results.items():
+        rows.append([name, f"{without['mean']:.3f}", f"{withIndex['mean']:.3f}",
+                     f"{without['mean'] / withIndex['mean']:.1f}x"])
+    printTable(["query", "without (ms)", "with (ms)", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description=__doc__)
+    argParser.add_argument("--competitions", type=int, default=20)
+    argParser.add_argument("--seasons", type=int, default=5)
+    argParser.add_argument("--repeat", type=int, default=20)
+    args = argParser.parse_args()
+    run(args.competitions, args.seasons, args.repeat)
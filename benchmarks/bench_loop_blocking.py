@@ -0,0 +1,70 @@
+"""
+Event loop blocking during a match sync. The sync (diffMatches and saveBatch over all matches, every match rescheduled)
+runs once directly within a coroutine, like the maintenance scheduler did before, and once on the database executor.
+A LoopLagMonitor measures how long the loop was blocked in both cases.
+
+    python -m benchmarks.bench_loop_blocking --competitions 10
+"""
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+
+from benchmarks.common import setupDjango, printTable
+from benchmarks.bench_indexes import fillDatabase
+
+
+def syncJob(shift: timedelta, batchSize: int = 500):
+    from database.models import Match
+    from database.handler import MatchChangeSet, chunked, diffMatches, saveBatch
+
+    matches = list(Match.objects.all())
+    for match in matches:
+        match.date += shift
+    changeSet = MatchChangeSet()
+    for batch in chunked(matches, batchSize):
+        saveBatch(diffMatches(batch, changeSet))
+    return changeSet
+
+
+async def measureSync(runner, shift: timedelta):
+    from support.helper import LoopLagMonitor
+
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    changeSet = await runner(shift)
+    duration = time.perf_counter() - start
+    await asyncio.sleep(0.05)
+    monitor.stop()
+    return changeSet, duration, monitor.statistics()
+
+
+async def run():
+    from database.executor import runDB
+
+    async def inline(shift):
+        return syncJob(shift)
+
+    async def executor(shift):
+        return await runDB(syncJob, shift)
+
+    rows = []
+    for label, runner, shift in [("within coroutine", inline, timedelta(hours=1)),
+                                 ("database executor", executor, timedelta(hours=-1))]:
+        changeSet, duration, lag = await measureSync(runner, shift)
+        rows.append([label, len(changeSet.updated), f"{duration:.2f}", f"{lag['maxLag'] * 1000:.1f}",
+                     f"{lag['blocked']:.2f}", lag['stalls'], lag['samples']])
+    printTable(["sync", "updated", "duration (s)", "max lag (ms)", "blocked (s)", "stalls", "loop ticks"], rows)
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description=__doc__)
+    argParser.add_argument("--competitions", type=int, default=10)
+    argParser.add_argument("--seasons", type=int, default=1)
+    args = argParser.parse_args()
+
+    dbPath = setupDjango()
+    print(f"Database {dbPath}: {fillDatabase(args.competitions, args.seasons)} matches\n")
+    asyncio.get_event_loop().run_until_complete(run())
@@ -0,0 +1,94 @@
+"""
+Event diffing of a live match over a whole match. The events of tests/testAPI/testFiles/live.json are repeated with
+new ids to get long matches, the feed grows by one event every few polls (the feed lists the newest event first).
+The old full list comparison of LiveMatch.parseEvents is compared with the EventTracker.
+
+    python -m benchmarks.bench_parse_events --events 50 200 1000
+"""
+import argparse
+import copy
+import json
+import os
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+import django
+django.setup()
+
+from benchmarks.common import printTable
+from database.models import MatchEvents
+from discord_handler.liveMatch import EventTracker, LiveMatch
+
+path = os.path.dirname(os.path.realpath(__file__)) + "/../tests/testAPI/testFiles/live.json"
+
+
+def legacyParseEvents(data: list, pastEvents: list):
+    """
+    parseEvents as it was before the EventTracker: full list comparison, quadratic membership test and a json round
+    trip for deduplication.
+    """
+    retEvents = []
+    if data != pastEvents:
+        diff = [i for i in data if i not in pastEvents]
+        diff = [json.loads(i) for i in set(json.dumps(i) for i in diff)]
+        for event in reversed(diff):
+            eventData = LiveMatch.parseEvent(event)
+            if eventData is not None:
+                retEvents.append(eventData)
+        pastEvents = data
+    return retEvents, pastEvents
+
+
+def matchFeed(eventCount: int, pollsPerEvent: int):
+    """
+    Yields the event list of every poll of a match with eventCount events.
+    """
+    with open(path, encoding="utf-8") as f:
+        templates = list(reversed(json.loads(f.read())["match"]["events"]))
+    events = []
+    for i in range(eventCount):
+        event = copy.deepcopy(templates[i % len(templates)])
+        event['id'] = i
+        event['minute'] = f"{i * 90 // eventCount}'"
+        events.insert(0, event)
+        # every poll gets a freshly decoded document, like from the api
+        for poll in range(pollsPerEvent):
+            yield copy.deepcopy(events)
+
+
+def runLegacy(feed: list) -> int:
+    pastEvents = []
+    count = 0
+    for data in feed:
+        newEvents, pastEvents = legacyParseEvents(data, pastEvents)
+        count += len(newEvents)
+    return count
+
+
+def runTracker(feed: list) -> int:
+    tracker = EventTracker()
+    count = 0
+    for data in feed:
+        count += len(tracker.update(data))
+    return count
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description=__doc__)
+    argParser.add_argument("--events", type=int, nargs="+", default=[50, 200, 1000])
+    argParser.add_argument("--pollsPerEvent", type=int, default=3)
+    args = argParser.parse_args()
+
+    rows = []
+    for eventCount in args.events:
+        feed = list(matchFeed(eventCount, args.pollsPerEvent))
+        results = []
+        for func in [runLegacy, runTracker]:
+            start = time.perf_counter()
+            posted = func(feed)
+            results.append(((time.perf_counter() - start) * 1000, posted))
+        (legacyTime, legacyPosted), (trackerTime, trackerPosted) = results
+        rows.append([eventCount, len(feed), f"{legacyTime:.1f}", f"{trackerTime:.1f}",
+                     f"{legacyTime / trackerTime:.1f}x", legacyPosted, trackerPosted])
+    printTable(["events", "polls", "parseEvents (ms)", "EventTracker (ms)", "speedup", "posted old", "posted new"],
+               rows)
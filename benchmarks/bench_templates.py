@@ -0,0 +1,217 @@
+"""
+Render throughput of the compiled templates against the str.replace rendering that was used before, for the events
+and lineups of tests/testAPI/testFiles/live.json. The legacy functions below are copies of the former
+LiveMatch.beautifyEvent and LiveMatch.postLineups, with the lineup stylesheet loaded correctly.
+
+    python -m benchmarks.bench_templates --repeat 2000
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+import django
+django.setup()
+
+from discord import Embed
+
+from benchmarks.common import printTable
+from database.models import MatchEvents
+from discord_handler.liveMatch import LiveMatch, EventTracker, EventStatus, MatchState
+from discord_handler.templates import TemplateSheet
+
+logger = logging.getLogger(__name__)
+
+basePath = os.path.dirname(os.path.realpath(__file__)) + "/../"
+
+
+def loadJson(fileName):
+    with open(basePath + fileName, encoding="utf-8") as f:
+        return json.loads(f.read())
+
+
+eventStyleSheet = loadJson("stylesheets/game_events.json")
+lineupStyleSheet = loadJson("stylesheets/lineups.json")
+emojiSet = {"GoalScored": "<:GoalScored:478130458090012672>", "sub": "<:sub:478130458090012673>"}
+
+
+def styleSheetEvents(key):
+    try:
+        return eventStyleSheet[key]
+    except KeyError:
+        logger.error(f"Key {key} not available in stylesheet")
+        return ""
+
+
+def styleSheetLineups(key):
+    try:
+        return lineupStyleSheet[key]
+    except KeyError:
+        logger.error(f"Key {key} not available in stylesheet")
+        return ""
+
+
+def legacyBeautifyEvent(event, state):
+    if event.event == MatchEvents.goal:
+        if event.team == state.homeTeam:
+            goalString = styleSheetEvents(MatchEvents.goalTallyHomeScore.value)
+        else:
+            goalString = styleSheetEvents(MatchEvents.goalTallyAwayScore.value)
+    else:
+        goalString = styleSheetEvents(MatchEvents.goalTally.value)
+
+    title = styleSheetEvents(MatchEvents.title.value)
+
+    replaceDict = OrderedDict()
+    replaceDict["$tally$"] = goalString
+    replaceDict["$homeScore$"] = state.homeScore
+    replaceDict["$awayScore$"] = state.awayScore
+    replaceDict["$homeTeam$"] = state.homeTeam
+    replaceDict["$awayTeam$"] = state.awayTeam
+    for key, val in replaceDict.items():
+        title = title.replace(str(key), str(val))
+
+    replaceDict = {
+        "$minute$": event.minute,
+        "$player$": event.player,
+        "$playerTo$": event.playerTo,
+        "$team$": event.team,
+    }
+
+    content = styleSheetEvents(event.event.value)
+
+    foundEmojis = re.findall(r':[\w\d_-]+:', content)
+
+    logger.debug(f"found emojis : {foundEmojis}")
+
+    for i in foundEmojis:
+        if i.replace(":", "") in emojiSet.keys():
+            logger.debug(f"Replacing {i} for {emojiSet[i.replace(':', '')]}")
+            content.replace(i, emojiSet[i.replace(":", "")])
+        else:
+            logger.debug(f"{i} not in emojilist, replacing it with nothing")
+            content.replace(i, "")
+
+    for key, val in replaceDict.items():
+        content = content.replace(key, str(val))
+
+    if event.status == EventStatus.corrected:
+        content = styleSheetEvents(MatchEvents.eventCorrected.value).replace("$event$", content)
+    elif event.status == EventStatus.retracted:
+        content = styleSheetEvents(MatchEvents.eventRetracted.value).replace("$event$", content)
+
+    goalListing = ""
+    if event.event == MatchEvents.goal:
+        goalListing = content + f" {event.player}"
+
+    return title, content, goalListing
+
+
+def legacyLineupEmbed(match, data):
+    lineup = OrderedDict()
+    for i in ['home', 'away']:
+        lineup[i] = OrderedDict()
+        lineup[i]['starting'] = []
+        lineup[i]['bench'] = []
+        lineup[i]['coach'] = []
+        for player in data['lineups']['teams'][i]:
+            playerInfo = OrderedDict()
+            playerInfo['name'] = player['personName']
+            playerInfo['number'] = player['shirtNumber']
+            playerInfo['captain'] = player['isCaptain']
+            playerInfo['gk'] = player['isGoalKeeper']
+
+            if player['isCoach']:
+                lineup[i]['coach'].append(playerInfo)
+            elif player['startingLineUp']:
+                lineup[i]['starting'].append(playerInfo)
+            else:
+                lineup[i]['bench'].append(playerInfo)
+
+    def getLineupPlayerString(teamString):
+        def listPlayers(position):
+            fullLineupString = ""
+            for startingPlayer in lineup[teamString][position]:
+                lineupString = styleSheetLineups("PlayerTemplate")
+                lineupString = lineupString.replace("$number$", str(startingPlayer['number']))
+                lineupString = lineupString.replace("$player$", startingPlayer['name'])
+                if startingPlayer['gk']:
+                    lineupString = lineupString.replace("$gkTemplate$", styleSheetLineups("GKTemplate"))
+                else:
+                    lineupString = lineupString.replace("$gkTemplate$", "")
+                if startingPlayer['captain']:
+                    lineupString = lineupString.replace("$captainTemplate$", styleSheetLineups("CaptainTemplate"))
+                else:
+                    lineupString = lineupString.replace("$captainTemplate$", "")
+                fullLineupString += lineupString
+            return fullLineupString
+
+        lineupString = styleSheetLineups("Layout")
+        lineupString = lineupString.replace("$playerTemplate$", listPlayers('starting'))
+        coachString = styleSheetLineups("CoachTemplate")
+        coachString = coachString.replace("$coach$", lineup[teamString]['coach'][0]['name'])
+        lineupString = lineupString.replace("$coachTemplate$", coachString)
+        return lineupString
+
+    homeString = getLineupPlayerString('home')
+    awayString = getLineupPlayerString('away')
+
+    title = styleSheetLineups("cardTitle")
+    description = styleSheetLineups("cardDescription")
+    description = description.replace("$home_team$", match.home_team.clear_name)
+    description = description.replace("$away_team$", match.away_team.clear_name)
+
+    embObj = Embed(title=title, description=description)
+
+    teamTitle = styleSheetLineups("TeamTitle")
+    homeTeamTitle = teamTitle.replace("$team$", match.home_team.clear_name)
+    awayTeamTitle = teamTitle.replace("$team$", match.away_team.clear_name)
+
+    embObj.add_field(name=homeTeamTitle, value=homeString)
+    embObj.add_field(name=awayTeamTitle, value=awayString)
+    return embObj
+
+
+class Team:
+    def __init__(self, clear_name):
+        self.clear_name = clear_name
+
+
+class Match:
+    def __init__(self, homeTeam, awayTeam):
+        self.home_team = Team(homeTeam)
+        self.away_team = Team(awayTeam)
+
+
+def throughput(func, repeat: int, renders: int) -> float:
+    start = time.perf_counter()
+    for i in range(repeat):
+        func()
+    return repeat * renders / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    argParser = argparse.ArgumentParser(description=__doc__)
+    argParser.add_argument("--repeat", type=int, default=2000)
+    args = argParser.parse_args()
+
+    TemplateSheet.updateEmojis(emojiSet)
+    data = loadJson("tests/testAPI/testFiles/live.json")["match"]
+    state = MatchState.fromLiveData(data)
+    events = EventTracker().update(data["events"])
+    match = Match(state.homeTeam, state.awayTeam)
+
+    rows = []
+    for label, renders, legacy, new in [
+        ("events", len(events), lambda: [legacyBeautifyEvent(i, state) for i in events],
+         lambda: [LiveMatch.beautifyEvent(i, state) for i in events]),
+        ("lineups", 1, lambda: legacyLineupEmbed(match, data), lambda: LiveMatch.lineupEmbed(match, data)),
+    ]:
+        legacyRate = throughput(legacy, args.repeat, renders)
+        newRate = throughput(new, args.repeat, renders)
+        rows.append([label, f"{legacyRate:.0f}", f"{newRate:.0f}", f"{newRate / legacyRate:.1f}x"])
+    printTable(["render", "str.replace (renders/s)", "templates (renders/s)", "speedup"], rows)
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import time
+from typing import Callable, Dict
+
+
+def setupDjango(dbPath: str = None) -> str:
+    """
+    Sets up django with the settings of the bot, but on a separate sqlite file, so benchmarks never touch the
+    database of the bot. The database is migrated to the latest state.
+    :param dbPath: Path of the sqlite file, a temporary file is used if None
+    :return: Path of the sqlite file
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+    import django
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if dbPath is None:
+        dbPath = tempfile.mkstemp(suffix=".sqlite3")[1]
+    settings.DATABASES['default']['NAME'] = dbPath
+    django.setup()
+    call_command("migrate", verbosity=0)
+    return dbPath
+
+
+def measure(func: Callable, repeat: int = 20) -> Dict[str, float]:
+    """
+    Runs func repeat times and returns the mean and best time in milliseconds
+    """
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {'mean': sum(times) / len(times), 'best': min(times)}
+
+
+def printTable(header: list, rows: list):
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(str(val).ljust(width) for val, width in zip(row, widths)))
+    print()
@@ -0,0 +1,75 @@
+"""
+The django ORM is synchronous. Every query that is done directly within a coroutine blocks the event loop of the bot
+and with it the live threads and all commandos. ORM work is therefore done on a small, bounded thread pool. Each
+thread of the pool holds its own database connection, which is checked for its age before and after every job.
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from typing import Callable
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class DBExecutor:
+    maxWorkers = 4
+    executor = None
+
+    @staticmethod
+    def configure(maxWorkers: int = None):
+        """
+        Sets the size of the thread pool. An already running pool is shut down after its pending jobs.
+        :param maxWorkers: Number of threads doing ORM work in parallel
+        """
+        if maxWorkers is not None:
+            DBExecutor.maxWorkers = maxWorkers
+        DBExecutor.shutdown()
+
+    @staticmethod
+    def getExecutor() -> ThreadPoolExecutor:
+        if DBExecutor.executor is None:
+            DBExecutor.executor = ThreadPoolExecutor(max_workers=DBExecutor.maxWorkers,
+                                                     thread_name_prefix="database")
+        return DBExecutor.executor
+
+    @staticmethod
+    def shutdown(wait: bool = True):
+        if DBExecutor.executor is not None:
+            DBExecutor.executor.shutdown(wait=wait)
+            DBExecutor.executor = None
+
+
+def dbJob(func: Callable, *args, **kwargs):
+    """
+    Runs func within a thread of the pool. Connections that are broken or exceeded CONN_MAX_AGE are closed before
+    and after the job, the same way django does it around a request.
+    """
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def runDB(func: Callable, *args, **kwargs):
+    """
+    Runs a function doing ORM work on the database executor and waits for its result, without blocking the event
+    loop.
+    :param func: Synchronous function accessing the database
+    :return: Return value of func
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(DBExecutor.getExecutor(), partial(dbJob, func, *args, **kwargs))
+
+
+def dbCall(func: Callable) -> Callable:
+    """
+    Decorator, that turns a synchronous function doing ORM work into a coroutine running on the database executor.
+    """
+    @wraps(func)
+    async def func_wrapper(*args, **kwargs):
+        return await runDB(func, *args, **kwargs)
+    return func_wrapper
@@ -1,12 +1,15 @@
 from django.db.utils import IntegrityError
+from django.db import transaction, models
 from datetime import timedelta,timezone,datetime
 import logging
 import enum
-from typing import List,Dict,Union
+from itertools import islice
+from typing import List,Dict,Union,Iterable,Iterator,Tuple
 from pytz import utc,UTC
+from collections import OrderedDict
 
 from api.calls import getSpecificTeam,getAllFederations,getAllCountries,getAllCompetitions,getAllMatches,getAllSeasons
-from database.models import Federation,Competition,CompetitionWatcher,Season,Match
+from database.models import Federation,Competition,CompetitionWatcher,Season,Match,Team
 from discord_handler.liveMatch import LiveMatch
 from discord_handler.client import toDiscordChannelName
 
@@ -34,18 +37,213 @@ class MatchDayObject:
         self.endTime = endTime
         self.matchdayString = matchdayString
 
-def getAndSaveData(func : callable, **kwargs):
+class SaveStatistics:
+    """
+    Number of rows inserted, updated and skipped by getAndSaveData
+    """
+    def __init__(self, inserted: int = 0, updated: int = 0, skipped: int = 0):
+        self.inserted = inserted
+        self.updated = updated
+        self.skipped = skipped
+
+    def __add__(self, other):
+        return SaveStatistics(self.inserted + other.inserted, self.updated + other.updated,
+                              self.skipped + other.skipped)
+
+    def __str__(self):
+        return f"inserted {self.inserted}, updated {self.updated}, skipped {self.skipped}"
+
+def chunked(iterable : Iterable, size : int) -> Iterator[List]:
+    """
+    Splits an iterable into lists of at most size elements
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if batch == []:
+            return
+        yield batch
+
+def missingForeignKeys(model, objects : List[models.Model]) -> Dict[str,set]:
+    """
+    Looks up all foreign keys of the given objects and returns the ones that are not in the database
+    :param model: Model class of the objects
+    :param objects: List of unsaved model objects
+    :return: Dictionary of foreign key attribute name to the set of missing ids
+    """
+    missing = {}
+    for field in model._meta.concrete_fields:
+        if not field.is_relation:
+            continue
+        ids = {getattr(i, field.attname) for i in objects} - {None}
+        existing = set(field.related_model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if ids - existing != set():
+            missing[field.attname] = ids - existing
+    return missing
+
+def repairForeignKeys(model, objects : List[models.Model], stats : SaveStatistics) -> List[models.Model]:
+    """
+    Bulk version of the foreign key handling of getAndSaveData. Missing teams of matches are loaded from the API,
+    competitions without country are skipped, all other missing foreign keys raise an IntegrityError.
+    :param model: Model class of the objects
+    :param objects: List of unsaved model objects
+    :param stats: Statistics object, skipped objects are counted here
+    :return: List of objects that can be saved
+    """
+    missing = missingForeignKeys(model, objects)
+    if missing == {}:
+        return objects
+
+    if model == Match and set(missing.keys()) <= {'home_team_id', 'away_team_id'}:
+        teams = []
+        for teamID in set().union(*missing.values()):
+            try:
+                team = getSpecificTeam(teamID)
+            except (KeyError, TypeError, ValueError):
+                logger.warning(f"Can't load team {teamID}")
+                continue
+            if team.id == teamID:
+                teams.append(team)
+        Team.objects.bulk_create(teams)
+        loaded = {i.id for i in teams}
+    elif model == Competition:
+        loaded = set()
+        for i in objects:
+            if i.association_id in missing.get('association_id', set()):
+                logger.warning(f"{i.association_id} has no country! Will not save country")
+    else:
+        raise IntegrityError(f"Foreign Key constraint failed for {model._meta.label}")
+
+    retList = []
+    for i in objects:
+        if any(getattr(i, attname) in ids - loaded for attname, ids in missing.items()):
+            stats.skipped += 1
+        else:
+            retList.append(i)
+    return retList
+
+def saveBatch(objects : List[models.Model]) -> SaveStatistics:
+    """
+    Inserts or updates a batch of model objects of the same type within one transaction.
+    :param objects: List of unsaved model objects
+    :return: Statistics for this batch
+    """
+    stats = SaveStatistics()
+    if objects == []:
+        return stats
+    model = type(objects[0])
+    objects = list(OrderedDict((i.pk, i) for i in objects).values())
+    objects = repairForeignKeys(model, objects, stats)
+
+    existing = set(model.objects.filter(pk__in=[i.pk for i in objects]).values_list('pk', flat=True))
+    fields = [field.attname for field in model._meta.concrete_fields if not field.primary_key]
+    newObjects = [i for i in objects if i.pk not in existing]
+    updateObjects = [i for i in objects if i.pk in existing]
+
+    with transaction.atomic():
+        model.objects.bulk_create(newObjects)
+        # Django 2.1 has no bulk_update, the updates still share the transaction of the batch
+        for i in updateObjects:
+            model.objects.filter(pk=i.pk).update(**{field: getattr(i, field) for field in fields})
+
+    stats.inserted += len(newObjects)
+    stats.updated += len(updateObjects)
+    return stats
+
+class MatchChangeSet:
+    """
+    Changes found by a match sync. newFixtures are matches that were not in the database yet, updated contains all
+    other matches that changed. rescheduled and finalScores are the subsets of updated with a new date or that
+    just finished.
+    """
+    def __init__(self):
+        self.newFixtures = []
+        self.updated = []
+        self.rescheduled = []
+        self.finalScores = []
+        self.unchanged = 0
+
+    def isEmpty(self) -> bool:
+        return self.newFixtures == [] and self.updated == []
+
+    def extend(self, other):
+        self.newFixtures += other.newFixtures
+        self.updated += other.updated
+        self.rescheduled += other.rescheduled
+        self.finalScores += other.finalScores
+        self.unchanged += other.unchanged
+
+    def loadRelated(self):
+        """
+        Replaces the matches by stored ones with their teams and competition, so the scheduler can apply the changes
+        on the event loop without accessing the database. Accesses the database!
+        """
+        loaded = Match.objects.select_related('home_team', 'away_team', 'competition')\
+            .in_bulk([i.id for i in self.newFixtures + self.updated])
+        for name in ['newFixtures', 'updated', 'rescheduled', 'finalScores']:
+            setattr(self, name, [loaded.get(i.id, i) for i in getattr(self, name)])
+
+    def __str__(self):
+        return f"new {len(self.newFixtures)}, updated {len(self.updated)} (rescheduled {len(self.rescheduled)}, " \
+               f"final scores {len(self.finalScores)}), unchanged {self.unchanged}"
+
+matchDiffFields = ['matchday', 'date', 'match_status', 'score_home_team', 'score_away_team', 'home_team_id',
+                   'away_team_id', 'stage']
+
+def diffMatches(matches : List[Match], changeSet : MatchChangeSet) -> List[Match]:
+    """
+    Compares matches from the API with the stored ones and records the differences in the changeSet.
+    :param matches: Match objects from the API
+    :param changeSet: Changes are added to this object
+    :return: List of matches that are new or changed and have to be written
+    """
+    stored = dict((i['id'], i) for i in Match.objects.filter(pk__in=[i.id for i in matches])
+                  .values('id', *matchDiffFields))
+    changed = []
+    for match in matches:
+        old = stored.get(match.id)
+        if old is None:
+            changeSet.newFixtures.append(match)
+            changed.append(match)
+            continue
+
+        diff = [field for field in matchDiffFields
+                if Match._meta.get_field(field).to_python(getattr(match, field)) != old[field]]
+        if diff == []:
+            changeSet.unchanged += 1
+            continue
+
+        changed.append(match)
+        changeSet.updated.append(match)
+        if 'date' in diff:
+            changeSet.rescheduled.append(match)
+        if match.match_status == MatchStatus.Played.value and old['match_status'] != MatchStatus.Played.value:
+            changeSet.finalScores.append(match)
+    return changed
+
+def getAndSaveData(func : callable, bulk : bool = False, batchSize : int = 500, **kwargs) -> SaveStatistics:
     """
     Takes a getAll function defined in api.calls and iterates over the result, and storing the objects to the DB.
     It has various special handling functions, for example it looks up ForeignKeyErrors.
     :param func: Function to be executed and read from
+    :param bulk: If True, the objects are inserted and updated in batches, one transaction per batch.
+    :param batchSize: Number of objects per batch in bulk mode
     :param kwargs: parameters to the function, created as kwargs
+    :return: Number of inserted, updated and skipped rows. In the default mode all saved rows count as updated.
     """
     data = func(**kwargs)
+    stats = SaveStatistics()
+
+    if bulk:
+        for batch in chunked(data, batchSize):
+            stats += saveBatch(batch)
+        logger.info(f"Saved {func.__name__}: {stats}")
+        return stats
 
     for i in data:
         try:
             i.save()
+            stats.updated += 1
             if i._meta.label != 'database.Match':
                 logger.debug(f"Saving {func.__name__}: {i}")
         except IntegrityError:
@@ -56,47 +254,69 @@ def getAndSaveData(func : callable, **kwargs):
                     home_team.save()
                     away_team.save()
                     i.save()
+                    stats.updated += 1
                 except NameError:
-                    pass
+                    stats.skipped += 1
             elif i._meta.label == 'database.Competition':
                 logger.warning(f"{i.association_id} has no country! Will not save country")
+                stats.skipped += 1
                 continue
             else:
                 raise IntegrityError(f"Foreign Key constraint failed for {i._meta.label}")
+    return stats
 
 def updateOverlayData():
     """
     The relevant overlay data (Federations, Countries, Competitions and watched seasons) is refreshed from the API.
     """
     logger.info("Updating competitions")
-    getAndSaveData(getAllFederations)
-    getAndSaveData(getAllCountries)
+    getAndSaveData(getAllFederations, bulk=True)
+    getAndSaveData(getAllCountries, bulk=True)
     for federation in Federation.objects.all():
-        getAndSaveData(getAllCompetitions, idFederation=federation.id)
+        getAndSaveData(getAllCompetitions, bulk=True, idFederation=federation.id)
 
     for watcher in CompetitionWatcher.objects.all():
-        getAndSaveData(getAllSeasons, idCompetitions=watcher.competition.id)
+        getAndSaveData(getAllSeasons, bulk=True, idCompetitions=watcher.competition.id)
 
-def updateMatches():
+def updateMatches(competitions : Iterable[str] = None) -> Dict[str,MatchChangeSet]:
     """
     Update the data for the matches stored as monitored in the database from the API.
+    :param competitions: Names of the competitions that are updated, all watched competitions if None
+    :return: Changes of the current season of every watched competition, keyed by competition name
     """
     logger.info("Updating matches")
-    for watcher in CompetitionWatcher.objects.all():
+    changeSets = {}
+    watchers = {}
+    # competitions watched by several servers are updated once
+    for watcher in CompetitionWatcher.objects.select_related('competition'):
+        if competitions is None or watcher.competition.clear_name in competitions:
+            watchers[watcher.competition_id] = watcher
+    for watcher in watchers.values():
         for season in Season.objects.filter(competition=watcher.competition):
             logger.debug(f"Competition: {str(watcher.competition.clear_name.encode('utf-8'))}"
                          f",Season: {season.clear_name.encode('utf-8')}")
-            updateMatchesSingleCompetition(competition=watcher.competition, season=season)
+            changeSet = updateMatchesSingleCompetition(competition=watcher.competition, season=season)
+            if season.id == watcher.current_season_id:
+                changeSets[watcher.competition.clear_name] = changeSet
+    return changeSets
 
-def updateMatchesSingleCompetition(competition : Competition, season : Season):
+def updateMatchesSingleCompetition(competition : Competition, season : Season, batchSize : int = 500) -> MatchChangeSet:
     """
-    Updates a single full competition. This reads all relevant matches of the given competition and season and stores
-    it in the database
+    Updates a single full competition. This reads all relevant matches of the given competition and season and
+    writes the ones that are new or changed to the database.
     :param competition: The relevant competition object from database.models
     :param season: The relevant season object from database.models
+    :param batchSize: Number of matches compared and written at once
+    :return: Changes to the stored matches, with their teams and competition loaded
     """
     logger.info(f"Updating {competition.clear_name}, season {season.clear_name}")
-    getAndSaveData(getAllMatches, idCompetitions=competition.id, idSeason=season.id)
+    changeSet = MatchChangeSet()
+    stats = SaveStatistics()
+    for batch in chunked(getAllMatches(idCompetitions=competition.id, idSeason=season.id), batchSize):
+        stats += saveBatch(diffMatches(batch, changeSet))
+    changeSet.loadRelated()
+    logger.info(f"Changes for {competition.clear_name}: {changeSet}. Saved: {stats}")
+    return changeSet
 
 def createMatchDayObject(query,watcher):
     """
@@ -113,38 +333,103 @@ def createMatchDayObject(query,watcher):
         matchdayString = f"{watcher.competition.clear_name} Matchday {query.first().matchday}"
     )
 
-def compDict(competition : CompetitionWatcher) ->Dict[str,Dict[str,Union[List[LiveMatch],str]]]:
-    comp_name = competition.competition.clear_name
+matchDayLists = ['passedMatches', 'currentMatches', 'upcomingMatches']
+
+def newMatchDay(competitionName : str, matchday : int) -> Dict:
+    """
+    Creates an empty matchday entry, as used in the dictionaries of compDict
+    :param competitionName: Name of the competition
+    :param matchday: Matchday of the entry
+    :return: Dictionary without matches. start and end are set by updateMatchDayBoundaries
+    """
+    return {
+        'channel_name': toDiscordChannelName(f"{competitionName} Matchday {matchday}"),
+        'channel_created': False,
+        'passedMatches': [],
+        'currentMatches': [],
+        'upcomingMatches': [],
+    }
+
+def addToMatchDay(matchDay : Dict, liveMatch : LiveMatch):
+    """
+    Adds a LiveMatch to the passed, current or upcoming matches of a matchday entry, depending on its date.
+    :param matchDay: Matchday entry
+    :param liveMatch: LiveMatch object
+    """
+    passedTime = (datetime.utcnow() - timedelta(hours=3)).replace(tzinfo=UTC)
+    upcomingTime = (datetime.utcnow() + timedelta(hours=3)).replace(tzinfo=UTC)
+    if liveMatch.match.date < passedTime:
+        matchDay['passedMatches'].append(liveMatch)
+    elif liveMatch.match.date < upcomingTime:
+        matchDay['currentMatches'].append(liveMatch)
+    else:
+        matchDay['upcomingMatches'].append(liveMatch)
+
+def updateMatchDayBoundaries(matchDay : Dict):
+    """
+    Sets start and end of a matchday entry from the dates of its matches. It starts one hour before the first match
+    and ends three hours after the last.
+    :param matchDay: Matchday entry
+    """
+    dates = [i.match.date for key in matchDayLists for i in matchDay[key]]
+    if dates == []:
+        return
+    matchDay['start'] = (min(dates) - timedelta(hours=1)).replace(tzinfo=UTC)
+    matchDay['end'] = (max(dates) + timedelta(hours=3)).replace(tzinfo=UTC)
+
+def windowMatches(competition : CompetitionWatcher, window : Tuple[datetime, datetime] = None) -> models.QuerySet:
+    """
+    Returns the matches of the current season of a watched competition, including their teams and competition,
+    ordered by date.
+    :param competition: The watcher (database.models.CompetitionWatcher) object
+    :param window: Only the matchdays with at least one match between window[0] and window[1] are returned, complete
+    with all their matches. The whole season if None.
+    """
+    query = Match.objects.filter(competition_id=competition.competition_id,
+                                 season_id=competition.current_season_id)
+    if window is not None:
+        query = query.filter(matchday__in=query.filter(date__gte=window[0], date__lte=window[1]).values('matchday'))
+    return query.select_related('home_team', 'away_team', 'competition').order_by('date')
+
+def compDict(competition : CompetitionWatcher,
+             window : Tuple[datetime, datetime] = None) ->Dict[str,Dict[str,Union[List[LiveMatch],str]]]:
+    """
+    Builds the matchday entries for a watched competition. All matches are read with a single query, including
+    their teams and competition, and grouped by matchday.
+    :param competition: The watcher (database.models.CompetitionWatcher) object
+    :param window: Only the matchdays with matches within the window are built, the whole season if None
+    :return: Dictionary of matchday to matchday entry
+    """
     matchDict = {}
-    matchDayList = competition.current_season.match_set.values_list('matchday', flat=True).distinct()
-    for md in matchDayList:
-        matchDict[md] = {}
-        matchList = Match.objects.filter(matchday=md).filter(competition=competition.competition) \
-            .filter(season=competition.current_season).order_by('date')
-        passedTime = (datetime.utcnow() - timedelta(hours=3)).replace(tzinfo=UTC)
-        upcomingTime = (datetime.utcnow() + timedelta(hours=3)).replace(tzinfo=UTC)
-
-        matchDict[md]['start'] = (matchList.first().date - timedelta(hours=1)).replace(tzinfo=UTC)
-        matchDict[md]['end'] = (matchList.last().date + timedelta(hours=3)).replace(tzinfo=UTC)
-        matchDict[md]['channel_name'] = toDiscordChannelName(f"{comp_name} Matchday {md}")
-        matchDict[md]['channel_created'] = False
-        matchDict[md]['passedMatches'] = [LiveMatch(obj) for obj in matchList.filter(date__lt=passedTime)]
-        matchDict[md]['currentMatches'] = [LiveMatch(obj) for obj in matchList.filter(date__gt=passedTime)
-                                                           .filter(date__lt=upcomingTime)]
-        matchDict[md]['upcomingMatches'] = [LiveMatch(obj) for obj in matchList.filter(date__gt=upcomingTime)]
+    for match in windowMatches(competition, window):
+        md = match.matchday
+        if md not in matchDict.keys():
+            matchDict[md] = newMatchDay(match.competition.clear_name, md)
+        addToMatchDay(matchDict[md], LiveMatch(match))
+
+    for data in matchDict.values():
+        updateMatchDayBoundaries(data)
     return matchDict
 
-def getNextMatchDayObjects() -> Dict[str,Dict[str,Dict]]:
+def getNextMatchDayObjects(window : Tuple[datetime, datetime] = None) -> Dict[str,Dict[str,Dict]]:
     """
-    Returns the next matchday objects between the current (i.e. time that the function is called) time and +24 hours.
-    It also creates Matchday objects for currently played games
-    :return: List of Matchday Objects containing the next relevant Matchday objects
+    Returns the matchday objects of all watched competitions.
+    :param window: Only the matchdays with matches within the window are built, the whole season if None
+    :return: Dictionary of competition name to its matchday entries, see compDict
     """
     matchDict = {}
-    for competition in CompetitionWatcher.objects.all():
-        matchDict[competition.competition.clear_name] = compDict(competition)
+    for competition in CompetitionWatcher.objects.select_related('competition'):
+        matchDict[competition.competition.clear_name] = compDict(competition, window)
     return matchDict
 
+def getWindowMatches(window : Tuple[datetime, datetime]) -> Dict[str,List[Match]]:
+    """
+    Returns the matches of the matchdays within the window for all watched competitions, see windowMatches.
+    :return: Dictionary of competition name to its matches
+    """
+    return dict((competition.competition.clear_name, list(windowMatches(competition, window)))
+                for competition in CompetitionWatcher.objects.select_related('competition'))
+
 
 
 def getCurrentMatches() -> List[Match]:
@@ -0,0 +1,41 @@
+# Generated by Django 2.1 on 2026-10-16 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0005_auto_20180817_1156'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='competition',
+            index=models.Index(fields=['clear_name', 'association'], name='competition_name_assoc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['competition', 'season', 'matchday', 'date'], name='match_comp_season_md_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['competition', 'season', 'date'], name='match_comp_season_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['match_status', 'date'], name='match_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['date'], name='match_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='season',
+            index=models.Index(fields=['competition', 'start_date'], name='season_comp_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='settings',
+            index=models.Index(fields=['name'], name='settings_name_idx'),
+        ),
+    ]
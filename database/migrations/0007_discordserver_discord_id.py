@@ -0,0 +1,18 @@
+# Generated by Django 2.1 on 2026-10-16 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0006_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='discordserver',
+            name='discord_id',
+            field=models.CharField(db_index=True, max_length=64, null=True, verbose_name='Id of the server according to discord'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.1 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0007_discordserver_discord_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Lease',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Name of the leased duty or competition')),
+                ('owner', models.CharField(max_length=255, verbose_name='Node holding the lease')),
+                ('expires', models.DateTimeField(verbose_name='Time the lease expires unless it is renewed')),
+            ],
+        ),
+    ]
@@ -21,6 +21,8 @@ class MatchEvents(Enum):
     goalTallyAwayScore = "Goal_tally_Away_Team_scored"
     goalTally = "Goal_tally"
     title = "title"
+    eventCorrected = "Event_corrected"
+    eventRetracted = "Event_retracted"
 
 
 class Federation(models.Model):
@@ -44,6 +46,11 @@ class Competition(models.Model):
     clear_name = models.CharField(max_length=255, verbose_name="Full name of the competition")
     association = models.ForeignKey(Association, on_delete=models.CASCADE, verbose_name="Country of competition")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['clear_name', 'association'], name='competition_name_assoc_idx'),
+        ]
+
     def __str__(self):
         return f"ID: {self.id}, Clear_Name: {self.clear_name.encode('utf-8')},Association {self.association_id}"
 
@@ -56,6 +63,11 @@ class Season(models.Model):
     start_date = models.DateTimeField(verbose_name="S tarting date of the season")
     end_date = models.DateTimeField(verbose_name="End date of the season")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['competition', 'start_date'], name='season_comp_start_idx'),
+        ]
+
     def __str__(self):
         return f"ID: {self.id}, Clear_Name: {self.clear_name.encode('utf-8')}"
 
@@ -89,6 +101,14 @@ class Match(models.Model):
     score_away_team = models.IntegerField(verbose_name="Score for the away team", null=True)
     passed = models.BooleanField(verbose_name="Flag if the match is allready passed", default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['competition', 'season', 'matchday', 'date'], name='match_comp_season_md_idx'),
+            models.Index(fields=['competition', 'season', 'date'], name='match_comp_season_date_idx'),
+            models.Index(fields=['match_status', 'date'], name='match_status_date_idx'),
+            models.Index(fields=['date'], name='match_date_idx'),
+        ]
+
     def __str__(self):
         return f"ID: {self.id}, HomeTeam: {self.home_team.clear_name}, " \
                f"AwayTeam: {self.away_team.clear_name}, matchday: {self.matchday}," \
@@ -96,6 +116,8 @@ class Match(models.Model):
 
 class DiscordServer(models.Model):
     name = models.CharField(max_length=255,verbose_name="Name of the discord server")
+    discord_id = models.CharField(max_length=64,verbose_name="Id of the server according to discord",null=True,
+                                  db_index=True)
 
 class DiscordUsers(models.Model):
     id = models.IntegerField(primary_key=True,verbose_name="Id of the user according to discord")
@@ -116,3 +138,16 @@ class CompetitionWatcher(models.Model):
 class Settings(models.Model):
     name = models.CharField(max_length=255,verbose_name="Maximum length of command")
     value = models.CharField(max_length=2048,verbose_name="Actual Command to be executed")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='settings_name_idx'),
+        ]
+
+class Lease(models.Model):
+    name = models.CharField(max_length=255,verbose_name="Name of the leased duty or competition",unique=True)
+    owner = models.CharField(max_length=255,verbose_name="Node holding the lease")
+    expires = models.DateTimeField(verbose_name="Time the lease expires unless it is renewed")
+
+    def __str__(self):
+        return f"Lease {self.name}, owner {self.owner}, expires {self.expires}"
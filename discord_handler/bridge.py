@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+from enum import Enum
+from typing import Callable, Dict, Union
+
+logger = logging.getLogger(__name__)
+
+
+class BridgeRole(Enum):
+    discord = "discord"
+    poller = "poller"
+
+
+class Bridge:
+    """
+    Connection between the discord process and the poller process of the multi process mode (see poller.py). The
+    poller process runs the scheduler and the live poller and forwards everything that has to reach discord (rendered
+    events, channels, scoreboards), the discord process only posts them. Messages are json objects, one per line,
+    whose type selects the handler on the other side. Handlers run one after the other, so a channel is created
+    before the events posted to it. A request waits for the result of the handler, which is sent back as a response.
+    Without a connection (single process mode) the bridge has no role.
+    """
+    # longest message in bytes, e.g. the emojis of all servers
+    lineLimit = 16 * 1024 * 1024
+
+    def __init__(self):
+        self.role = None
+        self.reader = None
+        self.writer = None
+        self.server = None
+        self.handlers = {}
+        self.pending = {}
+        self.nextRequestID = 0
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+
+    def isPoller(self) -> bool:
+        return self.role == BridgeRole.poller
+
+    def isDiscord(self) -> bool:
+        return self.role == BridgeRole.discord
+
+    def on(self, messageType: str, handler: Callable):
+        """
+        Registers the handler of a message type. It is called with the fields of the message as keyword arguments,
+        coroutine functions are awaited.
+        """
+        self.handlers[messageType] = handler
+
+    def send(self, messageType: str, **fields):
+        """
+        Sends a message to the other process. Messages sent while the other process isn't connected are dropped.
+        """
+        if self.writer is None:
+            logger.warning(f"Bridge is not connected, dropping {messageType}")
+            return
+        fields['type'] = messageType
+        self.writer.write(json.dumps(fields).encode() + b"\n")
+        self.sent += 1
+
+    async def request(self, messageType: str, timeout: float = 10, **fields):
+        """
+        Sends a message to the other process and waits for the result of its handler.
+        :param timeout: Seconds until the request fails with asyncio.TimeoutError
+        :return: The result of the handler, it has to be serializable to json
+        """
+        if self.writer is None:
+            raise ConnectionError(f"Bridge is not connected, can't request {messageType}")
+        requestID = self.nextRequestID
+        self.nextRequestID += 1
+        future = asyncio.get_event_loop().create_future()
+        self.pending[requestID] = future
+        try:
+            self.send(messageType, requestID=requestID, **fields)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(requestID, None)
+
+    def resolve(self, requestID: int, result=None, error: str = None):
+        future = self.pending.get(requestID)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(result)
+
+    async def handle(self, message: Dict):
+        messageType = message.pop('type')
+        if messageType == "response":
+            self.resolve(**message)
+            return
+        requestID = message.pop('requestID', None)
+        handler = self.handlers.get(messageType)
+        if handler is None:
+            logger.error(f"No handler for bridge message {messageType}")
+            if requestID is not None:
+                self.send("response", requestID=requestID, error=f"No handler for {messageType}")
+            return
+        try:
+            result = handler(**message)
+            if asyncio.iscoroutine(result):
+                result = await result
+            if requestID is not None:
+                self.send("response", requestID=requestID, result=result)
+        except Exception as e:
+            self.errors += 1
+            logger.exception(f"Handling bridge message failed: {e}")
+            if requestID is not None:
+                self.send("response", requestID=requestID, error=str(e))
+
+    async def receive(self):
+        """
+        Handles the messages of the other process until it disconnects. Lines that are too long or aren't json are
+        skipped.
+        """
+        reader = self.reader
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError as e:
+                # the line exceeded the limit, the rest of it is skipped as invalid json
+                self.errors += 1
+                logger.error(f"Skipping a bridge message exceeding {Bridge.lineLimit} bytes: {e}")
+                continue
+            except OSError as e:
+                logger.error(f"Bridge connection failed: {e}")
+                line = b""
+            if line == b"":
+                logger.warning(f"Bridge to the {'discord' if self.isPoller() else 'poller'} process closed")
+                # a replaced connection leaves its successor alone
+                if self.reader is reader:
+                    self.reader = None
+                    self.writer = None
+                    self.failPending()
+                return
+            self.received += 1
+            try:
+                message = json.loads(line.decode())
+            except ValueError as e:
+                self.errors += 1
+                logger.error(f"Skipping a malformed bridge message: {e}")
+                continue
+            if not isinstance(message, dict) or 'type' not in message.keys():
+                self.errors += 1
+                logger.error("Skipping a bridge message without type")
+                continue
+            await self.handle(message)
+
+    async def serve(self, path: str, onConnect: Callable = None):
+        """
+        Waits for the poller process on a unix socket. Called by the discord process, a reconnecting poller process
+        replaces the previous connection.
+        :param onConnect: Called whenever the poller process connected, e.g. to send the state it needs
+        """
+        self.role = BridgeRole.discord
+
+        async def accept(reader, writer):
+            logger.info("Poller process connected")
+            if self.writer is not None:
+                self.writer.close()
+            self.reader = reader
+            self.writer = writer
+            if onConnect is not None:
+                onConnect()
+            await self.receive()
+
+        self.server = await asyncio.start_unix_server(accept, path=path, limit=Bridge.lineLimit)
+
+    async def connect(self, path: str, attempts: int = 30, delay: float = 1):
+        """
+        Connects to the discord process. Called by the poller process.
+        :param attempts: Number of attempts until it gives up
+        :param delay: Seconds between two attempts
+        """
+        self.role = BridgeRole.poller
+        for attempt in range(attempts):
+            try:
+                self.reader, self.writer = await asyncio.open_unix_connection(path, limit=Bridge.lineLimit)
+                logger.info(f"Connected to the discord process on {path}")
+                return
+            except (ConnectionRefusedError, FileNotFoundError):
+                await asyncio.sleep(delay)
+        raise ConnectionError(f"Can't connect to the discord process on {path}")
+
+    def failPending(self):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Bridge closed before the request was answered"))
+
+    async def drain(self):
+        if self.writer is not None:
+            await self.writer.drain()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.server is not None:
+            self.server.close()
+        self.reader = None
+        self.writer = None
+        self.server = None
+        self.role = None
+        self.failPending()
+
+    def statistics(self) -> Dict[str, Union[str, int, None]]:
+        return {'role': self.role.value if self.role is not None else None,
+                'connected': self.writer is not None,
+                'sent': self.sent,
+                'received': self.received,
+                'errors': self.errors}
+
+
+bridge = Bridge()
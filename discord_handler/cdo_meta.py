@@ -1,6 +1,6 @@
 from inspect import getmembers, isroutine
 import logging
-from typing import Dict, Callable, List
+from typing import Dict, Callable, Iterable, List, Union
 from collections import OrderedDict
 from discord import Channel, Embed, Message, Reaction,User
 from django.core.exceptions import ObjectDoesNotExist
@@ -10,6 +10,8 @@ from enum import Enum
 
 from discord_handler.client import client
 from database.models import DiscordUsers,Settings
+from database.executor import runDB
+from discord_handler.messageQueue import messageQueue
 
 logger = logging.getLogger(__name__)
 
@@ -78,14 +80,137 @@ class DiscordCommando:
         return discordCommandos
 
     @staticmethod
-    def addCommando(commando):
+    def addCommando(commando, aliases: Iterable[str] = ()):
         logger.info(f"Add commando {commando}")
         discordCommandos.append(commando)
+        CommandoIndex.add(commando, aliases)
 
     def __str__(self):
         return f"Cmd {self.cmd_group}:{self.commando}, userLevel {self.userLevel}"
 
 
+class CommandoIndex:
+    """
+    Dispatch index of the commandos, so cmdHandler finds the commando of a message without iterating over all of
+    them. The first token after the prefix has to be the name of a commando. If it isn't, a trie of the aliases
+    registered with markCommando resolves it, aliases are case insensitive but have to match completely. The prefix
+    is kept in memory as well, messages without it are rejected without accessing the database.
+    """
+    commandos = {}
+    aliases = {}
+    prefix = None
+
+    @staticmethod
+    def add(commando, aliases: Iterable[str] = ()):
+        if commando.commando in CommandoIndex.commandos.keys():
+            logger.error(f"{commando.commando} is already used by {CommandoIndex.commandos[commando.commando]}")
+            return
+        CommandoIndex.commandos[commando.commando] = commando
+        for alias in aliases:
+            node = CommandoIndex.aliases
+            for char in alias.lower():
+                node = node.setdefault(char, {})
+            if node.get(None) is not None:
+                logger.error(f"Alias {alias} is already used by {node[None]}, ignoring it for {commando}")
+                continue
+            # None holds the commando of the alias ending at the node
+            node[None] = commando
+
+    @staticmethod
+    def lookup(token: str):
+        """
+        Returns the commando of a token, None if it is neither the name nor an alias of a commando.
+        :param token: First token of the message without the prefix
+        """
+        commando = CommandoIndex.commandos.get(token)
+        if commando is not None:
+            return commando
+
+        node = CommandoIndex.aliases
+        for char in token.lower():
+            node = node.get(char)
+            if node is None:
+                return None
+        return node.get(None)
+
+    @staticmethod
+    def resolve(content: str, prefix: str):
+        """
+        Returns the commando a message invokes, None if it doesn't invoke one.
+        :param content: Content of the message
+        :param prefix: Prefix of the commandos
+        """
+        if not content.startswith(prefix):
+            return None
+        tokens = content[len(prefix):].split(None, 1)
+        return CommandoIndex.lookup(tokens[0]) if tokens != [] else None
+
+    @staticmethod
+    def loadPrefix() -> str:
+        """
+        Reads the prefix into the index. Accesses the database!
+        """
+        CommandoIndex.prefix = getPrefix()
+        return CommandoIndex.prefix
+
+    @staticmethod
+    def savePrefix(prefix: str) -> str:
+        """
+        Sets the prefix of the commandos. Accesses the database!
+        """
+        Settings.objects.filter(name="prefix").delete()
+        Settings(name="prefix", value=prefix).save()
+        CommandoIndex.prefix = prefix
+        return prefix
+
+
+class UserLevels:
+    """
+    User levels of all discord users known to the bot, kept in memory so authorizing a commando doesn't access the
+    database. They are read on startup and every write of a user level has to go through save, so the levels stay in
+    sync with the database.
+    """
+    levels = None
+
+    @staticmethod
+    def load():
+        """
+        Reads the user levels of all users. Accesses the database!
+        """
+        UserLevels.levels = dict((str(userID), userLevel)
+                                 for userID, userLevel in DiscordUsers.objects.values_list('id', 'userLevel'))
+
+    @staticmethod
+    def get(author: User) -> Union[int, None]:
+        """
+        Returns the user level of a discord user without accessing the database.
+        :return: Userlevel, 0 if the user is unknown. None if the levels aren't read yet or the author is the master
+        user, who still has to be added (see getUserLevel)
+        """
+        if UserLevels.levels is None:
+            return None
+        if isMasterUser(author) and str(author.id) not in UserLevels.levels.keys():
+            return None
+        return UserLevels.levels.get(str(author.id), 0)
+
+    @staticmethod
+    def save(user: User, userLevel: int):
+        """
+        Sets the user level of a discord user. Accesses the database!
+        """
+        DiscordUsers(id=user.id, name=user.name, userLevel=userLevel).save()
+        if UserLevels.levels is not None:
+            UserLevels.levels[str(user.id)] = userLevel
+
+
+def loadCommandoCaches():
+    """
+    Reads the prefix and the user levels into memory, e.g. on startup. Accesses the database!
+    """
+    CommandoIndex.loadPrefix()
+    UserLevels.load()
+
+
 ############################### Response objects ##########################
 
 class CDOInteralResponseData:
@@ -135,47 +260,71 @@ async def sendResponse(responseData):
 
     embObj = getEmbObj(responseData)
 
-    return await client.send_message(responseData.channel, embed=embObj)
+    return await messageQueue.send(responseData.channel, embed=embObj)
 
 
-async def cmdHandler(msg: Message) -> str:
+def getPrefix() -> str:
     """
-    Receives commands and handles it according to allCommandos. Commandos are automatically parsed from the code.
-    :param msg: message from the discord channel
-    :return:
+    Returns the prefix for commandos, ! if none is set.
     """
     try:
         prefix = Settings.objects.get(name="prefix")
-        prefix = prefix.value
+        return prefix.value
     except ObjectDoesNotExist:
-        prefix = "!"
+        return "!"
 
-    for cdos in DiscordCommando.allCommandos():
-        if msg.content.startswith(prefix+cdos.commando):
-            if msg.author.bot:
-                logger.info("Ignoring {msg.content}, because bot")
-                return
 
-            if msg.author.id == masterUserID and len(DiscordUsers.objects.filter(id=masterUserID)) == 0:
-                DiscordUsers(id=masterUserID,name=msg.author.name,userLevel=6).save()
+def isMasterUser(author: User) -> bool:
+    return masterUserID is not None and str(author.id) == str(masterUserID)
 
-            try:
-                userQuery = DiscordUsers.objects.get(id=msg.author.id)
-                authorUserLevel = userQuery.userLevel
-            except ObjectDoesNotExist:
-                authorUserLevel = 0
 
-            if cdos.userLevel <= authorUserLevel:
-                logger.info(f"Handling {cdos.commando}")
-                kwargs = {'cdo': cdos.commando,
-                          'msg': msg,
-                          'userLevel': authorUserLevel}
+def getUserLevel(author: User) -> int:
+    """
+    Returns the userlevel of a discord user. The master user is added with the highest level on its first commando.
+    Only accesses the database if the user levels aren't read yet or the master user is added!
+    :param author: Discord user
+    :return: Userlevel, 0 if the user is unknown
+    """
+    if UserLevels.levels is None:
+        UserLevels.load()
+    if isMasterUser(author) and str(author.id) not in UserLevels.levels.keys():
+        UserLevels.save(author, 6)
+    return UserLevels.levels.get(str(author.id), 0)
+
+
+async def cmdHandler(msg: Message) -> str:
+    """
+    Receives commands and handles it according to the CommandoIndex. Commandos are automatically parsed from the code.
+    :param msg: message from the discord channel
+    :return:
+    """
+    prefix = CommandoIndex.prefix
+    if prefix is None:
+        prefix = await runDB(CommandoIndex.loadPrefix)
+
+    cdos = CommandoIndex.resolve(msg.content, prefix)
+    if cdos is None:
+        return
+
+    if msg.author.bot:
+        logger.info(f"Ignoring {msg.content}, because bot")
+        return
+
+    authorUserLevel = UserLevels.get(msg.author)
+    if authorUserLevel is None:
+        authorUserLevel = await runDB(getUserLevel, msg.author)
+
+    if cdos.userLevel <= authorUserLevel:
+        logger.info(f"Handling {cdos.commando}")
+        kwargs = {'cdo': cdos.commando,
+                  'msg': msg,
+                  'userLevel': authorUserLevel}
 
-                return await cdos.fun(**kwargs)
-            else:
-                responseStr = "I am sorry, you are not allowed to do that"
-                responseData = CDOFullResponseData(msg.channel, cdos.commando, CDOInteralResponseData(responseStr))
-                await sendResponse(responseData)
+        return await cdos.fun(**kwargs)
+    else:
+        responseStr = "I am sorry, you are not allowed to do that"
+        responseData = CDOFullResponseData(msg.channel, cdos.commando, CDOInteralResponseData(responseStr))
+        await sendResponse(responseData)
 
 
 ############################### Decorators ##########################
@@ -212,7 +361,7 @@ class GrpGeneral:
     name = "General"
 
 
-def markCommando(cmd: str, group=GrpGeneral, defaultUserLevel=None):
+def markCommando(cmd: str, group=GrpGeneral, defaultUserLevel=None, aliases: Iterable[str] = ()):
     def internal_func_wrapper(func: callable):
         async def func_wrapper(**kwargs):
             responseDataInternal = await func(**kwargs)
@@ -242,7 +391,7 @@ def markCommando(cmd: str, group=GrpGeneral, defaultUserLevel=None):
                 await client.wait_for_reaction(message=msg,check=pagingCheck)
             return
 
-        DiscordCommando.addCommando(DiscordCommando(cmd, func_wrapper, func.__doc__, group, defaultUserLevel))
+        DiscordCommando.addCommando(DiscordCommando(cmd, func_wrapper, func.__doc__, group, defaultUserLevel), aliases)
         return func_wrapper
 
     return internal_func_wrapper
@@ -10,14 +10,23 @@ import re
 from discord import Reaction,User
 
 from database.models import CompetitionWatcher, Competition, MatchEvents, MatchEventIcon,Settings,DiscordUsers
-from discord_handler.handler import client, watchCompetition,Scheduler
+from discord_handler.handler import client, watchCompetition,Scheduler,queryScheduler
 from discord_handler.cdo_meta import markCommando, CDOInteralResponseData, cmdHandler, emojiList\
-    , DiscordCommando,resetPaging,pageNav
-from discord_handler.liveMatch import LiveMatch
-from api.calls import getLiveMatches,makeMiddlewareCall,DataCalls,getTeamsSearchedByName
+    , DiscordCommando,CommandoIndex,UserLevels,resetPaging,pageNav,getPrefix,getUserLevel
+from database.executor import runDB
+from discord_handler.liveMatch import LiveMatch, EventTracker, MatchState
+from discord_handler.livePoller import livePoller
+from discord_handler.messageQueue import messageQueue, MessagePriority
+from discord_handler.pollingPolicy import PollingPolicies, PollingPolicy
+from discord_handler.scoreboard import Scoreboards
+from discord_handler.guildRouting import GuildRouting
+from discord_handler.bridge import bridge
+from discord_handler.coordinator import coordinator
+from discord_handler.jobScheduler import jobScheduler
+from api.calls import asyncGetLiveMatches,liveDataCache,asyncGetTeamsSearchedByName
 from support.helper import shutdown,checkoutVersion,getVersions,currentVersion
 
-from support.helper import Task
+from support.helper import Task, loopLagMonitor
 
 logger = logging.getLogger(__name__)
 
@@ -80,7 +89,8 @@ async def cdoAddCompetition(**kwargs):
         competition_string = parameter["competition"]
         association = parameter["association"]
 
-    comp = Competition.objects.filter(clear_name=competition_string)
+    comp = await runDB(lambda: list(Competition.objects.filter(clear_name=competition_string)
+                                    .select_related('association')))
 
     logger.debug(f"Available competitions: {comp}")
 
@@ -96,7 +106,9 @@ async def cdoAddCompetition(**kwargs):
             responseData.response = f"Found competitions {name_code} with that name. Please be more specific (add #ENG for example)."
             return responseData
         else:
-            comp = Competition.objects.filter(clear_name=competition_string, association=association)
+            comp = await runDB(lambda: list(Competition.objects.filter(clear_name=competition_string,
+                                                                       association=association)
+                                            .select_related('association')))
             if len(comp) != 1:
                 names = [existing_com.clear_name for existing_com in comp]
                 countryCodes = [existing_com.association for existing_com in comp]
@@ -104,14 +116,16 @@ async def cdoAddCompetition(**kwargs):
                 responseData.response = f"Found competitions {name_code} with that name. Please be more specific (add #ENG for example)."
                 return responseData
 
-    watcher = CompetitionWatcher.objects.filter(competition=comp.first())
+    server = kwargs['msg'].server
+    watcher = await runDB(lambda: list(CompetitionWatcher.objects.filter(competition=comp[0],
+                                                                         applicable_server__discord_id=server.id)))
 
     logger.debug(f"Watcher objects: {watcher}")
 
     if len(watcher) != 0:
         return CDOInteralResponseData(f"Allready watching {competition_string}")
 
-    client.loop.create_task(watchCompetition(comp.first(), kwargs['msg'].server))
+    client.loop.create_task(watchCompetition(comp[0], server))
     responseData.response = f"Start watching competition {competition_string}"
     return responseData
 
@@ -130,23 +144,27 @@ async def cdoRemoveCompetition(**kwargs):
         competition_string = parameter["competition"]
         association = parameter["association"]
 
-    watcher = CompetitionWatcher.objects.filter(competition__clear_name=competition_string)
+    def findWatcher():
+        watcher = CompetitionWatcher.objects.filter(competition__clear_name=competition_string,
+                                                    applicable_server__discord_id=kwargs['msg'].server.id)
+        if len(watcher) > 1:
+            watcher = watcher.filter(competition__association=association)
+        return watcher.select_related('competition', 'applicable_server').first()
 
-    if len(watcher) == 0:
+    watcher = await runDB(findWatcher)
+
+    if watcher is None:
         responseData.response = f"Competition {competition_string} was not monitored"
         return responseData
 
-    if len(watcher) > 1:
-        watcher = watcher.filter(competition__association=association)
-
     logger.info(f"Deleting {watcher}")
-    await Scheduler.removeCompetition(watcher.first())
-    watcher.delete()
+    await Scheduler.removeCompetition(watcher)
+    await runDB(watcher.delete)
     responseData.response = f"Removed {competition_string} from monitoring"
     return responseData
 
 
-@markCommando("monitoredCompetitions")
+@markCommando("monitoredCompetitions", aliases=["monitored"])
 async def cdoShowMonitoredCompetitions(**kwargs):
     """
     Lists all watched competitions by soccerbot.
@@ -156,7 +174,10 @@ async def cdoShowMonitoredCompetitions(**kwargs):
                 f"be added this way):\n\n"
     addInfo = OrderedDict()
     compList = []
-    for watchers in CompetitionWatcher.objects.all():
+    watcherList = await runDB(lambda: list(CompetitionWatcher.objects
+                                           .filter(applicable_server__discord_id=kwargs['msg'].server.id)
+                                           .select_related('competition', 'competition__association')))
+    for watchers in watcherList:
         compList.append(watchers.competition.clear_name)
         try:
             addInfo[watchers.competition.association.clear_name] +=(f"\n{watchers.competition.clear_name}")
@@ -197,10 +218,13 @@ async def cdoListCompetitionByCountry(**kwargs):
         else:
             association += " " + i
 
-    competition = Competition.objects.filter(association__clear_name=association)
+    def findCompetitions():
+        competition = Competition.objects.filter(association__clear_name=association).select_related('association')
+        if len(competition) == 0:
+            competition = Competition.objects.filter(association_id=association).select_related('association')
+        return list(competition)
 
-    if len(competition) == 0:
-        competition = Competition.objects.filter(association_id=association)
+    competition = await runDB(findCompetitions)
 
     if len(competition) == 0:
         responseData.response = f"No competitions were found for {association}"
@@ -242,17 +266,8 @@ async def cdoGetHelp(**kwargs):
     """
     retString = "Available Commandos:"
     addInfo = OrderedDict()
-    try:
-        prefix = Settings.objects.get(name="prefix")
-        prefix = prefix.value
-    except ObjectDoesNotExist:
-        prefix = "!"
-
-    try:
-        userQuery = DiscordUsers.objects.get(id=kwargs['msg'].author.id)
-        authorUserLevel = userQuery.userLevel
-    except ObjectDoesNotExist:
-        authorUserLevel = 0
+    prefix = CommandoIndex.prefix
+    authorUserLevel = kwargs['userLevel']
 
     addInfoList = []
     count = 0
@@ -312,6 +327,36 @@ async def cdoShowRunningTasks(**kwargs):
         args = str(i.args).replace("<", "").replace(">", "").replace(",)", ")")
         addInfo[f"{i.name}{args}"] = f"Started at {i.time}"
 
+    lag = loopLagMonitor.statistics()
+    addInfo["Event loop"] = f"Max lag {lag['maxLag']:.3f}s, blocked {lag['blocked']:.1f}s, {lag['stalls']} stalls"
+    polls = livePoller.statistics()
+    addInfo["Live poller"] = f"{polls['matches']} matches, {polls['pollsPerSecond']:.2f} polls/s, " \
+                             f"lag {polls['meanLag']:.2f}s (max {polls['maxLag']:.2f}s), {polls['errors']} errors"
+    calls = PollingPolicies.statistics()
+    addInfo["Polling policy"] = f"{calls['calls']} FIFA calls, {calls['saved']} saved compared to the fixed " \
+                                f"schedule ({calls['fixedCalls']} calls)"
+    jobs = jobScheduler.statistics()
+    addInfo["Job scheduler"] = f"{jobs['jobs']} jobs, next due {jobs['nextDue']}, {jobs['executed']} executed, " \
+                               f"max lateness {jobs['maxLateness']:.1f}s"
+    routing = GuildRouting.statistics()
+    addInfo["Servers"] = f"{routing['competitions']} competitions routed to {routing['servers']} servers"
+    loaded = await queryScheduler("statistics", {'matchDays': 0, 'competitions': 0, 'liveMatches': 0})
+    addInfo["Matchdays"] = f"{loaded['matchDays']} matchdays of {loaded['competitions']} competitions loaded, " \
+                           f"{loaded['liveMatches']} matches"
+    queue = messageQueue.statistics()
+    addInfo["Message queue"] = f"{queue['depth']} queued ({queue['depthByPriority']['critical']} critical), " \
+                               f"{queue['sent']} sent, latency {queue['meanLatency']:.2f}s " \
+                               f"(max {queue['maxLatency']:.2f}s), {queue['retries']} retries, " \
+                               f"{queue['dropped']} dropped"
+    nodes = coordinator.statistics()
+    if nodes['enabled']:
+        addInfo["Node"] = f"{nodes['node']}, one of {nodes['nodes']} nodes, owns {nodes['competitions']} " \
+                          f"competitions and {', '.join(nodes['duties']) or 'no duties'}, {nodes['takeovers']} takeovers"
+    forwarded = bridge.statistics()
+    if forwarded['role'] is not None:
+        addInfo["Poller process"] = f"{'connected' if forwarded['connected'] else 'disconnected'}, " \
+                                    f"{forwarded['received']} messages received, {forwarded['errors']} errors"
+
     return CDOInteralResponseData(responseString, addInfo)
 
 @markCommando("scores")
@@ -328,9 +373,7 @@ async def cdoScores(**kwargs):
         if not "-matchday-" in channel.name:
             return CDOInteralResponseData("!scores with no argument can only be called within matchday channels")
 
-        comp,md = Scheduler.findCompetitionMatchdayByChannel(channel.name)
-
-        matchList = Scheduler.getScores(comp,md)
+        matchList = await queryScheduler("scores", {}, channelName=channel.name)
 
         resp = CDOInteralResponseData("Current scores:")
         addInfo = OrderedDict()
@@ -352,19 +395,19 @@ async def cdoScores(**kwargs):
         return resp
     else:
         searchString = kwargs['msg'].content.replace(data[0] + " ","")
-        query = Competition.objects.filter(clear_name = searchString)
+        query = await runDB(lambda: list(Competition.objects.filter(clear_name = searchString)))
 
         if len(query) == 0:
-            teamList = getTeamsSearchedByName(searchString)
+            teamList = await asyncGetTeamsSearchedByName(searchString)
             if len(teamList) == 0:
                 return CDOInteralResponseData(f"Can't find team {searchString}")
             matchObj = teamList[0]['Name'][0]['Description']
-            matchList = getLiveMatches(teamID=int(teamList[0]["IdTeam"]))
+            matchList = await asyncGetLiveMatches(teamID=int(teamList[0]["IdTeam"]))
 
         else:
-            comp = query.first()
+            comp = query[0]
             matchObj = comp.clear_name
-            matchList = getLiveMatches(competitionID=comp.id)
+            matchList = await asyncGetLiveMatches(competitionID=comp.id)
 
         if len(matchList) == 0:
             return CDOInteralResponseData(f"No current matches for {matchObj}")
@@ -372,18 +415,16 @@ async def cdoScores(**kwargs):
         addInfo = OrderedDict()
         for matchID in matchList:
             try:
-                data = makeMiddlewareCall(DataCalls.liveData + f"/{matchID}")
+                data = await liveDataCache.get(matchID)
             except JSONDecodeError:
                 logger.error(f"Failed to do a middleware call for {matchID}")
                 continue
 
-            newEvents, _ = LiveMatch.parseEvents(data["match"]["events"], [])
-
-            class Match:
-                id = matchID
+            newEvents = EventTracker().update(data["match"]["events"])
+            state = MatchState.fromLiveData(data["match"])
 
             for event in newEvents:
-                title,_,goalListing = await LiveMatch.beautifyEvent(event,Match)
+                title,_,goalListing = LiveMatch.beautifyEvent(event,state)
 
                 if goalListing != "":
                     try:
@@ -398,19 +439,19 @@ async def cdoScores(**kwargs):
         resp.additionalInfo = addInfo
         return resp
 
-@markCommando("currentGames")
+@markCommando("currentGames", aliases=["current"])
 async def cdoCurrentGames(**kwargs):
     """
     Lists all current games within a matchday channel
     :param kwargs:
     :return:
     """
-    matchList = Scheduler.startedMatches()
+    matchList = await queryScheduler("matches", [], started=True)
     addInfo = OrderedDict()
     addInfoList = []
     count = 0
-    for match in matchList:
-        addInfo[match.title] = f"{match.match.date} (UTC)"
+    for title, date in matchList:
+        addInfo[title] = f"{date} (UTC)"
         count +=1
         if count == 10:
             addInfoList.append(addInfo)
@@ -450,7 +491,7 @@ async def cdoCurrentGames(**kwargs):
 
     return resp
 
-@markCommando("upcomingGames")
+@markCommando("upcomingGames", aliases=["upcoming"])
 async def cdoUpcomingGames(**kwargs):
     """
     Lists all upcoming games
@@ -458,12 +499,12 @@ async def cdoUpcomingGames(**kwargs):
     :return:
     """
 
-    matchList = Scheduler.upcomingMatches()
+    matchList = await queryScheduler("matches", [], started=False)
     addInfo = OrderedDict()
     count = 0
     addInfoList = []
-    for match in matchList:
-        addInfo[match.title] = f"{match.match.date} (UTC)"
+    for title, date in matchList:
+        addInfo[title] = f"{date} (UTC)"
         count +=1
         if count == 10:
             addInfoList.append(addInfo)
@@ -517,7 +558,7 @@ async def cdoSetStartCDO(**kwargs):
     commandString = kwargs['msg'].content.replace(data[0] + " ", "")
 
     obj = Settings(name="startCommando",value=commandString)
-    obj.save()
+    await runDB(obj.save)
     return CDOInteralResponseData(f"Setting startup command to {commandString}")
 
 @markCommando("updateBot", defaultUserLevel=5)
@@ -556,7 +597,7 @@ async def cdoStopBot(**kwargs):
 
     def check(reaction, user):
         if reaction.emoji == emojiList()[0]:
-            client.loop.create_task(client.send_message(kwargs['msg'].channel, "Bot is shutting down in 10 seconds"))
+            messageQueue.put(kwargs['msg'].channel, "Bot is shutting down in 10 seconds", priority=MessagePriority.command)
             client.loop.create_task(shutdown())
             return True
         return False
@@ -572,7 +613,7 @@ async def cdoRestartBot(**kwargs):
     :return:
     """
     try:
-        Settings.objects.get(name="startCommando")
+        await runDB(Settings.objects.get, name="startCommando")
         logger.info(f"Command: {sys.executable} {path+'/../restart.py'}")
         cmdList = [sys.executable,path+"/../restart.py"]
         logger.info(cmdList)
@@ -595,14 +636,59 @@ async def cdoSetPrefix(**kwargs):
         return CDOInteralResponseData("You need to set a command to be executed to start the bot")
 
     commandString = kwargs['msg'].content.replace(data[0] + " ", "")
-    try:
-        prefix = Settings.objects.get(name="prefix")
-        prefix.value = commandString
-    except ObjectDoesNotExist:
-        prefix = Settings(name="prefix",value=commandString)
 
-    prefix.save()
-    return CDOInteralResponseData(f"New prefix is {prefix.value}")
+    prefix = await runDB(CommandoIndex.savePrefix, commandString)
+    return CDOInteralResponseData(f"New prefix is {prefix}")
+
+@markCommando("setPollingPolicy", defaultUserLevel=5)
+async def cdoSetPollingPolicy(**kwargs):
+    """
+    Sets the polling intervals for a competition (e.g. !setPollingPolicy Bundesliga liveInterval=15). Without
+    intervals the competition uses the default again.
+    :param kwargs:
+    :return:
+    """
+    data = kwargs['msg'].content.split(" ")[1:]
+    parameters = OrderedDict()
+    while data != [] and "=" in data[-1]:
+        key, val = data.pop().split("=", 1)
+        if key not in PollingPolicy.parameters:
+            return CDOInteralResponseData(f"Unknown parameter {key}. Available: {', '.join(PollingPolicy.parameters)}")
+        try:
+            parameters[key] = float(val)
+        except ValueError:
+            return CDOInteralResponseData(f"{key} needs to be a number")
+        reason = PollingPolicy.checkParameter(key, parameters[key])
+        if reason is not None:
+            return CDOInteralResponseData(reason)
+
+    competition = " ".join(data)
+    if competition == "":
+        return CDOInteralResponseData("Needs !setPollingPolicy competition parameter=value ...")
+    if not await runDB(lambda: Competition.objects.filter(clear_name=competition).exists()):
+        return CDOInteralResponseData(f"Can't find competition {competition}")
+
+    policy = await runDB(PollingPolicies.save, competition, parameters if parameters != OrderedDict() else None)
+    if bridge.isDiscord():
+        # the matches are polled in the poller process
+        bridge.send("reloadPolicies")
+    return CDOInteralResponseData(f"Polling policy for {competition}: {policy}")
+
+@markCommando("scoreboard", defaultUserLevel=5)
+async def cdoScoreboard(**kwargs):
+    """
+    Enables (!scoreboard on) or disables (!scoreboard off) the pinned scoreboard in the matchday channels, which is
+    edited whenever a match scores or changes its phase.
+    :param kwargs:
+    :return:
+    """
+    data = kwargs['msg'].content.split(" ")
+    if len(data) != 2 or data[1] not in ["on", "off"]:
+        return CDOInteralResponseData("Needs !scoreboard on or !scoreboard off")
+
+    await runDB(Scoreboards.save, data[1] == "on")
+    Scoreboards.apply(data[1] == "on")
+    return CDOInteralResponseData(f"Scoreboards are {data[1]}")
 
 @markCommando("setUserPermissions", defaultUserLevel=5)
 async def cdoSetUserPermissions(**kwargs):
@@ -633,7 +719,7 @@ async def cdoSetUserPermissions(**kwargs):
 
     retString = ""
     for user in kwargs['msg'].mentions:
-        DiscordUsers(id=user.id,name=user.name,userLevel=userLevel).save()
+        await runDB(UserLevels.save, user, userLevel)
         retString += f"Setting {user.name} with id {user.id} to user level {userLevel}\n"
 
     return CDOInteralResponseData(retString)
@@ -661,7 +747,7 @@ async def cdoGetUserPermissions(**kwargs):
     addInfo = OrderedDict()
     for user in kwargs['msg'].mentions:
         try:
-            user = DiscordUsers.objects.get(id=user.id)
+            user = await runDB(DiscordUsers.objects.get, id=user.id)
             addInfo[user.name] = f"User level: {user.userLevel}"
         except ObjectDoesNotExist:
             addInfo[user.name] = f"User level: 0"
@@ -0,0 +1,87 @@
+import logging
+from typing import Iterable, List, Union
+from discord import Channel, Server
+
+from discord_handler.client import toDiscordChannelName
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelRegistry:
+    """
+    Index of the channels of all servers, keyed by server id and channel name. It is filled once the client is ready
+    and kept up to date by the channel and server events of the client (see __main__). Lookups never iterate over the
+    channels of the client, which change while a coroutine is waiting.
+    """
+    channels = {}
+    byName = {}
+
+    @staticmethod
+    def add(channel: Channel):
+        if channel.is_private or channel.server is None:
+            return
+        ChannelRegistry.channels[(channel.server.id, channel.name)] = channel
+        ChannelRegistry.byName.setdefault(channel.name, {})[channel.server.id] = channel
+
+    @staticmethod
+    def remove(channel: Channel):
+        if channel.is_private or channel.server is None:
+            return
+        key = (channel.server.id, channel.name)
+        if ChannelRegistry.channels.get(key) is not None and ChannelRegistry.channels[key].id == channel.id:
+            del ChannelRegistry.channels[key]
+            del ChannelRegistry.byName[channel.name][channel.server.id]
+            if ChannelRegistry.byName[channel.name] == {}:
+                del ChannelRegistry.byName[channel.name]
+
+    @staticmethod
+    def update(before: Channel, after: Channel):
+        ChannelRegistry.remove(before)
+        ChannelRegistry.add(after)
+
+    @staticmethod
+    def addServer(server: Server):
+        for channel in list(server.channels):
+            ChannelRegistry.add(channel)
+
+    @staticmethod
+    def removeServer(server: Server):
+        for channel in [i for (serverID, name), i in ChannelRegistry.channels.items() if serverID == server.id]:
+            ChannelRegistry.remove(channel)
+
+    @staticmethod
+    def rebuild(servers: Iterable[Server]):
+        """
+        Builds the registry from scratch, for example when the client is ready.
+        :param servers: All servers of the client
+        """
+        ChannelRegistry.channels = {}
+        ChannelRegistry.byName = {}
+        for server in list(servers):
+            ChannelRegistry.addServer(server)
+        logger.info(f"Channel registry contains {len(ChannelRegistry.channels)} channels")
+
+    @staticmethod
+    def get(server: Server, channelName: str) -> Union[Channel, None]:
+        """
+        Returns the channel with the given name on a server, None if it doesn't exist.
+        """
+        return ChannelRegistry.channels.get((server.id, toDiscordChannelName(channelName)))
+
+    @staticmethod
+    def getByServerID(serverID: str, channelName: str) -> Union[Channel, None]:
+        """
+        Returns the channel with the given name on the server with the given id, None if it doesn't exist.
+        """
+        return ChannelRegistry.channels.get((serverID, toDiscordChannelName(channelName)))
+
+    @staticmethod
+    def getByName(channelName: str) -> List[Channel]:
+        """
+        Returns the channels with the given name on all servers.
+        """
+        return list(ChannelRegistry.byName.get(toDiscordChannelName(channelName), {}).values())
+
+    @staticmethod
+    def allChannels() -> List[Channel]:
+        return list(ChannelRegistry.channels.values())
@@ -0,0 +1,213 @@
+import logging
+import math
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Set, Tuple, Union
+
+from django.db import IntegrityError, transaction
+
+from database.models import Lease
+from discord_handler.jobScheduler import utcNow
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLeaseStore:
+    """
+    Leases held in memory. Stand-in for the database within a single process, e.g. for tests with several nodes.
+    """
+    def __init__(self):
+        self.leases = {}
+        self.lock = Lock()
+
+    def acquire(self, name: str, owner: str, expires: datetime, now: datetime) -> Tuple[bool, Union[str, None]]:
+        """
+        Takes or renews a lease, if it is free, expired or already held by the owner.
+        :return: Whether the owner holds the lease now and the node that held it before, if it was another one
+        """
+        with self.lock:
+            held = self.leases.get(name)
+            if held is not None and held[0] != owner and held[1] >= now:
+                return False, None
+            self.leases[name] = (owner, expires)
+            return True, held[0] if held is not None and held[0] != owner else None
+
+    def release(self, name: str, owner: str):
+        with self.lock:
+            if self.leases.get(name, (None,))[0] == owner:
+                del self.leases[name]
+
+    def holders(self, prefix: str, now: datetime) -> Dict[str, str]:
+        """
+        Returns the owners of the leases starting with prefix that didn't expire.
+        """
+        with self.lock:
+            return dict((name, owner) for name, (owner, expires) in self.leases.items()
+                        if name.startswith(prefix) and expires >= now)
+
+
+class DatabaseLeaseStore:
+    """
+    Leases held in the database shared by all nodes. Leases are taken with a compare and swap on the row, so only
+    one node wins a race. Accesses the database!
+    """
+    def acquire(self, name: str, owner: str, expires: datetime, now: datetime) -> Tuple[bool, Union[str, None]]:
+        lease = Lease.objects.filter(name=name).first()
+        if lease is None:
+            try:
+                with transaction.atomic():
+                    Lease(name=name, owner=owner, expires=expires).save()
+                return True, None
+            except IntegrityError:
+                # another node created it in the meantime
+                return False, None
+        if lease.owner != owner and lease.expires >= now:
+            return False, None
+        updated = Lease.objects.filter(name=name, owner=lease.owner, expires=lease.expires)\
+            .update(owner=owner, expires=expires)
+        if updated != 1:
+            return False, None
+        return True, lease.owner if lease.owner != owner else None
+
+    def release(self, name: str, owner: str):
+        Lease.objects.filter(name=name, owner=owner).delete()
+
+    def holders(self, prefix: str, now: datetime) -> Dict[str, str]:
+        return dict(Lease.objects.filter(name__startswith=prefix, expires__gte=now).values_list('name', 'owner'))
+
+
+class Coordinator:
+    """
+    Assigns duties and watched competitions to exactly one of several bot nodes sharing a database. Every node holds
+    a lease for itself (its heartbeat) and for everything it owns, the leases are renewed every renewInterval and
+    expire after leaseTime. A node that stops renewing loses its leases and the other nodes take them over after at
+    most leaseTime + renewInterval. Competitions are spread over the live nodes: a node only takes free competitions
+    while it owns less than its share and gives up one per cycle while it owns more.
+
+    Without a store (a single node) coordination is disabled and the node owns everything.
+    """
+    nodePrefix = "node:"
+    competitionPrefix = "competition:"
+    dutyPrefix = "duty:"
+    maintenanceDuty = "maintenance"
+    commandsDuty = "commands"
+
+    def __init__(self, store=None, node: str = None, leaseTime: float = 30, renewInterval: float = 10,
+                 clock: Callable = utcNow):
+        """
+        :param store: LocalLeaseStore or DatabaseLeaseStore, None disables the coordination
+        :param node: Unique name of the node, host name and pid if None
+        :param leaseTime: Seconds until a lease that isn't renewed expires
+        :param renewInterval: Seconds between two cycles
+        :param clock: Returns the current time as aware datetime, replaceable for tests
+        """
+        self.store = store
+        self.node = node if node is not None else f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.leaseTime = timedelta(seconds=leaseTime)
+        self.renewInterval = renewInterval
+        self.clock = clock
+        self.duties = set()
+        self.competitions = set()
+        self.renewedAt = None
+        self.nodes = 1
+        self.takeovers = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def ownsDuty(self, duty: str) -> bool:
+        return not self.enabled or duty in self.duties
+
+    def ownsCompetition(self, competition: str) -> bool:
+        return not self.enabled or competition in self.competitions
+
+    def claim(self, name: str, expires: datetime, now: datetime) -> Tuple[bool, Union[str, None]]:
+        return self.store.acquire(name, self.node, expires, now)
+
+    def cycle(self, competitions: Iterable[str], busy: Set[str] = frozenset()) \
+            -> Tuple[List[Tuple[str, Union[str, None]]], List[str]]:
+        """
+        Renews the leases of the node and takes or gives up competitions. Accesses the database with the
+        DatabaseLeaseStore!
+        :param competitions: Names of all watched competitions
+        :param busy: Competitions with running matches, these are not given up to balance the nodes
+        :return: Acquired competitions with the node that held them before (a takeover) and lost competitions
+        """
+        now = self.clock()
+        expires = now + self.leaseTime
+        self.claim(Coordinator.nodePrefix + self.node, expires, now)
+        self.nodes = max(1, len(self.store.holders(Coordinator.nodePrefix, now)))
+
+        for duty in [Coordinator.maintenanceDuty, Coordinator.commandsDuty]:
+            if self.claim(Coordinator.dutyPrefix + duty, expires, now)[0]:
+                self.duties.add(duty)
+            else:
+                self.duties.discard(duty)
+
+        competitions = set(competitions)
+        lost = []
+        for competition in sorted(self.competitions):
+            if competition not in competitions:
+                # not watched anymore
+                self.store.release(Coordinator.competitionPrefix + competition, self.node)
+                lost.append(competition)
+            elif not self.claim(Coordinator.competitionPrefix + competition, expires, now)[0]:
+                logger.warning(f"Lost the lease of {competition}")
+                lost.append(competition)
+        self.competitions -= set(lost)
+
+        share = math.ceil(len(competitions) / self.nodes)
+        acquired = []
+        held = self.store.holders(Coordinator.competitionPrefix, now)
+        for competition in sorted(competitions - self.competitions):
+            if len(self.competitions) >= share:
+                break
+            if Coordinator.competitionPrefix + competition in held.keys():
+                continue
+            success, previousOwner = self.claim(Coordinator.competitionPrefix + competition, expires, now)
+            if success:
+                self.competitions.add(competition)
+                acquired.append((competition, previousOwner))
+                if previousOwner is not None:
+                    self.takeovers += 1
+                    logger.info(f"Took over {competition} from {previousOwner}")
+
+        idle = sorted(self.competitions - set(busy))
+        if len(self.competitions) > share and idle != []:
+            self.store.release(Coordinator.competitionPrefix + idle[0], self.node)
+            self.competitions.discard(idle[0])
+            lost.append(idle[0])
+        self.renewedAt = now
+        return acquired, lost
+
+    def expired(self) -> bool:
+        """
+        Returns whether the leases of the node may have expired, because the last successful cycle is too long ago.
+        """
+        return self.renewedAt is not None and self.clock() - self.renewedAt >= self.leaseTime
+
+    def dropAll(self) -> List[str]:
+        """
+        Gives up everything locally, e.g. when the leases couldn't be renewed in time.
+        :return: The competitions that were owned
+        """
+        lost = sorted(self.competitions)
+        self.competitions = set()
+        self.duties = set()
+        self.renewedAt = None
+        return lost
+
+    def statistics(self) -> Dict:
+        return {'enabled': self.enabled,
+                'node': self.node,
+                'nodes': self.nodes,
+                'competitions': len(self.competitions),
+                'duties': sorted(self.duties),
+                'takeovers': self.takeovers}
+
+
+coordinator = Coordinator()
@@ -0,0 +1,82 @@
+import logging
+from typing import Dict, List, Set
+
+from discord import Channel, Server
+
+from database.models import CompetitionWatcher
+from discord_handler.channelRegistry import ChannelRegistry
+from discord_handler.client import client
+
+logger = logging.getLogger(__name__)
+
+
+class GuildRouting:
+    """
+    Index of the servers watching each competition, keyed by competition name. Every match is polled once, its
+    matchday channels and messages are fanned out to the servers of its competition. Lookups only touch the servers
+    of a competition, so the cost of a post doesn't grow with the number of servers of the bot.
+    """
+    servers = {}
+
+    @staticmethod
+    def load(serverIDs: Dict[str, str]):
+        """
+        Reads the servers of all watchers. Servers that were stored by name only are matched with the servers of
+        the client and their id is stored. Accesses the database!
+        :param serverIDs: Name to id of the servers of the client
+        """
+        routing = {}
+        for watcher in CompetitionWatcher.objects.select_related('competition', 'applicable_server'):
+            server = watcher.applicable_server
+            if server.discord_id is None:
+                if server.name not in serverIDs.keys():
+                    logger.warning(f"Can't find server {server.name} of {watcher.competition.clear_name}")
+                    continue
+                server.discord_id = serverIDs[server.name]
+                server.save()
+            routing.setdefault(watcher.competition.clear_name, set()).add(server.discord_id)
+        GuildRouting.servers = routing
+        logger.info(f"Routing {len(routing)} competitions to {len(set().union(*routing.values()))} servers")
+
+    @staticmethod
+    def add(competition: str, serverID: str):
+        GuildRouting.servers.setdefault(competition, set()).add(serverID)
+
+    @staticmethod
+    def remove(competition: str, serverID: str) -> bool:
+        """
+        Removes a server from a competition.
+        :return: True if other servers still watch the competition
+        """
+        serverIDs = GuildRouting.servers.get(competition, set())
+        serverIDs.discard(serverID)
+        if serverIDs == set():
+            GuildRouting.servers.pop(competition, None)
+            return False
+        return True
+
+    @staticmethod
+    def serverIDs(competition: str) -> Set[str]:
+        return GuildRouting.servers.get(competition, set())
+
+    @staticmethod
+    def getServers(competition: str) -> List[Server]:
+        """
+        Returns the servers watching a competition the bot is a member of.
+        """
+        servers = [client.get_server(i) for i in GuildRouting.serverIDs(competition)]
+        return [i for i in servers if i is not None]
+
+    @staticmethod
+    def channels(competition: str, channelName: str) -> List[Channel]:
+        """
+        Returns the channels with the given name on the servers watching a competition.
+        """
+        channels = [ChannelRegistry.getByServerID(i, channelName) for i in GuildRouting.serverIDs(competition)]
+        return [i for i in channels if i is not None]
+
+    @staticmethod
+    def statistics() -> Dict:
+        return {'competitions': len(GuildRouting.servers),
+                'servers': len(set().union(*GuildRouting.servers.values())),
+                'routes': sum(len(i) for i in GuildRouting.servers.values())}
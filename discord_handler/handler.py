@@ -1,16 +1,32 @@
 import logging
 from datetime import timedelta, datetime
 import asyncio
-from discord import Server
+from discord import Server, Embed
 from pytz import UTC
-from typing import Tuple,Dict
+from typing import Tuple,Dict,List
 from collections import OrderedDict
 
-from database.models import CompetitionWatcher,  DiscordServer, Season, Competition
+from database.models import CompetitionWatcher,  DiscordServer, Season, Competition, Match
 from database.handler import updateOverlayData, updateMatches, getNextMatchDayObjects, getCurrentMatches
+from database.handler import getWindowMatches
 from database.handler import updateMatchesSingleCompetition, getAllSeasons, getAndSaveData,compDict
+from database.handler import MatchChangeSet, newMatchDay, addToMatchDay, updateMatchDayBoundaries, matchDayLists
+from database.executor import runDB
+from discord_handler.liveMatch import LiveMatch
+from discord_handler.livePoller import livePoller
+from discord_handler.pollingPolicy import PollingPolicies
+from discord_handler.scoreboard import Scoreboards
+from discord_handler.jobScheduler import jobScheduler
 from support.helper import task
 from discord_handler.client import client,toDiscordChannelName
+from discord_handler.channelRegistry import ChannelRegistry
+from discord_handler.guildRouting import GuildRouting
+from discord_handler.messageQueue import messageQueue, MessagePriority
+from discord_handler.scoreboard import MatchSnapshot
+from discord_handler.bridge import bridge
+from discord_handler.templates import TemplateSheet
+from discord_handler.coordinator import coordinator, Coordinator
+from discord_handler.cdo_meta import loadCommandoCaches
 
 logger = logging.getLogger(__name__)
 
@@ -21,12 +37,11 @@ async def createChannel(server: Server, channelName: str):
     :param server: Server object --> relevant server for the channel
     :param channelName: Name of the channel that is to be created
     """
-    for i in client.get_all_channels():
-        if i.name == toDiscordChannelName(channelName) and i.server == server:
-            logger.debug(f"Channel {channelName} already available ")
-            return
+    if ChannelRegistry.get(server, channelName) is not None:
+        logger.debug(f"Channel {channelName} already available ")
+        return
     logger.info(f"Creating channel {channelName} on {server.name}")
-    await client.create_channel(server, channelName)
+    ChannelRegistry.add(await client.create_channel(server, channelName))
 
 
 async def deleteChannel(server: Server, channelName: str):
@@ -35,31 +50,32 @@ async def deleteChannel(server: Server, channelName: str):
     :param server: Server object --> relevant server for the channel
     :param channelName: Name of the channel that is to be deleted
     """
-    for i in client.get_all_channels():
-        if i.name == toDiscordChannelName(channelName) and i.server == server:
-            logger.debug(f"Deleting channel {toDiscordChannelName(channelName)} on {server.name}")
-            await client.delete_channel(i)
-            break
+    channel = ChannelRegistry.get(server, channelName)
+    if channel is not None:
+        logger.debug(f"Deleting channel {toDiscordChannelName(channelName)} on {server.name}")
+        await client.delete_channel(channel)
+        ChannelRegistry.remove(channel)
+        Scoreboards.remove(channel.name)
 
 
 async def removeOldChannels():
     """
     Removes all channels with the name *-matchday-* in them.
     """
-    deleteChannelList = []
-    #these two loops are split up, as the it raises an error when the dict changes.
-    for i in client.get_all_channels():
+    for i in ChannelRegistry.allChannels():
         if "-matchday-" in i.name:
             logger.info(f"Deleting old channel {i.name}")
-            deleteChannelList.append((i.server, i.name))
-
-    for i in deleteChannelList:
-        await deleteChannel(i[0], i[1])
+            await deleteChannel(i.server, i.name)
 
 class Scheduler:
     matchDayObject = {}
-    matchSchedulerRunning = asyncio.Event(loop=client.loop)
-    maintananceSynchronizer = asyncio.Event(loop=client.loop)
+    # matches join the live poller this long before their kickoff, the matchday channel is created as early
+    matchStartLead = timedelta(hours=1)
+    # only the matchdays with matches between windowPast ago and windowFuture ahead are loaded. The window advances
+    # every windowStep, loading the matchdays that enter it and evicting the ones that have passed
+    windowPast = timedelta(days=1)
+    windowFuture = timedelta(days=7)
+    windowStep = timedelta(hours=6)
 
     @staticmethod
     @task
@@ -69,20 +85,30 @@ class Scheduler:
         always done at 24:00 UTC. Should be called via create_task!
         """
         logger.debug("Waiting for client ready.")
-        await client.wait_until_ready()
+        await Scheduler.waitUntilReady()
         logger.debug("Client ready, starting loop")
+        # with several nodes the duties are only known after the first cycle of the coordination
+        while coordinator.enabled and coordinator.renewedAt is None:
+            await asyncio.sleep(1)
+        firstRun = True
         while True:
-            # take synchronization object, during update no live thread should run!
-            Scheduler.maintananceSynchronizer.set()
             targetTime = datetime.utcnow().replace(hour=0, minute=0, second=0) + timedelta(days=1)
             logger.info("Data maintanance running ...")
 
-            # update competitions, seasons etc. Essentially the data that is always there
-            updateOverlayData()
-            # update all matches for the monitored competitions
-            updateMatches()
+            # update competitions, seasons etc. Essentially the data that is always there. The sync runs on the
+            # database executor, so live threads and commandos keep running in the meantime
+            if coordinator.ownsDuty(Coordinator.maintenanceDuty):
+                await runDB(updateOverlayData)
+            # update all matches for the monitored competitions and apply the changes to the running scheduler. With
+            # several nodes every node updates the competitions it owns, acquired competitions are updated when they
+            # are loaded
+            if not (coordinator.enabled and firstRun):
+                changeSets = await runDB(updateMatches, list(coordinator.competitions) if coordinator.enabled else None)
+                for competition, changeSet in changeSets.items():
+                    Scheduler.applyChangeSet(competition, changeSet)
+            await Scheduler.advanceWindow()
+            firstRun = False
 
-            Scheduler.maintananceSynchronizer.clear()
             logger.info(f"Sleeping for {targetTime}")
             await asyncio.sleep(calculateSleepTime(targetTime))
 
@@ -90,81 +116,360 @@ class Scheduler:
     @task
     async def matchScheduler():
         """
-        Parses all available matches for a given matchday and starts them if necessary.
+        Loads the matchdays within the window of all watched competitions and schedules their jobs: the matchday
+        channel is created at the start of a matchday and deleted at its end, every match joins the live poller
+        matchStartLead before its kickoff.
         """
         logger.debug("Waiting for client ready.")
-        await client.wait_until_ready()
+        await Scheduler.waitUntilReady()
         logger.debug("Client ready, starting loop")
-        Scheduler.matchDayObject = getNextMatchDayObjects() #add competition adds new competitions to this.
+        await runDB(PollingPolicies.load)
+        if not bridge.isPoller():
+            await runDB(Scoreboards.load)
+            await runDB(GuildRouting.load, dict((i.name, i.id) for i in list(client.servers)))
+        if coordinator.enabled:
+            # competitions are loaded once this node owns them
+            Scheduler.matchDayObject = {}
+            asyncio.ensure_future(Scheduler.coordinationScheduler())
+        else:
+            #add competition adds new competitions to this.
+            Scheduler.matchDayObject = await runDB(getNextMatchDayObjects, Scheduler.window())
+        for competition in Scheduler.matchDayObject.keys():
+            Scheduler.scheduleCompetition(competition)
+        jobScheduler.schedule("advanceWindow", jobScheduler.clock() + Scheduler.windowStep, Scheduler.advanceWindow)
 
+    @staticmethod
+    @task
+    async def coordinationScheduler():
+        """
+        Renews the leases of this node every renewInterval. Competitions that this node acquired are loaded, the
+        ones it lost are unloaded. If the leases can't be renewed in time, everything is unloaded, another node
+        has taken over by then.
+        """
         while True:
-            Scheduler.matchSchedulerRunning.set()
-            Scheduler.maintananceSynchronizer.wait()
-
+            ownedCommands = coordinator.ownsDuty(Coordinator.commandsDuty)
             try:
-                for competition,matchObject in Scheduler.matchDayObject.items():
-                    for md,data in matchObject.items():
-                        logger.debug(f"Checking {competition}:{matchObject} for {md}")
-                        currentTime = datetime.utcnow().replace(tzinfo=UTC)
-                        logger.debug(f"CurrentTime {currentTime}, startTime {data['start']} endTime {data['end']}")
-
-                        if data['start'] < currentTime and data['end'] > currentTime:
-                            logger.debug("Current time within boundaries, starting match")
-                            await asyncCreateChannel(data['channel_name'])
-                            logger.debug("Looking into upcoming matches: ")
-                            for i in data['upcomingMatches']:
-                                logger.debug(f"Match {i}, flag runningStarted {i.runningStarted}")
-                                if not i.runningStarted:
-                                    logger.debug(f"Starting task {i}")
-                                    client.loop.create_task(i.runMatchThread())
-                                    logger.debug(f"Waiting for {i} to have started")
-                                    i.lock.wait()
-                                    logger.debug(f"{i} started")
-                                data['currentMatches'].append(i)
-                                data['upcomingMatches'].remove(i)
-
-                            await asyncio.sleep(5)
-
-                            logger.debug("Looking into currentMatches")
-                            for i in data['currentMatches']:
-                                logger.debug(f"Match {i}, flags runningStarted {i.runningStarted}, passed {i.passed}")
-
-                                if not i.runningStarted:
-                                    logger.debug(f"Starting i, as it is not started but in currentMatches")
-                                    client.loop.create_task(i.runMatchThread())
-                                    logger.debug(f"Watiting for {i} to have started")
-                                    i.lock.wait()
-
-                                if i.passed:
-                                    logger.debug(f"{i} has passed, moving it to passedMatches")
-                                    data['passedMatches'].append(i)
-                                    data['currentMatches'].remove(i)
-
-                            await asyncio.sleep(5)
-
-                        elif data['end'] < currentTime:
-                            await asyncDeleteChannel(data['channel_name'])
-
-            except RuntimeError:
-                logger.error("Dict size changed!")
-                await asyncio.sleep(5)
+                await runDB(GuildRouting.load, dict((i.name, i.id) for i in list(client.servers)))
+                acquired, lost = await runDB(coordinator.cycle, list(GuildRouting.servers.keys()),
+                                             Scheduler.busyCompetitions())
+                if not ownedCommands and coordinator.ownsDuty(Coordinator.commandsDuty):
+                    # the prefix or user levels may have been changed on the node that answered the commands so far
+                    await runDB(loadCommandoCaches)
+                # policies are set on the node answering the commands, but used by the nodes polling the matches
+                await runDB(PollingPolicies.load)
+            except Exception as e:
+                logger.exception(f"Renewing the leases failed: {e}")
+                acquired = []
+                lost = coordinator.dropAll() if coordinator.expired() else []
+            for competition in lost:
+                logger.info(f"Unloading {competition}, it is owned by another node")
+                Scheduler.unloadCompetition(competition)
+            for competition, previousOwner in acquired:
+                await Scheduler.loadCompetition(competition, previousOwner is not None)
+            await asyncio.sleep(coordinator.renewInterval)
+
+    @staticmethod
+    async def loadCompetition(competition : str, resume : bool = False):
+        """
+        Loads and schedules the matchdays of a competition this node acquired, after updating its matches.
+        :param competition: Name of the competition
+        :param resume: The competition was taken over from another node, matches that are running don't post what
+        was already posted
+        """
+        watcher = await runDB(lambda: CompetitionWatcher.objects.select_related('competition')
+                              .filter(competition__clear_name=competition).first())
+        if watcher is None or competition in Scheduler.matchDayObject.keys():
+            return
+        try:
+            # the previous owner may not have updated the matches since the last nightly sync
+            await runDB(updateMatches, [competition])
+        except Exception as e:
+            logger.exception(f"Updating the matches of {competition} failed, loading the stored ones: {e}")
+        matchDays = await runDB(compDict, watcher, Scheduler.window())
+        if resume:
+            for data in matchDays.values():
+                for liveMatch in data['currentMatches']:
+                    liveMatch.resumed = True
+        Scheduler.matchDayObject[competition] = matchDays
+        Scheduler.scheduleCompetition(competition)
+
+    @staticmethod
+    def busyCompetitions() -> set:
+        """
+        Returns the competitions with matches in the live poller.
+        """
+        return set(competition for competition, matchObject in Scheduler.matchDayObject.items()
+                   if any(liveMatch.runningStarted for data in matchObject.values() for key in matchDayLists
+                          for liveMatch in data[key]))
+
+    @staticmethod
+    async def waitUntilReady():
+        # the poller process has no discord client
+        if not bridge.isPoller():
+            await client.wait_until_ready()
+
+    @staticmethod
+    def window() -> Tuple[datetime, datetime]:
+        now = jobScheduler.clock()
+        return now - Scheduler.windowPast, now + Scheduler.windowFuture
+
+    @staticmethod
+    async def advanceWindow():
+        """
+        Moves the window to the current time: matchdays that entered it are loaded and scheduled, matchdays that
+        ended before it are evicted. Runs every windowStep.
+        """
+        window = Scheduler.window()
+        matches = await runDB(getWindowMatches, window)
+        for competition, matchList in matches.items():
+            # competitions that are added in the meantime are loaded by addCompetition
+            if competition in Scheduler.matchDayObject.keys():
+                Scheduler.loadMatches(competition, matchList)
+                Scheduler.evictMatchDays(competition, window[0])
+        jobScheduler.schedule("advanceWindow", jobScheduler.clock() + Scheduler.windowStep, Scheduler.advanceWindow)
+
+    @staticmethod
+    def loadMatches(competition : str, matches : List[Match]):
+        """
+        Adds the matches that are not loaded yet to their matchdays and schedules the touched matchdays.
+        :param competition: Name of the competition
+        :param matches: Match objects of the competition
+        """
+        matchDays = Scheduler.matchDayObject[competition]
+        loaded = set(liveMatch.match.id for data in matchDays.values() for key in matchDayLists
+                     for liveMatch in data[key])
+        touched = set()
+        for match in matches:
+            if match.id not in loaded:
+                Scheduler.addLiveMatch(competition, LiveMatch(match))
+                touched.add(match.matchday)
+
+        for md in touched:
+            updateMatchDayBoundaries(matchDays[md])
+            Scheduler.scheduleMatchDay(competition, md)
+
+    @staticmethod
+    def evictMatchDays(competition : str, before : datetime):
+        """
+        Removes the matchdays of a competition that ended before the given time. Matchdays with a match that is
+        still polled are kept.
+        """
+        matchDays = Scheduler.matchDayObject[competition]
+        for md, data in list(matchDays.items()):
+            if 'end' not in data.keys() or data['end'] >= before:
+                continue
+            if any(liveMatch.runningStarted for key in matchDayLists for liveMatch in data[key]):
                 continue
-            Scheduler.matchSchedulerRunning.clear()
-            await asyncio.sleep(60)
+            logger.debug(f"Evicting matchday {md} of {competition}")
+            Scheduler.unscheduleMatchDay(competition, md)
+            del matchDays[md]
 
     @staticmethod
-    def addCompetition(competition : CompetitionWatcher):
+    def scheduleCompetition(competition : str):
+        for md in Scheduler.matchDayObject[competition].keys():
+            Scheduler.scheduleMatchDay(competition, md)
+
+    @staticmethod
+    def scheduleMatchDay(competition : str, md : int):
+        """
+        (Re)schedules the jobs of a matchday from its boundaries and the dates of its matches. Only the jobs of this
+        matchday are touched.
+        :param competition: Name of the competition
+        :param md: Matchday
+        """
+        data = Scheduler.matchDayObject[competition][md]
+        if 'start' not in data.keys():
+            return
+        if data['end'] <= jobScheduler.clock():
+            jobScheduler.cancel(("createChannel", competition, md))
+            # the poller process doesn't know the channels, the discord process deletes them if they exist
+            if bridge.isPoller() or GuildRouting.channels(competition, data['channel_name']) != []:
+                jobScheduler.schedule(("deleteChannel", competition, md), data['end'], Scheduler.endMatchDay,
+                                      competition, md)
+            else:
+                jobScheduler.cancel(("deleteChannel", competition, md))
+            return
+
+        jobScheduler.schedule(("createChannel", competition, md), data['start'], Scheduler.startMatchDay,
+                              competition, md)
+        jobScheduler.schedule(("deleteChannel", competition, md), data['end'], Scheduler.endMatchDay, competition, md)
+        for key in ['currentMatches', 'upcomingMatches']:
+            for liveMatch in data[key]:
+                if not liveMatch.runningStarted:
+                    jobScheduler.schedule(("startMatch", liveMatch.match.id),
+                                          liveMatch.match.date.replace(tzinfo=UTC) - Scheduler.matchStartLead,
+                                          Scheduler.startMatch, competition, liveMatch)
+        for liveMatch in data['passedMatches']:
+            jobScheduler.cancel(("startMatch", liveMatch.match.id))
+
+    @staticmethod
+    def unscheduleMatchDay(competition : str, md : int):
+        jobScheduler.cancel(("createChannel", competition, md))
+        jobScheduler.cancel(("deleteChannel", competition, md))
+        for key in matchDayLists:
+            for liveMatch in Scheduler.matchDayObject[competition][md][key]:
+                jobScheduler.cancel(("startMatch", liveMatch.match.id))
+
+    @staticmethod
+    async def startMatchDay(competition : str, md : int):
+        data = Scheduler.matchDayObject.get(competition, {}).get(md)
+        if data is not None:
+            await asyncCreateChannel(competition, data['channel_name'])
+
+    @staticmethod
+    def startMatch(competition : str, liveMatch : LiveMatch):
+        """
+        Moves a match to the current matches of its matchday and adds it to the live poller.
+        """
+        data = Scheduler.matchDayObject.get(competition, {}).get(liveMatch.match.matchday)
+        if data is None:
+            return
+        if liveMatch in data['upcomingMatches']:
+            data['upcomingMatches'].remove(liveMatch)
+            data['currentMatches'].append(liveMatch)
+        if not liveMatch.runningStarted:
+            logger.debug(f"Adding {liveMatch} to the live poller")
+            livePoller.join(liveMatch)
+
+    @staticmethod
+    async def endMatchDay(competition : str, md : int):
+        """
+        Moves the passed matches of a matchday to passedMatches and deletes its channel.
+        """
+        data = Scheduler.matchDayObject.get(competition, {}).get(md)
+        if data is None:
+            return
+        for liveMatch in list(data['currentMatches']):
+            if liveMatch.passed:
+                logger.debug(f"{liveMatch} has passed, moving it to passedMatches")
+                data['passedMatches'].append(liveMatch)
+                data['currentMatches'].remove(liveMatch)
+        await asyncDeleteChannel(competition, data['channel_name'])
+
+    @staticmethod
+    async def addCompetition(competition : CompetitionWatcher):
+        """
+        Routes a competition to the server of the watcher. The matchdays are only loaded if no other server watches
+        the competition yet, otherwise the server gets the channels of the running matchdays.
+        """
         logger.debug(f"Adding {competition} to Scheduler")
-        Scheduler.matchSchedulerRunning.wait()
-        Scheduler.matchDayObject[competition.competition.clear_name] = compDict(competition)
+        name = competition.competition.clear_name
+        server = client.get_server(competition.applicable_server.discord_id)
+        GuildRouting.add(name, competition.applicable_server.discord_id)
+        if bridge.isDiscord():
+            # the matchdays are loaded by the poller process
+            bridge.send("addCompetition", watcher=competition.id)
+            return
+        if coordinator.enabled:
+            # the node that acquires the competition loads it
+            return
+        if name in Scheduler.matchDayObject.keys():
+            now = jobScheduler.clock()
+            for data in Scheduler.matchDayObject[name].values():
+                if server is not None and 'start' in data.keys() and data['start'] <= now < data['end']:
+                    await createChannel(server, data['channel_name'])
+            return
+        matchDays = await runDB(compDict, competition, Scheduler.window())
+        Scheduler.matchDayObject[name] = matchDays
+        Scheduler.scheduleCompetition(name)
+
+    @staticmethod
+    def applyChangeSet(competition : str, changeSet : MatchChangeSet):
+        """
+        Applies the changes of a match sync to the matchdays of a competition, without rebuilding them. Changed
+        matches are updated in place, moved to their new matchday if necessary and new fixtures are added. Matches
+        of matchdays that aren't loaded are left to advanceWindow. Only the boundaries of the touched matchdays are
+        recalculated.
+        :param competition: Name of the competition
+        :param changeSet: Changes from updateMatchesSingleCompetition
+        """
+        if changeSet.isEmpty() or competition not in Scheduler.matchDayObject.keys():
+            return
+        logger.info(f"Applying changes to {competition}: {changeSet}")
+        matchDays = Scheduler.matchDayObject[competition]
+
+        liveMatches = {}
+        for md, data in matchDays.items():
+            for key in matchDayLists:
+                for liveMatch in data[key]:
+                    liveMatches[liveMatch.match.id] = (md, key, liveMatch)
+
+        touched = set()
+        for match in changeSet.updated:
+            if match.id not in liveMatches.keys():
+                continue
+            md, key, liveMatch = liveMatches[match.id]
+            liveMatch.updateMatch(match)
+            touched.add(md)
+            if match.matchday != md:
+                matchDays[md][key].remove(liveMatch)
+                if match.matchday in matchDays.keys() or liveMatch.runningStarted:
+                    Scheduler.addLiveMatch(competition, liveMatch)
+                    touched.add(match.matchday)
+                else:
+                    jobScheduler.cancel(("startMatch", match.id))
+            elif match in changeSet.rescheduled and not liveMatch.runningStarted:
+                matchDays[md][key].remove(liveMatch)
+                addToMatchDay(matchDays[md], liveMatch)
+
+        for match in changeSet.newFixtures:
+            if match.id in liveMatches.keys() or match.matchday not in matchDays.keys():
+                continue
+            Scheduler.addLiveMatch(competition, LiveMatch(match))
+            touched.add(match.matchday)
+
+        for md in touched:
+            if md in matchDays.keys():
+                updateMatchDayBoundaries(matchDays[md])
+                Scheduler.scheduleMatchDay(competition, md)
+
+    @staticmethod
+    def addLiveMatch(competition : str, liveMatch : LiveMatch):
+        """
+        Adds a LiveMatch to its matchday, creating the matchday if necessary
+        """
+        matchDays = Scheduler.matchDayObject[competition]
+        md = liveMatch.match.matchday
+        if md not in matchDays.keys():
+            matchDays[md] = newMatchDay(competition, md)
+        addToMatchDay(matchDays[md], liveMatch)
 
     @staticmethod
     @task
     async def removeCompetition(competition : CompetitionWatcher):
+        """
+        Removes the server of the watcher from a competition. The matchdays are only unloaded once no server watches
+        the competition anymore.
+        """
         logger.debug(f"Removing {competition} from Scheduler")
-        Scheduler.matchSchedulerRunning.wait()
+        if GuildRouting.remove(competition.competition.clear_name, competition.applicable_server.discord_id):
+            return
+        if bridge.isDiscord():
+            bridge.send("removeCompetition", competition=competition.competition.clear_name)
+            return
+        Scheduler.unloadCompetition(competition.competition.clear_name)
+
+    @staticmethod
+    def unloadCompetition(competition : str):
+        """
+        Removes the matchdays of a competition, their jobs and their matches from the live poller.
+        """
+        if competition not in Scheduler.matchDayObject.keys():
+            return
         #todo clear up channels
-        del Scheduler.matchDayObject[competition.competition.clear_name]
+        for md, data in Scheduler.matchDayObject[competition].items():
+            Scheduler.unscheduleMatchDay(competition, md)
+            for key in matchDayLists:
+                for liveMatch in data[key]:
+                    livePoller.leave(liveMatch)
+        del Scheduler.matchDayObject[competition]
+
+    @staticmethod
+    def statistics() -> Dict:
+        matchDays = [data for matchObject in Scheduler.matchDayObject.values() for data in matchObject.values()]
+        return {'competitions': len(Scheduler.matchDayObject),
+                'matchDays': len(matchDays),
+                'liveMatches': sum(len(data[key]) for data in matchDays for key in matchDayLists)}
 
     @staticmethod
     def findCompetitionMatchdayByChannel(channelName : str) -> Tuple[str,int]:
@@ -210,6 +515,24 @@ class Scheduler:
 
         return matchList
 
+    @staticmethod
+    def channelScores(channelName: str) -> Dict[str, List[str]]:
+        """
+        Returns the goals of the started matches of a matchday channel, empty if the channel isn't a loaded matchday.
+        """
+        found = Scheduler.findCompetitionMatchdayByChannel(channelName)
+        if found is None:
+            return {}
+        return Scheduler.getScores(*found)
+
+    @staticmethod
+    def matchListing(started: bool) -> List[Tuple[str, str]]:
+        """
+        Returns title and kickoff of the started or upcoming matches.
+        """
+        matchList = Scheduler.startedMatches() if started else Scheduler.upcomingMatches()
+        return [(match.title, f"{match.match.date}") for match in matchList]
+
     @staticmethod
     def upcomingMatches():
         matchList = []
@@ -232,47 +555,153 @@ def calculateSleepTime(targetTime: datetime, nowTime: datetime = datetime.utcnow
     return (targetTime.replace(tzinfo=UTC) - nowTime).total_seconds()
 
 
-async def asyncCreateChannel(channelName: str,sleepPeriod: float = None):
+async def asyncCreateChannel(competition: str, channelName: str,sleepPeriod: float = None):
     """
-    Async wrapper to create channel
+    Async wrapper to create a channel on all servers watching a competition
+    :param competition: Name of the competition
     :param sleepPeriod: Period to wait before channel can be created
-    :param channelName: Name of the channel that will be created
+    :param channelName: Name of the channel that will be created
     """
     logger.debug(f"Initializing create Channel task for {channelName} in {sleepPeriod}")
     if sleepPeriod != None:
         await asyncio.sleep(sleepPeriod)
-    await createChannel(list(client.servers)[0], channelName)
+    if bridge.isPoller():
+        bridge.send("createChannel", competition=competition, channelName=channelName)
+        return
+    results = await asyncio.gather(*[createChannel(server, channelName)
+                                     for server in GuildRouting.getServers(competition)], return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Creating {channelName} failed: {result}")
 
 
-async def asyncDeleteChannel( channelName: str,sleepPeriod: float = None):
+async def asyncDeleteChannel(competition: str, channelName: str,sleepPeriod: float = None):
     """
-    Async wrapper to delete channel
+    Async wrapper to delete a channel on all servers watching a competition
+    :param competition: Name of the competition
     :param sleepPeriod: Period to wait before channel can be deleted
     :param channelName: Name of the channel that will be deleted
     """
     if sleepPeriod != None:
         await asyncio.sleep(sleepPeriod)
-    await deleteChannel(list(client.servers)[0], channelName)
-
-@task
-async def watchCompetition(competition: Competition, serverName: str):
+    if bridge.isPoller():
+        bridge.send("deleteChannel", competition=competition, channelName=channelName)
+        return
+    results = await asyncio.gather(*[deleteChannel(server, channelName)
+                                     for server in GuildRouting.getServers(competition)], return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Deleting {channelName} failed: {result}")
+
+def prepareCompetitionWatcher(competition: Competition, server: Server) -> CompetitionWatcher:
     """
-    Adds a compeitition to be monitored. Also updates matches and competitions accordingly.
+    Loads the current season and its matches of a competition and creates the watcher object for it.
     :param competition: Competition to be monitored.
-    :param serverName: Name of the discord server
+    :param server: The discord server watching the competition
+    :return: The saved CompetitionWatcher, with its competition and server already loaded
     """
-    logger.info(f"Start watching competition {competition} on {serverName}")
-
     season = Season.objects.filter(competition=competition).order_by('start_date').last()
     if season == None:
         getAndSaveData(getAllSeasons, idCompetitions=competition.id)
         season = Season.objects.filter(competition=competition).order_by('start_date').last()
-    server = DiscordServer(name=serverName)
-    server.save()
+    discordServer = DiscordServer.objects.filter(discord_id=server.id).first()
+    if discordServer is None:
+        discordServer = DiscordServer(name=server.name, discord_id=server.id)
+        discordServer.save()
 
     updateMatchesSingleCompetition(competition=competition, season=season)
 
     compWatcher = CompetitionWatcher(competition=competition,
-                                     current_season=season, applicable_server=server, current_matchday=1)
+                                     current_season=season, applicable_server=discordServer, current_matchday=1)
     compWatcher.save()
-    Scheduler.addCompetition(compWatcher)
\ No newline at end of file
+    return compWatcher
+
+@task
+async def watchCompetition(competition: Competition, server: Server):
+    """
+    Adds a compeitition to be monitored on a server. Also updates matches and competitions accordingly.
+    :param competition: Competition to be monitored.
+    :param server: The discord server watching the competition
+    """
+    logger.info(f"Start watching competition {competition} on {server.name}")
+
+    compWatcher = await runDB(prepareCompetitionWatcher, competition, server)
+    await Scheduler.addCompetition(compWatcher)
+
+
+def postForwarded(competition: str, channelName: str, embeds: list):
+    """
+    Queues the embeds the poller process rendered for a matchday channel.
+    """
+    channels = GuildRouting.channels(competition, channelName)
+    if channels == []:
+        logger.warning(f"No channel {channelName} for forwarded events of {competition}")
+        return
+    embeds = [(Embed.from_data(data), MessagePriority(priority)) for data, priority in embeds]
+    for channel in channels:
+        for embObj, priority in embeds:
+            messageQueue.put(channel, embed=embObj, priority=priority)
+
+
+def setupDiscordBridge():
+    """
+    Registers the handlers of the discord process for the messages of the poller process.
+    """
+    bridge.on("post", postForwarded)
+    bridge.on("createChannel", asyncCreateChannel)
+    bridge.on("deleteChannel", asyncDeleteChannel)
+    bridge.on("scoreboard", lambda **fields: Scoreboards.touch(MatchSnapshot(**fields)))
+
+
+schedulerQueries = {'statistics': Scheduler.statistics,
+                    'scores': Scheduler.channelScores,
+                    'matches': Scheduler.matchListing}
+
+
+async def queryScheduler(query: str, default, **fields):
+    """
+    Answers a query about the loaded matchdays (see schedulerQueries). In the multi process mode the matchdays are
+    loaded in the poller process, so the query is answered there.
+    :param default: Returned if the poller process doesn't answer
+    """
+    if not bridge.isDiscord():
+        return schedulerQueries[query](**fields)
+    try:
+        return await bridge.request("query", query=query, **fields)
+    except (ConnectionError, RuntimeError, asyncio.TimeoutError) as e:
+        logger.error(f"Query {query} failed in the poller process: {e}")
+        return default
+
+
+def forwardEmojis():
+    """
+    Sends the emojis of the servers to the poller process, which renders the events.
+    """
+    bridge.send("emojis", emojis=TemplateSheet.emojis)
+
+
+def updateServerEmojis(emojis: Dict[str, str]):
+    """
+    Compiles the stylesheets against the emojis of all servers, in the multi process mode in both processes.
+    :param emojis: Name of the emoji to its discord representation
+    """
+    TemplateSheet.updateEmojis(emojis)
+    if bridge.isDiscord():
+        forwardEmojis()
+
+
+async def addWatcher(watcher: int):
+    compWatcher = await runDB(lambda: CompetitionWatcher.objects.select_related('competition', 'applicable_server')
+                              .get(id=watcher))
+    await Scheduler.addCompetition(compWatcher)
+
+
+def setupPollerBridge():
+    """
+    Registers the handlers of the poller process for the messages of the discord process.
+    """
+    bridge.on("addCompetition", addWatcher)
+    bridge.on("removeCompetition", Scheduler.unloadCompetition)
+    bridge.on("emojis", TemplateSheet.updateEmojis)
+    bridge.on("reloadPolicies", lambda: runDB(PollingPolicies.load))
+    bridge.on("query", lambda query, **fields: schedulerQueries[query](**fields))
@@ -0,0 +1,130 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime
+from itertools import count
+from typing import Callable, Dict, Hashable, Union
+
+from pytz import UTC
+
+from support.helper import task
+
+logger = logging.getLogger(__name__)
+
+
+def utcNow() -> datetime:
+    return datetime.utcnow().replace(tzinfo=UTC)
+
+
+class JobScheduler:
+    """
+    Runs coroutines at exact points in time. Jobs are kept in a heap ordered by their due time and identified by a
+    key, scheduling a key again replaces its job (e.g. when a match is rescheduled). Replaced and cancelled jobs stay
+    in the heap as stale entries and are skipped once they are due. The loop only wakes up for the next due job, but
+    at least every maxSleep seconds to make up for clock changes.
+    """
+    def __init__(self, clock: Callable = utcNow, maxSleep: float = 3600):
+        """
+        :param clock: Returns the current time as aware datetime, replaceable for tests
+        :param maxSleep: Longest time in seconds the loop sleeps without checking the clock
+        """
+        self.clock = clock
+        self.maxSleep = maxSleep
+        self.heap = []
+        self.jobs = {}
+        self.sequence = count()
+        self.wakeup = None
+        self.future = None
+        self.executed = 0
+        self.totalLateness = 0.0
+        self.maxLateness = 0.0
+
+    def schedule(self, key: Hashable, due: datetime, func: Callable, *args):
+        """
+        Schedules func(*args) at due, replacing the job with the same key. Jobs that are overdue run immediately.
+        :param key: Identifies the job
+        :param due: Aware datetime the job is due
+        :param func: Coroutine function or function
+        """
+        seq = next(self.sequence)
+        self.jobs[key] = (due, seq, func, args)
+        heapq.heappush(self.heap, (due, seq, key))
+        if len(self.heap) > 2 * len(self.jobs) + 64:
+            # drop the stale entries of replaced jobs
+            self.heap = [(job[0], job[1], jobKey) for jobKey, job in self.jobs.items()]
+            heapq.heapify(self.heap)
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def cancel(self, key: Hashable):
+        self.jobs.pop(key, None)
+
+    def due(self, key: Hashable) -> Union[datetime, None]:
+        """
+        Returns when the job with the given key is due, None if there is no such job.
+        """
+        job = self.jobs.get(key)
+        return job[0] if job is not None else None
+
+    async def execute(self, key: Hashable, func: Callable, args: tuple):
+        try:
+            result = func(*args)
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            logger.exception(f"Job {key} failed: {e}")
+
+    def runDue(self):
+        """
+        Starts all jobs that are due.
+        """
+        now = self.clock()
+        while self.heap != [] and self.heap[0][0] <= now:
+            due, seq, key = heapq.heappop(self.heap)
+            job = self.jobs.get(key)
+            if job is None or job[1] != seq:
+                continue
+            del self.jobs[key]
+            lateness = (now - due).total_seconds()
+            self.executed += 1
+            self.totalLateness += lateness
+            self.maxLateness = max(self.maxLateness, lateness)
+            logger.debug(f"Running job {key}, due {due}")
+            asyncio.ensure_future(self.execute(key, job[2], job[3]))
+
+    @task
+    async def run(self):
+        """
+        Main loop of the scheduler. Should be called via start or create_task!
+        """
+        self.wakeup = asyncio.Event()
+        while True:
+            self.runDue()
+            delay = self.maxSleep
+            if self.heap != []:
+                delay = min(delay, max(0.0, (self.heap[0][0] - self.clock()).total_seconds()))
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    def start(self, loop=None):
+        if self.future is None:
+            self.future = asyncio.ensure_future(self.run(), loop=loop)
+
+    def stop(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def statistics(self) -> Dict:
+        nextDue = min((i[0] for i in self.jobs.values()), default=None)
+        return {'jobs': len(self.jobs),
+                'nextDue': nextDue,
+                'executed': self.executed,
+                'meanLateness': self.totalLateness / self.executed if self.executed else 0.0,
+                'maxLateness': self.maxLateness}
+
+
+jobScheduler = JobScheduler()
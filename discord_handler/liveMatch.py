@@ -1,5 +1,4 @@
 import asyncio
-import json
 
 from discord import Channel, Embed
 from typing import Dict, Union, Tuple, List
@@ -10,34 +9,142 @@ from json.decoder import JSONDecodeError
 from datetime import datetime, timedelta
 from pytz import UTC
 import os
-import re
+from enum import Enum
+from operator import itemgetter
 
 from database.models import Match, MatchEvents, MatchEventIcon
-from api.calls import makeMiddlewareCall, DataCalls
-from discord_handler.client import client, toDiscordChannelName
-from support.helper import task
+from api.calls import liveDataCache
+from discord_handler.client import toDiscordChannelName
+from discord_handler.pollingPolicy import PollingPolicy, PollingPolicies, PollingState
+from discord_handler.guildRouting import GuildRouting
+from discord_handler.templates import TemplateSheet
+from discord_handler.messageQueue import messageQueue, MessagePriority
+from discord_handler.scoreboard import Scoreboards
+from discord_handler.bridge import bridge
 
 logger = logging.getLogger(__name__)
 path = os.path.dirname(os.path.realpath(__file__))
 
 
+class EventStatus(Enum):
+    new = 1
+    corrected = 2
+    retracted = 3
+
+
 class MatchEventData:
-    def __init__(self, event: MatchEvents, minute: str, team: str, player: str, playerTo: str):
+    def __init__(self, event: MatchEvents, minute: str, team: str, player: str, playerTo: str, id=None,
+                 status: EventStatus = EventStatus.new):
         self.event = event
         self.minute = minute
         self.team = team
         self.player = player
         self.playerTo = playerTo
+        self.id = id
+        self.status = status
 
     def __str__(self):
         return f"Event: {self.event}, minute {self.minute}, team {self.team}, player {self.player}" \
-               f", playerTo {self.playerTo}"
+               f", playerTo {self.playerTo}, status {self.status.name}"
+
+
+class MatchState:
+    """
+    Snapshot of the teams and the score of a match, taken from the live document of the current poll. Events are
+    rendered with it, so rendering doesn't need to fetch anything.
+    """
+    def __init__(self, homeTeam: str, awayTeam: str, homeScore: int, awayScore: int):
+        self.homeTeam = homeTeam
+        self.awayTeam = awayTeam
+        self.homeScore = homeScore
+        self.awayScore = awayScore
+
+    @staticmethod
+    def fromLiveData(data: Dict):
+        """
+        :param data: match entry of the live document
+        """
+        return MatchState(data['teamHomeName'], data['teamAwayName'], data['scoreHome'], data['scoreAway'])
+
+    def __str__(self):
+        return f"{self.homeTeam} {self.homeScore} : {self.awayScore} {self.awayTeam}"
+
+
+class EventTracker:
+    """
+    Incremental diff of the event list of a live match. Events are keyed by the id the feed assigns to them and only
+    a fingerprint of the fields that end up in a post is kept per id. An update parses only the events that are new
+    or whose fingerprint changed (corrections, e.g. another scorer) and reports the events that disappeared from the
+    feed (retractions, e.g. a disallowed goal). Most polls don't change anything, these are caught by comparing with
+    the previous list first.
+    """
+    fingerprint = itemgetter('eventCode', 'eventDescriptionShort', 'phaseDescriptionShort', 'minute', 'teamName',
+                             'playerName', 'playerToName')
+
+    def __init__(self):
+        self.fingerprints = {}
+        self.events = {}
+        self.lastData = []
+
+    def update(self, data: list) -> List[MatchEventData]:
+        """
+        Takes the current event list of the feed (newest event first) and returns the changes since the last update
+        in chronological order.
+        :param data: events of the live document
+        :return: New and corrected events, followed by retracted ones
+        """
+        if data == self.lastData:
+            return []
+        if data == [] and self.fingerprints != {}:
+            logger.warning(f"Feed returned no events, keeping the {len(self.fingerprints)} known ones")
+            return []
+        self.lastData = data
+
+        retEvents = []
+        seen = set()
+        for event in reversed(data):
+            fingerprint = EventTracker.fingerprint(event)
+            key = event.get('id')
+            if key is None:
+                key = fingerprint
+            seen.add(key)
+
+            known = self.fingerprints.get(key)
+            if known == fingerprint:
+                continue
+            self.fingerprints[key] = fingerprint
+
+            eventData = LiveMatch.parseEvent(event, key)
+            if eventData is None:
+                self.events.pop(key, None)
+                continue
+            if known is not None:
+                eventData.status = EventStatus.corrected
+            self.events[key] = eventData
+            retEvents.append(eventData)
+
+        if len(seen) != len(self.fingerprints):
+            for key in [i for i in self.fingerprints.keys() if i not in seen]:
+                del self.fingerprints[key]
+                eventData = self.events.pop(key, None)
+                if eventData is not None:
+                    eventData.status = EventStatus.retracted
+                    retEvents.append(eventData)
+        return retEvents
 
 
 class LiveMatch:
-    eventStyleSheet = {}
-    lineupStyleSheet = {}
-    emojiSet = dict([(i.name,str(i)) for i in client.get_all_emojis()])
+    eventTemplates = TemplateSheet(path + "/../stylesheets/game_events.json")
+    lineupTemplates = TemplateSheet(path + "/../stylesheets/lineups.json")
+    eventPriorities = {MatchEvents.goal: MessagePriority.critical,
+                       MatchEvents.ownGoal: MessagePriority.critical,
+                       MatchEvents.scoredPenalty: MessagePriority.critical,
+                       MatchEvents.missedPenalty: MessagePriority.critical,
+                       MatchEvents.redCard: MessagePriority.critical,
+                       MatchEvents.yellowRedCard: MessagePriority.critical,
+                       MatchEvents.substitution: MessagePriority.low}
+    # limit of discord
+    maxEmbedFields = 25
 
     def __init__(self, match: Match):
         self.match = match
@@ -51,141 +158,192 @@ class LiveMatch:
             homeTeam = ""
             awayTeam = ""
         self.title = f"**{homeTeam}** - : - **{awayTeam}**"
-        self.goalList = []
+        self.goals = OrderedDict()
         self.runningStarted = False
-        self.lock = asyncio.Event(loop=client.loop)
-        self.lock.set()
+        # taken over from another node, which already posted the events so far
+        self.resumed = False
 
-    @staticmethod
-    def styleSheetEvents(key: str = None) -> Union[Dict, str]:
-        if LiveMatch.eventStyleSheet == {}:
-            with open(path + "/../stylesheets/game_events.json") as f:
-                LiveMatch.eventStyleSheet = json.loads(f.read())
-
-        if key == None:
-            return LiveMatch.eventStyleSheet
+    def updateMatch(self, match: Match):
+        """
+        Takes over the data of a newer version of the match, for example from the nightly update. Runs on the event
+        loop, so the teams of the match have to be loaded already (see MatchChangeSet.loadRelated).
+        :param match: Match object with the same id
+        """
+        teamsChanged = (match.home_team_id, match.away_team_id) != (self.match.home_team_id, self.match.away_team_id)
+        for field in ['matchday', 'date', 'match_status', 'score_home_team', 'score_away_team', 'stage']:
+            setattr(self.match, field, getattr(match, field))
+        if teamsChanged:
+            self.match.home_team = match.home_team
+            self.match.away_team = match.away_team
+            if not self.runningStarted:
+                self.title = f"**{self.match.home_team.clear_name}** - : - **{self.match.away_team.clear_name}**"
+
+    @property
+    def goalList(self) -> List[str]:
+        return list(self.goals.values())
+
+    @property
+    def policy(self) -> PollingPolicy:
+        # read on every cycle, so a policy changed by setPollingPolicy applies to matches already being polled
+        return PollingPolicies.get(self.competition)
+
+    def begin(self):
+        """
+        Prepares the match for live polling. Called by the LivePoller when the match joins it.
+        """
+        logger.info(f"Starting match {self.title}")
+        self.runningStarted = True
+        self.tracker = EventTracker()
+        self.eventList = []
+        self.pollingState = PollingState()
+        self.interval = None
+        self.lineupsPosted = False
+        self.state = None
+        self.flushHandle = None
+        self.scoreboardState = None
+        self.competition = self.match.competition.clear_name
+        self.channelName = toDiscordChannelName(f"{self.competition} Matchday {self.match.matchday}")
+
+    async def poll(self) -> Union[float, None]:
+        """
+        One cycle of the match thread. Reads the live data from the middleWare API (data.fifa.com) and posts the
+        lineups and new events to the channel that corresponds to the match. This channel has to be created
+        previously.
+        :return: Seconds until the next cycle is due according to the polling policy of the competition, None if
+        the match has ended
+        """
+        try:
+            # the document has to be newer than the previous poll, the cache ttl is longer than the live intervals
+            data = await liveDataCache.get(self.match.id, maxAge=self.interval)
+        except JSONDecodeError:
+            return None
+
+        if data["match"]["isFinished"] and not self.running:
+            logger.info(f"Match {self.match} allready passed")
+            return None
+
+        self.running = True
+        if data["match"]["isLive"]:
+            self.started = True
         else:
-            try:
-                return LiveMatch.eventStyleSheet[key]
-            except KeyError:
-                logger.error(f"Key {key} not available in stylesheet")
-                return ""
+            self.started = False
+
+        if self.resumed:
+            # the lineups and events so far were posted by the node that had the match before
+            self.resumed = False
+            self.lineupsPosted = data["match"]["hasLineup"]
+            skipped = self.tracker.update(data["match"]["events"])
+            logger.info(f"Resuming {self.title}, {len(skipped)} events were already posted")
+
+        if not self.lineupsPosted and data["match"]["hasLineup"]:
+            logger.info(f"Posting lineups for {self.title}")
+            await asyncio.sleep(5)
+            if self.hasChannels():
+                self.queueEmbeds([(LiveMatch.lineupEmbed(self.match, data["match"]), MessagePriority.low)])
+                self.lineupsPosted = True
+        else:
+            if not self.lineupsPosted:
+                logger.info(f"Lineups not yet available for {self.title}")
+
+        self.eventList += self.tracker.update(data["match"]["events"])
+        self.state = MatchState.fromLiveData(data["match"])
+
+        policy = self.policy
+        interval = policy.nextInterval(data["match"], self.match.date, self.pollingState)
+        self.interval = interval
+        if self.eventList != []:
+            if policy.coalesceEvents and policy.coalesceWindow > 0 and interval is not None:
+                if self.flushHandle is None:
+                    self.flushHandle = asyncio.get_event_loop().call_later(policy.coalesceWindow,
+                                                                           self.flushEvents)
+            else:
+                self.postEvents()
+        self.updateScoreboard()
 
-    @staticmethod
-    def styleSheetLineups(key: str = None) -> Union[Dict, str]:
-        if LiveMatch.eventStyleSheet == {}:
-            with open(path + "/../stylesheets/lineups.json") as f:
-                LiveMatch.lineupStyleSheet = json.loads(f.read())
+        if interval is None:
+            logger.info(f"Match {self.match} finished!")
+        return interval
 
-        if key == None:
-            return LiveMatch.lineupStyleSheet
-        else:
-            try:
-                return LiveMatch.lineupStyleSheet[key]
-            except KeyError:
-                logger.error(f"Key {key} not available in stylesheet")
-                return ""
-
-    @task
-    async def runMatchThread(self):
+    def postEvents(self):
         """
-        Start a match threader for a given match. Will read the live data from the middleWare API (data.fifa.com) every
-        20 seconds and post the events to the channel that corresponds to the match. This channel has to be created
-        previously.
-        :param match: Match object.  Will  post to discord channels if the object is a database.models.Match object
+        Renders the pending events once and queues them for the channels of the match on all servers watching its
+        competition. Events stay pending while there is no channel for the match.
         """
-        if self.runningStarted:
-            logger.warning(f"Match {self.title} already started!")
+        if self.eventList == [] or not self.hasChannels():
             return
-        else:
-            logger.info(f"Starting match {self.title}")
-        self.runningStarted = True
-        pastEvents = []
-        eventList = []
-        sleepTime = 600
-        endCycles = 10
-
-        matchid = self.match.id
-        channelName = toDiscordChannelName(f"{self.match.competition.clear_name} Matchday {self.match.matchday}")
-
-        lineupsPosted = False
-        while True:
-            try:
-                data = makeMiddlewareCall(DataCalls.liveData + f"/{matchid}")
-            except JSONDecodeError:
-                break
-
-            if data["match"]["isFinished"] and not self.running:
-                logger.info(f"Match {self.match} allready passed")
-                break
-
-            self.running = True
-            if data["match"]["isLive"]:
-                self.started = True
+        events = self.eventList
+        self.eventList = []
+        self.started = True
+
+        rendered = []
+        for i in events:
+            title, content, goalString = LiveMatch.beautifyEvent(i, self.state)
+            self.title = title
+            if goalString != "" and i.status != EventStatus.retracted:
+                self.goals[i.id] = goalString
             else:
-                self.started = False
-
-            if not self.lock.is_set():
-                self.lock.set()
-
-            if not lineupsPosted and data["match"]["hasLineup"]:
-                logger.info(f"Posting lineups for {self.title}")
-                await asyncio.sleep(5)
-                try:
-                    for channel in client.get_all_channels():
-                        if channel.name == channelName:
-                            await LiveMatch.postLineups(channel, self.match, data["match"])
-                            lineupsPosted = True
-                            sleepTime = 20
-                except RuntimeError:
-                    lineupsPosted = False
-                    logger.warning("Size of channels has changed")
-            else:
-                if not lineupsPosted:
-                    logger.info(f"Lineups not yet available for {self.title}")
-
-            newEvents, pastEvents = LiveMatch.parseEvents(data["match"]["events"], pastEvents)
-            eventList += newEvents
-
-
-            for i in eventList:
-                try:
-                    for channel in client.get_all_channels():
-                        if channel.name == channelName:
-                            self.started = True
-                            self.title, goalString = await LiveMatch.sendMatchEvent(channel, self.match, i)
-                            self.goalList.append(goalString)
-                            try:
-                                eventList.remove(i)
-                            except ValueError:
-                                pass
-                            logger.info(f"Posting event: {i}")
-                except RuntimeError:
-                    logger.warning("Size of channels has changed!")
-                    break
-
-            if self.lock.is_set():
-                self.lock.clear()
-
-            if data["match"]["isFinished"]:
-                if endCycles <= 0:
-                    logger.info(f"Match {match} finished!")
-                    break
-                endCycles -= 1
-
-            await asyncio.sleep(sleepTime)
+                self.goals.pop(i.id, None)
+            rendered.append((i, title, content))
+            logger.info(f"Posting event: {i}")
+
+        self.queueEmbeds(LiveMatch.eventEmbeds(self.match, rendered, self.policy.coalesceEvents))
 
+    def hasChannels(self) -> bool:
+        # the poller process doesn't know the channels, the discord process posts once they exist
+        return bridge.isPoller() or GuildRouting.channels(self.competition, self.channelName) != []
+
+    def queueEmbeds(self, embeds: List[Tuple[Embed, MessagePriority]]):
+        """
+        Queues embeds for the channels of the match on all servers watching its competition. The poller process
+        forwards them to the discord process.
+        """
+        if bridge.isPoller():
+            bridge.send("post", competition=self.competition, channelName=self.channelName,
+                        embeds=[(embObj.to_dict(), int(priority)) for embObj, priority in embeds])
+            return
+        for channel in GuildRouting.channels(self.competition, self.channelName):
+            for embObj, priority in embeds:
+                messageQueue.put(channel, embed=embObj, priority=priority)
+
+    def flushEvents(self):
+        """
+        Posts the events that were held for the coalesce window.
+        """
+        self.flushHandle = None
+        self.postEvents()
+        self.updateScoreboard()
+
+    def updateScoreboard(self):
+        """
+        Touches the scoreboard of the matchday channel if the score, the goals or the phase of the match changed.
+        """
+        scoreboardState = (self.title, tuple(self.goals.values()), self.pollingState.phase)
+        if scoreboardState != self.scoreboardState:
+            self.scoreboardState = scoreboardState
+            Scoreboards.touch(self)
+
+    def end(self):
+        """
+        Resets the match after its last cycle. Called by the LivePoller when the match leaves it.
+        """
         now = datetime.utcnow().replace(tzinfo=UTC)
         if now < (self.match.date + timedelta(hours=3)).replace(tzinfo=UTC):
             self.passed = True
+        if self.flushHandle is not None:
+            self.flushHandle.cancel()
+            self.flushEvents()
         self.running = False
         self.started = False
         self.runningStarted = False
-        self.lock.set()
         logger.info(f"Ending match {self.title}")
 
     @staticmethod
-    async def postLineups(channel: Channel, match: Match, data: Dict):
+    def lineupEmbed(match: Match, data: Dict) -> Embed:
+        """
+        Renders the starting lineups of both teams with the lineup stylesheet.
+        :param match: Match of the lineups
+        :param data: Live data of the match
+        """
         lineup = OrderedDict()
         for i in ['home', 'away']:
             lineup[i] = OrderedDict()
@@ -206,106 +364,71 @@ class LiveMatch:
                 else:
                     lineup[i]['bench'].append(playerInfo)
 
+        templates = LiveMatch.lineupTemplates
+        playerTemplate = templates.get("PlayerTemplate")
+        gkString = templates.render("GKTemplate")
+        captainString = templates.render("CaptainTemplate")
+
         def getLineupPlayerString(teamString):
-            def listPlayers(position):
-                fullLineupString = ""
-                for startingPlayer in lineup[teamString][position]:
-                    lineupString = LiveMatch.styleSheetLineups("PlayerTemplate")
-                    lineupString = lineupString.replace("$number$",str(startingPlayer['number']))
-                    lineupString = lineupString.replace("$player$",startingPlayer['name'])
-                    if startingPlayer['gk']:
-                        lineupString = lineupString.replace("$gkTemplate$",LiveMatch.styleSheetLineups("GKTemplate"))
-                    else:
-                        lineupString = lineupString.replace("$gkTemplate$","")
-                    if startingPlayer['captain']:
-                        lineupString = lineupString.replace("$captainTemplate$", LiveMatch.styleSheetLineups("CaptainTemplate"))
-                    else:
-                        lineupString =  lineupString.replace("$captainTemplate$", "")
-                    fullLineupString +=lineupString
-                return fullLineupString
-
-            lineupString = LiveMatch.styleSheetLineups("Layout")
-            lineupString = lineupString.replace("$playerTemplate$",listPlayers('starting'))
-            coachString = LiveMatch.styleSheetLineups("CoachTemplate")
-            coachString = coachString.replace("$coach$",lineup[teamString]['coach'][0]['name'])
-            lineupString = lineupString.replace("$coachTemplate$",coachString)
-            return lineupString
+            playerString = "".join(playerTemplate.render(number=player['number'],
+                                                         player=player['name'],
+                                                         gkTemplate=gkString if player['gk'] else "",
+                                                         captainTemplate=captainString if player['captain'] else "")
+                                   for player in lineup[teamString]['starting'])
+            coachString = templates.render("CoachTemplate", coach=lineup[teamString]['coach'][0]['name'])
+            return templates.render("Layout", playerTemplate=playerString, coachTemplate=coachString)
 
         homeString = getLineupPlayerString('home')
         awayString = getLineupPlayerString('away')
 
-        title = LiveMatch.styleSheetLineups("cardTitle")
-        description = LiveMatch.styleSheetLineups("cardDescription")
-        description = description.replace("$home_team$",match.home_team.clear_name)
-        description = description.replace("$away_team$", match.away_team.clear_name)
+        title = templates.render("cardTitle")
+        description = templates.render("cardDescription", home_team=match.home_team.clear_name,
+                                       away_team=match.away_team.clear_name)
 
         embObj = Embed(title=title,
                        description=description)
 
-        teamTitle = LiveMatch.styleSheetLineups("TeamTitle")
-        homeTeamTitle = teamTitle.replace("$team$",match.home_team.clear_name)
-        awayTeamTitle = teamTitle.replace("$team$",match.away_team.clear_name)
+        homeTeamTitle = templates.render("TeamTitle", team=match.home_team.clear_name)
+        awayTeamTitle = templates.render("TeamTitle", team=match.away_team.clear_name)
 
         embObj.add_field(name=homeTeamTitle, value=homeString)
         embObj.add_field(name=awayTeamTitle, value=awayString)
+        return embObj
 
-        try:
-            await client.send_message(channel, embed=embObj)
-        except:
-            await asyncio.sleep(10)
-            for i in client.get_all_channels():
-                if channel.name == i.name:
-                    await client.send_message(channel, embed=embObj)
-
-    #todo should this really be async?
     @staticmethod
-    async def beautifyEvent(event, match):
-        data = makeMiddlewareCall(DataCalls.liveData + f"/{match.id}")['match']
-        homeTeam = data['teamHomeName']
-        awayTeam = data['teamAwayName']
+    async def postLineups(channel: Channel, match: Match, data: Dict):
+        messageQueue.put(channel, embed=LiveMatch.lineupEmbed(match, data), priority=MessagePriority.low)
 
+    @staticmethod
+    def beautifyEvent(event: MatchEventData, state: MatchState) -> Tuple[str, str, str]:
+        """
+        Renders an event with the stylesheet.
+        :param event: Event that is rendered
+        :param state: Teams and score of the match at the time of the poll
+        :return: title, content and the goal listing (empty if the event is not a goal)
+        """
+        templates = LiveMatch.eventTemplates
         if event.event == MatchEvents.goal:
-            if event.team == homeTeam:
-                goalString = LiveMatch.styleSheetEvents(MatchEvents.goalTallyHomeScore.value)
+            if event.team == state.homeTeam:
+                tallyKey = MatchEvents.goalTallyHomeScore.value
             else:
-                goalString = LiveMatch.styleSheetEvents(MatchEvents.goalTallyAwayScore.value)
+                tallyKey = MatchEvents.goalTallyAwayScore.value
         else:
-            goalString = LiveMatch.styleSheetEvents(MatchEvents.goalTally.value)
-
-        title = LiveMatch.styleSheetEvents(MatchEvents.title.value)
-
-        replaceDict = OrderedDict()
-        replaceDict["$tally$"] = goalString
-        replaceDict["$homeScore$"]=data['scoreHome']
-        replaceDict["$awayScore$"]=data['scoreAway']
-        replaceDict["$homeTeam$"]=homeTeam
-        replaceDict["$awayTeam$"]=awayTeam
-        for key,val in replaceDict.items():
-            title = title.replace(str(key),str(val))
-
-        replaceDict = {
-            "$minute$":event.minute,
-            "$player$":event.player,
-            "$playerTo$": event.playerTo,
-            "$team$":event.team,
-        }
+            tallyKey = MatchEvents.goalTally.value
 
-        content = LiveMatch.styleSheetEvents(event.event.value)
+        scores = {"homeScore": state.homeScore,
+                  "awayScore": state.awayScore,
+                  "homeTeam": state.homeTeam,
+                  "awayTeam": state.awayTeam}
+        title = templates.render(MatchEvents.title.value, tally=templates.render(tallyKey, **scores), **scores)
 
-        foundEmojis = re.findall(r':[\w\d_-]+:',content)
+        content = templates.render(event.event.value, minute=event.minute, player=event.player,
+                                   playerTo=event.playerTo, team=event.team)
 
-        logger.debug(f"found emojis : {foundEmojis}")
-
-        for i in foundEmojis:
-            if i.replace(":","") in LiveMatch.emojiSet.keys():
-                logger.debug(f"Replacing {i} for {LiveMatch.emojiSet[i.replace('':'','')]}")
-                content.replace(i,LiveMatch.emojiSet[i.replace(":","")])
-            else:
-                logger.debug(f"{i} not in emojilist, replacing it with nothing")
-                content.replace(i, "")
-
-        for key,val in replaceDict.items():
-            content = content.replace(key,str(val))
+        if event.status == EventStatus.corrected:
+            content = templates.render(MatchEvents.eventCorrected.value, event=content)
+        elif event.status == EventStatus.retracted:
+            content = templates.render(MatchEvents.eventRetracted.value, event=content)
 
         goalListing = ""
         if event.event == MatchEvents.goal:
@@ -314,87 +437,92 @@ class LiveMatch:
         return title, content, goalListing
 
     @staticmethod
-    async def sendMatchEvent(channel: Channel, match: Match, event: MatchEventData):
+    async def sendMatchEvent(channel: Channel, match: Match, event: MatchEventData, state: MatchState):
         """
         This function encapsulates the look and feel of the message that is sent when a matchEvent happens.
-        It will build the matchString, the embed object, etc. and than send it to the appropiate channel.
+        It will build the matchString, the embed object, etc. and than queue it for the appropiate channel.
         :param channel: The channel where we want to send things to
         :param match: The match that this message applies to (Metadata!)
         :param event: The actual event that happened. It consists of a MatchEvents enum and a DataDict, which in
         itself contains the minute, team and player(s) the event applies to.
+        :param state: Teams and score from the live document the event was found in
         """
 
-        title, content, goalString = await LiveMatch.beautifyEvent(event, match)
-        embObj = Embed(title=title, description=content)
-        embObj.set_author(name=match.competition.clear_name)
-
-        try:
-            await client.send_message(channel, embed=embObj)
-        except:
-            await asyncio.sleep(10)
-            for i in client.get_all_channels():
-                if i.name == channel.name:
-                    logger.debug(f"Sending {embObj} to {i.name}")
-                    await client.send_message(i, embed=embObj)
+        title, content, goalString = LiveMatch.beautifyEvent(event, state)
+        for embObj, priority in LiveMatch.eventEmbeds(match, [(event, title, content)], False):
+            messageQueue.put(channel, embed=embObj, priority=priority)
 
         return title, goalString
 
     @staticmethod
-    def parseEvents(data: list, pastEvents=list) -> Tuple[List[MatchEventData], List]:
+    def eventEmbeds(match: Match, rendered: List[Tuple[MatchEventData, str, str]],
+                    coalesce: bool) -> List[Tuple[Embed, MessagePriority]]:
         """
-        Parses the event list from the middleware api. The code below should be self explanatory, every eventCode
-        represents a certain event.
-        :param data: data that is to be parsed
-        :param pastEvents: all events that already happened
-        :return: Returns two lists: the events that are new, as well as a full list of all events that already happened
-        including the new ones.
+        Builds the messages for rendered events. Coalesced events are merged into one embed with a field per event,
+        titled like the last goal (or the last event). A single event keeps the look of an uncoalesced one.
+        :param match: The match the events belong to
+        :param rendered: Events with their title and content, see beautifyEvent
+        :param coalesce: Merge the events into as few embeds as possible
+        :return: Embeds with the priority of their most important event
         """
-        retEvents = []
-        if data != pastEvents:
-            diff = [i for i in data if i not in pastEvents]
-
-            diffStr =[]
-
-            for i in diff:
-                diffStr.append(json.dumps(i))
-
-            diffStr = list(set(diffStr)) #uniqueElements
-
-            diff = []
-
-            for i in diffStr:
-                diff.append(json.loads(i))
-
-            for event in reversed(diff):
-                eventData = MatchEventData(event=MatchEvents.none,
-                                           minute=event['minute'],
-                                           team=event['teamName'],
-                                           player=event['playerName'],
-                                           playerTo=event['playerToName'],
-                                           )
-                if event['eventCode'] == 3:  # Goal!
-                    eventData.event = MatchEvents.goal
-                elif event['eventCode'] == 4:  # Substitution!
-                    eventData.event = MatchEvents.substitution
-                elif event['eventCode'] == 1:
-                    ev = MatchEvents.yellowCard if event['eventDescriptionShort'] == "Y" else MatchEvents.redCard
-                    eventData.event = ev
-                elif event['eventCode'] == 2:
-                    eventData.event = MatchEvents.yellowRedCard
-                elif event['eventCode'] == 5:
-                    eventData.event = MatchEvents.missedPenalty
-                elif event['eventCode'] == 14:
-                    ev = MatchEvents.firstHalfEnd if event[
-                                                 'phaseDescriptionShort'] == "1H" else MatchEvents.secondHalfEnd
-                    eventData.event = ev
-                elif event['eventCode'] == 13:
-                    ev = MatchEvents.kickoffFirstHalf if event[
-                                                     'phaseDescriptionShort'] == "1H" else MatchEvents.kickoffSecondHalf
-                    eventData.event = ev
-                else:
-                    logger.error(f"EventId {event['eventCode']} with descr {event['eventDescription']} not handled!")
-                    logger.error(f"TeamName: {event['teamName']}")
-                    continue
-                retEvents.append(eventData)
-            pastEvents = data
-        return retEvents, pastEvents
+        def priority(event: MatchEventData) -> MessagePriority:
+            return LiveMatch.eventPriorities.get(event.event, MessagePriority.event)
+
+        if not coalesce or len(rendered) == 1:
+            embeds = []
+            for event, title, content in rendered:
+                embObj = Embed(title=title, description=content)
+                embObj.set_author(name=match.competition.clear_name)
+                embeds.append((embObj, priority(event)))
+            return embeds
+
+        embeds = []
+        for start in range(0, len(rendered), LiveMatch.maxEmbedFields):
+            chunk = rendered[start:start + LiveMatch.maxEmbedFields]
+            goals = [title for event, title, _ in chunk if event.event == MatchEvents.goal]
+            embObj = Embed(title=goals[-1] if goals != [] else chunk[-1][1])
+            embObj.set_author(name=match.competition.clear_name)
+            for event, _, content in chunk:
+                # discord rejects empty field values
+                embObj.add_field(name=event.event.value.replace("_", " "), value=content if content != "" else "-",
+                                 inline=False)
+            embeds.append((embObj, min(priority(event) for event, _, _ in chunk)))
+        return embeds
+
+    @staticmethod
+    def parseEvent(event: Dict, id=None) -> Union[MatchEventData, None]:
+        """
+        Parses a single event from the middleware api. Every eventCode represents a certain event.
+        :param event: event from the live document
+        :param id: key of the event within the EventTracker
+        :return: The parsed event, None if the eventCode is not handled
+        """
+        eventData = MatchEventData(event=MatchEvents.none,
+                                   minute=event['minute'],
+                                   team=event['teamName'],
+                                   player=event['playerName'],
+                                   playerTo=event['playerToName'],
+                                   id=id,
+                                   )
+        if event['eventCode'] == 3:  # Goal!
+            eventData.event = MatchEvents.goal
+        elif event['eventCode'] == 4:  # Substitution!
+            eventData.event = MatchEvents.substitution
+        elif event['eventCode'] == 1:
+            ev = MatchEvents.yellowCard if event['eventDescriptionShort'] == "Y" else MatchEvents.redCard
+            eventData.event = ev
+        elif event['eventCode'] == 2:
+            eventData.event = MatchEvents.yellowRedCard
+        elif event['eventCode'] == 5:
+            eventData.event = MatchEvents.missedPenalty
+        elif event['eventCode'] == 14:
+            ev = MatchEvents.firstHalfEnd if event['phaseDescriptionShort'] == "1H" else MatchEvents.secondHalfEnd
+            eventData.event = ev
+        elif event['eventCode'] == 13:
+            ev = MatchEvents.kickoffFirstHalf if event['phaseDescriptionShort'] == "1H" else MatchEvents.kickoffSecondHalf
+            eventData.event = ev
+        else:
+            logger.error(f"EventId {event['eventCode']} with descr {event['eventDescription']} not handled!")
+            logger.error(f"TeamName: {event['teamName']}")
+            return None
+        return eventData
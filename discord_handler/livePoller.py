@@ -0,0 +1,165 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from itertools import count
+from typing import Callable, Dict
+
+from support.helper import task
+
+logger = logging.getLogger(__name__)
+
+
+class LivePoller:
+    """
+    Polls all live matches from a single coroutine. Every match that joined the poller has an entry in a heap, ordered
+    by the time its next poll is due. Due polls are started with a bounded concurrency, after a poll the match is put
+    back into the heap with the delay it returned. Matches can join and leave at any time, a match leaves on its own
+    once its poll returns None.
+
+    A match needs to implement begin(), the coroutine poll() returning the delay until its next poll and end().
+    """
+    def __init__(self, concurrency: int = 8, clock: Callable = time.monotonic, retryDelay: float = 20,
+                 window: float = 60):
+        """
+        :param concurrency: Maximum number of polls running at the same time
+        :param clock: Monotonic clock in seconds, replaceable for tests
+        :param retryDelay: Delay in seconds until a poll that raised is retried
+        :param window: Window in seconds over which polls/sec are calculated
+        """
+        self.concurrency = concurrency
+        self.clock = clock
+        self.retryDelay = retryDelay
+        self.window = window
+        self.heap = []
+        self.matches = {}
+        self.scheduled = {}
+        self.sequence = count()
+        self.semaphore = None
+        self.wakeup = None
+        self.future = None
+        self.inFlight = 0
+        self.polls = 0
+        self.errors = 0
+        self.totalLag = 0.0
+        self.maxLag = 0.0
+        self.pollTimes = deque()
+
+    def push(self, matchID: int, due: float):
+        seq = next(self.sequence)
+        self.scheduled[matchID] = seq
+        heapq.heappush(self.heap, (due, seq, matchID))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def join(self, liveMatch, delay: float = 0):
+        """
+        Adds a match to the poller. Its first poll is due after delay seconds.
+        :param liveMatch: LiveMatch object
+        :param delay: Seconds until the first poll
+        """
+        matchID = liveMatch.match.id
+        if matchID in self.matches.keys():
+            logger.warning(f"Match {liveMatch.title} already polled!")
+            return
+        logger.debug(f"{liveMatch.title} joins the live poller")
+        self.matches[matchID] = liveMatch
+        liveMatch.begin()
+        self.push(matchID, self.clock() + delay)
+
+    def leave(self, liveMatch):
+        """
+        Removes a match from the poller. A poll that is currently running for it is finished.
+        :param liveMatch: LiveMatch object
+        """
+        matchID = liveMatch.match.id
+        if self.matches.pop(matchID, None) is None:
+            return
+        logger.debug(f"{liveMatch.title} leaves the live poller")
+        # the heap entry becomes stale and is skipped once it is due
+        del self.scheduled[matchID]
+        liveMatch.end()
+
+    async def pollMatch(self, liveMatch, seq: int, due: float):
+        matchID = liveMatch.match.id
+        now = self.clock()
+        lag = max(0.0, now - due)
+        self.polls += 1
+        self.totalLag += lag
+        self.maxLag = max(self.maxLag, lag)
+        self.pollTimes.append(now)
+        try:
+            delay = await liveMatch.poll()
+        except Exception as e:
+            self.errors += 1
+            logger.exception(f"Poll of {liveMatch.title} failed: {e}")
+            delay = self.retryDelay
+        finally:
+            self.inFlight -= 1
+            self.semaphore.release()
+
+        if self.scheduled.get(matchID) != seq:
+            # left or rejoined while polling
+            return
+        if delay is None:
+            self.leave(liveMatch)
+        else:
+            self.push(matchID, self.clock() + delay)
+
+    @task
+    async def run(self):
+        """
+        Main loop of the poller. Should be called via start or create_task!
+        """
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.wakeup = asyncio.Event()
+        while True:
+            if self.heap == []:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+
+            due, seq, matchID = self.heap[0]
+            delay = due - self.clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+
+            heapq.heappop(self.heap)
+            if self.scheduled.get(matchID) != seq:
+                continue
+            await self.semaphore.acquire()
+            if self.scheduled.get(matchID) != seq:
+                self.semaphore.release()
+                continue
+            self.inFlight += 1
+            asyncio.ensure_future(self.pollMatch(self.matches[matchID], seq, due))
+
+    def start(self, loop=None):
+        if self.future is None:
+            self.future = asyncio.ensure_future(self.run(), loop=loop)
+
+    def stop(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def statistics(self) -> Dict:
+        now = self.clock()
+        while self.pollTimes and self.pollTimes[0] < now - self.window:
+            self.pollTimes.popleft()
+        return {'matches': len(self.matches),
+                'inFlight': self.inFlight,
+                'polls': self.polls,
+                'errors': self.errors,
+                'pollsPerSecond': len(self.pollTimes) / self.window,
+                'meanLag': self.totalLag / self.polls if self.polls else 0.0,
+                'maxLag': self.maxLag}
+
+
+livePoller = LivePoller()
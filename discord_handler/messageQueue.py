@@ -0,0 +1,326 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from collections import deque
+from enum import IntEnum
+from itertools import count
+from typing import Callable, Dict, Union
+
+import aiohttp
+from discord import Channel, Embed, Message
+from discord.errors import Forbidden, HTTPException, NotFound
+
+from discord_handler.channelRegistry import ChannelRegistry
+from discord_handler.client import client
+from support.helper import task
+
+logger = logging.getLogger(__name__)
+
+
+class MessagePriority(IntEnum):
+    """
+    Order in which queued messages are sent, lower values first.
+    """
+    critical = 0
+    command = 1
+    event = 2
+    low = 3
+
+
+class RateBucket:
+    """
+    Sliding window rate limit, at most limit sends within per seconds.
+    """
+    def __init__(self, limit: int, per: float, clock: Callable):
+        self.limit = limit
+        self.per = per
+        self.clock = clock
+        self.sends = deque()
+
+    def delay(self) -> float:
+        """
+        Returns the seconds until the next send is allowed, 0 if it is allowed now.
+        """
+        now = self.clock()
+        while self.sends and self.sends[0] <= now - self.per:
+            self.sends.popleft()
+        if len(self.sends) < self.limit:
+            return 0.0
+        return self.sends[0] + self.per - now
+
+    def take(self):
+        self.sends.append(self.clock())
+
+
+class OutboundMessage:
+    """
+    A queued request to discord: a new message (send), or an edit or pin of the sent message target.
+    """
+    def __init__(self, channel: Channel, content: str, embed: Embed, priority: MessagePriority, created: float,
+                 future: asyncio.Future, action: str = "send", target: Message = None):
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.priority = priority
+        self.created = created
+        self.future = future
+        self.action = action
+        self.target = target
+        self.attempts = 0
+
+
+class ChannelQueue:
+    """
+    Queued messages of a single channel. Only one message per channel is sent at a time, so messages of the same
+    priority arrive in the order they were queued.
+    """
+    def __init__(self, bucket: RateBucket):
+        self.heap = []
+        self.bucket = bucket
+        self.busy = False
+        self.blockedUntil = 0.0
+
+
+class MessageQueue:
+    """
+    Sends all messages of the bot, and edits and pins sent ones. Every channel has its own queue ordered by
+    priority, a single coroutine picks the most important message of all channels that are allowed to send. Sends are
+    paced by Discord's rate limits for messages (per channel and global), so bursts don't run into 429s. Failed sends
+    are retried with an exponential backoff with jitter, during which the channel is held.
+    """
+    def __init__(self, channelLimit: int = 5, channelPer: float = 5, globalLimit: int = 50, globalPer: float = 1,
+                 maxAttempts: int = 5, baseBackoff: float = 1, maxBackoff: float = 60,
+                 clock: Callable = time.monotonic, jitter: Callable = random.random):
+        """
+        :param channelLimit: Messages per channel within channelPer seconds
+        :param channelPer: Window of the channel rate limit in seconds
+        :param globalLimit: Messages of the bot within globalPer seconds
+        :param globalPer: Window of the global rate limit in seconds
+        :param maxAttempts: Attempts until a message is dropped
+        :param baseBackoff: Backoff in seconds after the first failed attempt, doubled for every further attempt
+        :param maxBackoff: Upper bound of the backoff in seconds
+        :param clock: Monotonic clock in seconds, replaceable for tests
+        :param jitter: Returns a random number within [0, 1), replaceable for tests
+        """
+        self.channelLimit = channelLimit
+        self.channelPer = channelPer
+        self.maxAttempts = maxAttempts
+        self.baseBackoff = baseBackoff
+        self.maxBackoff = maxBackoff
+        self.clock = clock
+        self.jitter = jitter
+        self.globalBucket = RateBucket(globalLimit, globalPer, clock)
+        self.queues = {}
+        self.pending = set()
+        self.sequence = count()
+        self.wakeup = None
+        self.future = None
+        self.inFlight = 0
+        self.sent = 0
+        self.retries = 0
+        self.dropped = 0
+        self.totalLatency = 0.0
+        self.maxLatency = 0.0
+
+    def enqueue(self, message: OutboundMessage, seq: int = None):
+        key = message.channel.id
+        if key not in self.queues.keys():
+            self.queues[key] = ChannelQueue(RateBucket(self.channelLimit, self.channelPer, self.clock))
+        seq = next(self.sequence) if seq is None else seq
+        heapq.heappush(self.queues[key].heap, (message.priority, seq, message))
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def put(self, channel: Channel, content: str = None, embed: Embed = None,
+            priority: MessagePriority = MessagePriority.event, action: str = "send",
+            target: Message = None) -> asyncio.Future:
+        """
+        Queues a message without waiting for it to be sent.
+        :param channel: Channel the message is sent to
+        :param content: Text of the message
+        :param embed: Embed of the message
+        :param priority: Priority of the message
+        :param action: send, or edit or pin of target
+        :param target: Sent message that is edited or pinned
+        :return: Future with the sent message, failed if the message was dropped
+        """
+        future = asyncio.Future()
+        # failures are logged by the queue, messages that are only put aren't awaited
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+        self.enqueue(OutboundMessage(channel, content, embed, priority, self.clock(), future, action, target))
+        return future
+
+    async def send(self, channel: Channel, content: str = None, embed: Embed = None,
+                   priority: MessagePriority = MessagePriority.command) -> Message:
+        """
+        Queues a message and waits until it is sent.
+        :return: Sent message
+        """
+        return await self.put(channel, content, embed, priority)
+
+    async def edit(self, message: Message, embed: Embed,
+                   priority: MessagePriority = MessagePriority.low) -> Message:
+        """
+        Queues an edit of a sent message and waits until it is done. Edits count against the rate limit of the
+        channel like new messages.
+        :return: Edited message
+        """
+        return await self.put(message.channel, None, embed, priority, "edit", message)
+
+    async def pin(self, message: Message, priority: MessagePriority = MessagePriority.low):
+        """
+        Queues pinning a sent message and waits until it is done.
+        """
+        return await self.put(message.channel, None, None, priority, "pin", message)
+
+    async def drain(self):
+        """
+        Waits until all queued messages are sent or dropped.
+        """
+        while self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self.maxBackoff, self.baseBackoff * 2 ** (attempts - 1))
+        return delay / 2 + self.jitter() * delay / 2
+
+    def finish(self, message: OutboundMessage, result: Union[Message, None] = None, error: Exception = None):
+        if message.future.done():
+            return
+        if error is None:
+            latency = self.clock() - message.created
+            self.sent += 1
+            self.totalLatency += latency
+            self.maxLatency = max(self.maxLatency, latency)
+            message.future.set_result(result)
+        else:
+            self.dropped += 1
+            logger.error(f"Dropping message to {message.channel} after {message.attempts} attempts: {error}")
+            message.future.set_exception(error)
+
+    async def deliver(self, queue: ChannelQueue, seq: int, message: OutboundMessage):
+        message.attempts += 1
+        try:
+            if message.action == "edit":
+                result = await client.edit_message(message.target, embed=message.embed)
+            elif message.action == "pin":
+                result = await client.pin_message(message.target)
+            else:
+                result = await client.send_message(message.channel, message.content, embed=message.embed)
+            self.finish(message, result)
+        except Forbidden as e:
+            self.finish(message, error=e)
+        except NotFound as e:
+            if message.action != "send":
+                # the message was deleted
+                self.finish(message, error=e)
+                return
+            # the channel may have been recreated in the meantime
+            channel = ChannelRegistry.get(message.channel.server, message.channel.name)
+            if channel is None or channel.id == message.channel.id or message.attempts >= self.maxAttempts:
+                self.finish(message, error=e)
+            else:
+                message.channel = channel
+                self.enqueue(message, seq)
+        except (HTTPException, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            if message.attempts >= self.maxAttempts:
+                self.finish(message, error=e)
+            else:
+                delay = self.backoff(message.attempts)
+                self.retries += 1
+                logger.warning(f"Sending to {message.channel} failed ({e}), retrying in {delay:.1f}s")
+                queue.blockedUntil = self.clock() + delay
+                heapq.heappush(queue.heap, (message.priority, seq, message))
+        except Exception as e:
+            logger.exception(f"Sending to {message.channel} failed: {e}")
+            self.finish(message, error=e)
+        finally:
+            self.inFlight -= 1
+            queue.busy = False
+            if self.wakeup is not None:
+                self.wakeup.set()
+
+    def nextQueue(self):
+        """
+        Returns the channel queue holding the most important message that may be sent now and the seconds until
+        the next channel is allowed to send (None if no message is waiting).
+        """
+        now = self.clock()
+        best = None
+        wait = None
+        for key, queue in list(self.queues.items()):
+            if queue.busy:
+                continue
+            if queue.heap == []:
+                # idle channels are removed once their rate limit window has passed
+                if queue.bucket.delay() == 0 and not queue.bucket.sends:
+                    del self.queues[key]
+                continue
+            delay = max(queue.blockedUntil - now, queue.bucket.delay())
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+            elif best is None or queue.heap[0][:2] < best.heap[0][:2]:
+                best = queue
+        return best, wait
+
+    async def sleep(self, delay: Union[float, None]):
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+        self.wakeup.clear()
+
+    @task
+    async def run(self):
+        """
+        Main loop of the queue. Should be called via start or create_task!
+        """
+        self.wakeup = asyncio.Event()
+        while True:
+            queue, wait = self.nextQueue()
+            if queue is None:
+                await self.sleep(wait)
+                continue
+
+            globalDelay = self.globalBucket.delay()
+            if globalDelay > 0:
+                await self.sleep(globalDelay)
+                continue
+
+            priority, seq, message = heapq.heappop(queue.heap)
+            queue.busy = True
+            queue.bucket.take()
+            self.globalBucket.take()
+            self.inFlight += 1
+            asyncio.ensure_future(self.deliver(queue, seq, message))
+
+    def start(self, loop=None):
+        if self.future is None:
+            self.future = asyncio.ensure_future(self.run(), loop=loop)
+
+    def stop(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def statistics(self) -> Dict:
+        depth = dict((i.name, 0) for i in MessagePriority)
+        for queue in self.queues.values():
+            for priority, _, _ in queue.heap:
+                depth[MessagePriority(priority).name] += 1
+        return {'depth': sum(depth.values()),
+                'depthByPriority': depth,
+                'channels': len(self.queues),
+                'inFlight': self.inFlight,
+                'sent': self.sent,
+                'retries': self.retries,
+                'dropped': self.dropped,
+                'meanLatency': self.totalLatency / self.sent if self.sent else 0.0,
+                'maxLatency': self.maxLatency}
+
+
+messageQueue = MessageQueue()
@@ -0,0 +1,254 @@
+import json
+import logging
+import math
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Union
+
+from pytz import UTC
+
+from database.models import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class MatchPhase(Enum):
+    preMatch = "pre match"
+    live = "live"
+    halfTime = "half time"
+    finished = "finished"
+
+
+def matchPhase(data: Dict) -> MatchPhase:
+    """
+    Derives the phase of a match from its live document.
+    :param data: match entry of the live document
+    :return: Phase of the match
+    """
+    if data['isFinished']:
+        return MatchPhase.finished
+    events = data.get('events') or []
+    if events != []:
+        # the feed lists the newest event first
+        latest = events[0]
+        if latest['phaseDescriptionShort'] == "HT" or \
+                (latest['eventCode'] == 14 and latest['phaseDescriptionShort'] == "1H"):
+            return MatchPhase.halfTime
+    if data['isLive']:
+        return MatchPhase.live
+    if data.get('isStarted'):
+        # started, but neither live nor finished: a break in the match
+        return MatchPhase.halfTime
+    return MatchPhase.preMatch
+
+
+class PollingState:
+    """
+    Per match state of the polling policy.
+    """
+    def __init__(self):
+        self.phase = None
+        self.signature = None
+        self.idlePolls = 0
+        self.kickoffPolls = 0
+        self.finishedPolls = 0
+        self.fixedEndCycles = PollingPolicy.fixedEndCycles
+
+
+class PollingPolicy:
+    """
+    Decides when the live document of a match is polled next, depending on the phase of the match and its scheduled
+    kickoff, and how the new events of the polls are posted. All intervals are in seconds.
+    """
+    # the schedule that was used before: 600s until the lineups are available, 20s afterwards and 10 more polls
+    # after full time
+    fixedPreMatchInterval = 600
+    fixedLiveInterval = 20
+    fixedEndCycles = 10
+
+    parameters = ['preMatchInterval', 'nearKickoff', 'nearKickoffInterval', 'kickoffInterval', 'kickoffPolls',
+                  'liveInterval', 'liveIdleInterval', 'idlePolls', 'halfTimeInterval', 'finishedInterval',
+                  'finishedPolls', 'coalesceEvents', 'coalesceWindow']
+
+    def __init__(self, preMatchInterval: float = 600, nearKickoff: float = 900, nearKickoffInterval: float = 60,
+                 kickoffInterval: float = 20, kickoffPolls: int = 90, liveInterval: float = 20,
+                 liveIdleInterval: float = 30, idlePolls: int = 6, halfTimeInterval: float = 60, finishedInterval: float = 60,
+                 finishedPolls: int = 3, coalesceEvents: int = 1, coalesceWindow: float = 0):
+        """
+        :param preMatchInterval: Interval until nearKickoff seconds before the kickoff
+        :param nearKickoff: Seconds before the kickoff from which nearKickoffInterval is used
+        :param nearKickoffInterval: Interval shortly before the kickoff
+        :param kickoffInterval: Interval after the scheduled kickoff, until the match is live
+        :param kickoffPolls: Number of polls after the scheduled kickoff after which a match that isn't live yet (e.g.
+        a delayed or postponed match) is polled every preMatchInterval again
+        :param liveInterval: Interval while the match is played
+        :param liveIdleInterval: Interval while the match is played, but nothing happened for idlePolls polls (e.g. a
+        long stoppage)
+        :param idlePolls: Number of polls without new events or goals after which liveIdleInterval is used
+        :param halfTimeInterval: Interval during half time
+        :param finishedInterval: Interval after full time, to catch late corrections of the feed
+        :param finishedPolls: Number of polls after full time
+        :param coalesceEvents: 1 merges the new events of a match into a single message with a field per event, 0
+        posts a message per event
+        :param coalesceWindow: Seconds the new events are held to merge them with the events of the following polls,
+        0 merges only the events of one poll
+        """
+        self.preMatchInterval = preMatchInterval
+        self.nearKickoff = nearKickoff
+        self.nearKickoffInterval = nearKickoffInterval
+        self.kickoffInterval = kickoffInterval
+        self.kickoffPolls = kickoffPolls
+        self.liveInterval = liveInterval
+        self.liveIdleInterval = liveIdleInterval
+        self.idlePolls = idlePolls
+        self.halfTimeInterval = halfTimeInterval
+        self.finishedInterval = finishedInterval
+        self.finishedPolls = finishedPolls
+        self.coalesceEvents = coalesceEvents
+        self.coalesceWindow = coalesceWindow
+
+    def nextInterval(self, data: Dict, kickoff: datetime, state: PollingState,
+                     now: datetime = None) -> Union[float, None]:
+        """
+        Returns the delay until the next poll of a match and records the calls against the fixed schedule.
+        :param data: match entry of the live document
+        :param kickoff: scheduled kickoff (Match.date)
+        :param state: PollingState of the match
+        :param now: current time, utcnow if None
+        :return: Seconds until the next poll, None if the match doesn't need to be polled anymore
+        """
+        if now is None:
+            now = datetime.utcnow().replace(tzinfo=UTC)
+        phase = matchPhase(data)
+        state.phase = phase
+
+        signature = (len(data.get('events') or []), data.get('scoreHome'), data.get('scoreAway'))
+        if signature == state.signature:
+            state.idlePolls += 1
+        else:
+            state.idlePolls = 0
+            state.signature = signature
+
+        if phase == MatchPhase.finished:
+            state.finishedPolls += 1
+            interval = self.finishedInterval if state.finishedPolls <= self.finishedPolls else None
+        elif phase == MatchPhase.halfTime:
+            interval = self.halfTimeInterval
+        elif phase == MatchPhase.live:
+            interval = self.liveIdleInterval if state.idlePolls >= self.idlePolls else self.liveInterval
+        else:
+            untilKickoff = (kickoff.replace(tzinfo=UTC) - now).total_seconds()
+            if untilKickoff <= 0:
+                state.kickoffPolls += 1
+                interval = self.kickoffInterval if state.kickoffPolls <= self.kickoffPolls else self.preMatchInterval
+            elif untilKickoff <= self.nearKickoff:
+                interval = self.nearKickoffInterval
+            else:
+                # wake up when the time shortly before kickoff starts
+                interval = min(self.preMatchInterval, untilKickoff - self.nearKickoff)
+
+        PollingPolicies.record(data, phase, interval, state)
+        return interval
+
+    @staticmethod
+    def checkParameter(key: str, value: float) -> Union[str, None]:
+        """
+        Returns why a value isn't allowed for a parameter, None if it is. Intervals have to be positive, otherwise
+        the live poller would poll the match again immediately, counts and offsets mustn't be negative.
+        """
+        if key not in PollingPolicy.parameters:
+            return f"Unknown parameter {key}. Available: {', '.join(PollingPolicy.parameters)}"
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            return f"{key} needs to be a finite number"
+        if key.endswith("Interval") and value <= 0:
+            return f"{key} needs to be greater than 0"
+        if value < 0:
+            return f"{key} mustn't be negative"
+        return None
+
+    def toDict(self) -> Dict:
+        return dict((i, getattr(self, i)) for i in PollingPolicy.parameters)
+
+    def __str__(self):
+        return ", ".join(f"{key}={val}" for key, val in self.toDict().items())
+
+
+class PollingPolicies:
+    """
+    Polling policies per competition. Competitions without a policy of their own use the default policy. Policies
+    are stored as json within the settings, with the name pollingPolicy:<competition>.
+    """
+    settingsPrefix = "pollingPolicy:"
+    default = PollingPolicy()
+    policies = {}
+    calls = 0
+    fixedCalls = 0.0
+
+    @staticmethod
+    def get(competition: str) -> PollingPolicy:
+        return PollingPolicies.policies.get(competition, PollingPolicies.default)
+
+    @staticmethod
+    def fromJson(value: str) -> PollingPolicy:
+        parameters = json.loads(value)
+        invalid = dict((key, PollingPolicy.checkParameter(key, val)) for key, val in parameters.items())
+        invalid = dict((key, reason) for key, reason in invalid.items() if reason is not None)
+        if invalid != {}:
+            logger.error(f"Ignoring invalid polling policy parameters: {', '.join(invalid.values())}")
+        return PollingPolicy(**dict((key, val) for key, val in parameters.items() if key not in invalid.keys()))
+
+    @staticmethod
+    def load():
+        """
+        Reads all policies from the settings. Accesses the database!
+        """
+        policies = {}
+        for setting in Settings.objects.filter(name__startswith=PollingPolicies.settingsPrefix):
+            competition = setting.name[len(PollingPolicies.settingsPrefix):]
+            try:
+                policies[competition] = PollingPolicies.fromJson(setting.value)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Invalid polling policy for {competition}: {e}")
+        PollingPolicies.policies = policies
+
+    @staticmethod
+    def save(competition: str, parameters: Union[Dict, None]) -> PollingPolicy:
+        """
+        Stores the policy of a competition. Accesses the database!
+        :param competition: Name of the competition
+        :param parameters: Parameters that differ from the default policy, None removes the policy of the competition
+        :return: The policy that is used for the competition from now on
+        """
+        name = PollingPolicies.settingsPrefix + competition
+        Settings.objects.filter(name=name).delete()
+        if parameters is None:
+            PollingPolicies.policies.pop(competition, None)
+        else:
+            policy = PollingPolicy(**parameters)
+            Settings(name=name, value=json.dumps(parameters)).save()
+            PollingPolicies.policies[competition] = policy
+        return PollingPolicies.get(competition)
+
+    @staticmethod
+    def record(data: Dict, phase: MatchPhase, interval: Union[float, None], state: PollingState):
+        """
+        Counts a poll and the calls the fixed schedule would have done until the next poll.
+        """
+        PollingPolicies.calls += 1
+        if phase == MatchPhase.finished:
+            if interval is None:
+                fixedCalls = state.fixedEndCycles
+            else:
+                fixedCalls = min(interval / PollingPolicy.fixedLiveInterval, state.fixedEndCycles)
+            state.fixedEndCycles -= fixedCalls
+        elif data['hasLineup']:
+            fixedCalls = interval / PollingPolicy.fixedLiveInterval
+        else:
+            fixedCalls = interval / PollingPolicy.fixedPreMatchInterval
+        PollingPolicies.fixedCalls += fixedCalls
+
+    @staticmethod
+    def statistics() -> Dict:
+        return {'calls': PollingPolicies.calls,
+                'fixedCalls': round(PollingPolicies.fixedCalls),
+                'saved': round(PollingPolicies.fixedCalls - PollingPolicies.calls)}
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Union
+
+from discord import Embed
+from discord.errors import HTTPException, NotFound
+from django.core.exceptions import ObjectDoesNotExist
+
+from database.models import Settings
+from discord_handler.guildRouting import GuildRouting
+from discord_handler.messageQueue import messageQueue, MessagePriority
+from discord_handler.pollingPolicy import MatchPhase, PollingState
+from discord_handler.bridge import bridge
+
+logger = logging.getLogger(__name__)
+
+
+class Scoreboard:
+    """
+    Pinned message in a matchday channel, listing the score, goals and phase of the matches of the matchday. Matches
+    touch the scoreboard when they score or change their phase, the message is edited debounce seconds after the
+    first touch, so several goals within that time lead to a single edit. The messages go through the message queue
+    with low priority, events of the matches are sent first. Touches while an update waits in the queue lead to a
+    single edit after it.
+    """
+    def __init__(self, competition: str, channelName: str, debounce: float):
+        """
+        :param competition: Name of the competition, the scoreboard is sent to the servers watching it
+        :param channelName: Name of the matchday channel
+        :param debounce: Seconds between a change and the edit of the message
+        """
+        self.competition = competition
+        self.channelName = channelName
+        self.debounce = debounce
+        self.matches = OrderedDict()
+        self.messages = {}
+        self.handle = None
+        self.updating = False
+        self.dirty = False
+        self.edits = 0
+
+    def touch(self, liveMatch):
+        """
+        Marks the scoreboard as changed by a match, the message is updated after the debounce time.
+        :param liveMatch: LiveMatch object that changed
+        """
+        self.matches[liveMatch.match.id] = liveMatch
+        self.dirty = True
+        self.schedule()
+
+    def schedule(self):
+        if self.handle is None and not self.updating:
+            self.handle = asyncio.get_event_loop().call_later(self.debounce, self.flush)
+
+    def flush(self):
+        self.handle = None
+        asyncio.ensure_future(self.update())
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def embed(self) -> Embed:
+        embObj = Embed(title="Live scores")
+        for liveMatch in self.matches.values():
+            goals = "\n".join(i for i in liveMatch.goalList if i != "")
+            phase = liveMatch.pollingState.phase
+            if phase is not None:
+                goals = f"_{phase.value.capitalize()}_\n{goals}"
+            embObj.add_field(name=liveMatch.title, value=goals if goals != "" else "No goals yet", inline=False)
+        return embObj
+
+    async def update(self):
+        """
+        Sends the scoreboard to the channel with its name on every server watching the competition, edits the message if it was already sent.
+        """
+        self.updating = True
+        self.dirty = False
+        try:
+            embObj = self.embed()
+            for channel in GuildRouting.channels(self.competition, self.channelName):
+                message = self.messages.get(channel.id)
+                if message is None:
+                    message = await messageQueue.send(channel, embed=embObj, priority=MessagePriority.low)
+                    self.messages[channel.id] = message
+                    try:
+                        await messageQueue.pin(message)
+                    except HTTPException as e:
+                        logger.warning(f"Can't pin the scoreboard in {channel.name}: {e}")
+                    continue
+
+                try:
+                    self.messages[channel.id] = await messageQueue.edit(message, embObj)
+                    self.edits += 1
+                except NotFound:
+                    # the message was deleted, it is sent again
+                    del self.messages[channel.id]
+                    self.dirty = True
+        except Exception as e:
+            logger.exception(f"Updating the scoreboard of {self.channelName} failed: {e}")
+        finally:
+            self.updating = False
+            if self.dirty:
+                self.schedule()
+
+
+class MatchSnapshot:
+    """
+    A match of the poller process, with what its scoreboard entry shows.
+    """
+    def __init__(self, competition: str, channelName: str, matchID: int, title: str, goals: List[str],
+                 phase: Union[str, None]):
+        self.match = type("Match", (), {"id": matchID})
+        self.competition = competition
+        self.channelName = channelName
+        self.title = title
+        self.goalList = goals
+        self.pollingState = PollingState()
+        self.pollingState.phase = MatchPhase(phase) if phase is not None else None
+
+
+class Scoreboards:
+    """
+    Scoreboards of all matchday channels. They are optional, enabled by the setting scoreboard.
+    """
+    settingName = "scoreboard"
+    enabled = False
+    debounce = 5
+    boards = {}
+
+    @staticmethod
+    def touch(liveMatch):
+        if bridge.isPoller():
+            # the discord process decides whether scoreboards are enabled
+            phase = liveMatch.pollingState.phase
+            bridge.send("scoreboard", competition=liveMatch.competition, channelName=liveMatch.channelName,
+                        matchID=liveMatch.match.id, title=liveMatch.title, goals=liveMatch.goalList,
+                        phase=phase.value if phase is not None else None)
+            return
+        if not Scoreboards.enabled:
+            return
+        if liveMatch.channelName not in Scoreboards.boards.keys():
+            Scoreboards.boards[liveMatch.channelName] = Scoreboard(liveMatch.competition, liveMatch.channelName,
+                                                                        Scoreboards.debounce)
+        Scoreboards.boards[liveMatch.channelName].touch(liveMatch)
+
+    @staticmethod
+    def remove(channelName: str):
+        """
+        Removes the scoreboard of a matchday channel, e.g. when the channel is deleted.
+        """
+        board = Scoreboards.boards.pop(channelName, None)
+        if board is not None:
+            board.cancel()
+
+    @staticmethod
+    def load():
+        """
+        Reads whether scoreboards are enabled. Accesses the database!
+        """
+        try:
+            Scoreboards.enabled = Settings.objects.get(name=Scoreboards.settingName).value == "on"
+        except ObjectDoesNotExist:
+            Scoreboards.enabled = False
+
+    @staticmethod
+    def save(enabled: bool):
+        """
+        Stores whether scoreboards are enabled, apply has to be called on the event loop afterwards. Accesses the
+        database!
+        """
+        Settings.objects.filter(name=Scoreboards.settingName).delete()
+        Settings(name=Scoreboards.settingName, value="on" if enabled else "off").save()
+
+    @staticmethod
+    def apply(enabled: bool):
+        """
+        Enables or disables the scoreboards, disabling stops the pending updates. Has to run on the event loop.
+        """
+        Scoreboards.enabled = enabled
+        if not enabled:
+            for channelName in list(Scoreboards.boards.keys()):
+                Scoreboards.remove(channelName)
+
+    @staticmethod
+    def statistics() -> Dict:
+        return {'enabled': Scoreboards.enabled,
+                'boards': len(Scoreboards.boards),
+                'edits': sum(i.edits for i in Scoreboards.boards.values())}
@@ -0,0 +1,121 @@
+import json
+import logging
+import os
+import re
+import time
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class Template:
+    """
+    A stylesheet entry compiled into literal segments and slots. Placeholders ($name$) become slots, emojis (:name:)
+    within the literal segments are resolved once while compiling: known emojis of the servers are replaced by their
+    discord representation, unknown ones are removed. Rendering fills the slots of a copy of the segments and joins
+    them. Slots without a value (or None) are rendered empty.
+    """
+    slotPattern = re.compile(r'\$(\w+)\$')
+    emojiPattern = re.compile(r':[\w-]+:')
+
+    def __init__(self, source: str, emojis: Dict[str, str] = None):
+        """
+        :param source: Stylesheet entry
+        :param emojis: Name of the emoji to its discord representation
+        """
+        self.source = source
+        self.parts = []
+        self.slots = []
+        emojis = emojis if emojis is not None else {}
+
+        for index, text in enumerate(Template.slotPattern.split(source)):
+            # split returns literal segments at even and slot names at odd positions
+            if index % 2 == 1:
+                self.slots.append((len(self.parts), text))
+                self.parts.append("")
+            else:
+                text = Template.emojiPattern.sub(lambda emoji: emojis.get(emoji.group(0)[1:-1], ""), text)
+                if text != "":
+                    self.parts.append(text)
+
+    def render(self, **values) -> str:
+        """
+        Fills the slots with the given values.
+        :param values: Slot name to its value
+        :return: Rendered entry
+        """
+        parts = self.parts.copy()
+        for index, name in self.slots:
+            value = values.get(name)
+            if value is not None:
+                parts[index] = f"{value}"
+        return "".join(parts)
+
+    def slotNames(self) -> List[str]:
+        return [name for _, name in self.slots]
+
+
+class TemplateSheet:
+    """
+    All entries of a stylesheet (json file), compiled into Templates. The file is compiled again once it changes,
+    it is checked at most every checkInterval seconds. All sheets share the emojis of the servers.
+    """
+    emojis = {}
+    sheets = []
+
+    def __init__(self, fileName: str, checkInterval: float = 5, clock: Callable = time.monotonic):
+        """
+        :param fileName: Path of the json stylesheet
+        :param checkInterval: Seconds between checks for changes of the file
+        :param clock: Monotonic clock, replaceable for tests
+        """
+        self.fileName = fileName
+        self.checkInterval = checkInterval
+        self.clock = clock
+        self.templates = {}
+        self.sources = {}
+        self.mtime = None
+        self.lastCheck = None
+        TemplateSheet.sheets.append(self)
+
+    @staticmethod
+    def updateEmojis(emojis: Dict[str, str]):
+        """
+        Sets the emojis of the servers and compiles all sheets again.
+        :param emojis: Name of the emoji to its discord representation
+        """
+        TemplateSheet.emojis = dict(emojis)
+        for sheet in TemplateSheet.sheets:
+            sheet.compile()
+
+    def compile(self):
+        self.templates = dict((key, Template(val, TemplateSheet.emojis)) for key, val in self.sources.items())
+
+    def load(self):
+        with open(self.fileName, encoding="utf-8") as f:
+            self.sources = json.loads(f.read())
+        self.compile()
+        logger.debug(f"Compiled {len(self.templates)} templates of {self.fileName}")
+
+    def checkForChanges(self):
+        now = self.clock()
+        if self.lastCheck is not None and now - self.lastCheck < self.checkInterval:
+            return
+        self.lastCheck = now
+        mtime = os.stat(self.fileName).st_mtime
+        if mtime != self.mtime:
+            if self.mtime is not None:
+                logger.info(f"{self.fileName} changed, compiling it again")
+            self.mtime = mtime
+            self.load()
+
+    def get(self, key: str) -> Template:
+        self.checkForChanges()
+        try:
+            return self.templates[key]
+        except KeyError:
+            logger.error(f"Key {key} not available in stylesheet")
+            return Template("")
+
+    def render(self, key: str, **values) -> str:
+        return self.get(key).render(**values)
@@ -8,9 +8,11 @@ path = os.path.dirname(os.path.realpath(__file__)) + "/"
 def setup_logging(
     default_path=path+'logsettings.json',
     default_level=logging.DEBUG,
+    filePrefix="",
 ):
     '''Setup logging configuration
 
+    filePrefix is put in front of the names of the log files, so several processes don't write the same files
     '''
 
     logging.getLogger("requests").setLevel(logging.INFO)
@@ -18,7 +20,7 @@ def setup_logging(
     logging.getLogger("websockets.protocol").setLevel(logging.INFO)
     logger = logging.getLogger('discord')
     logger.setLevel(logging.ERROR)
-    handler = logging.FileHandler(filename='discord.log', encoding='utf-8', mode='w')
+    handler = logging.FileHandler(filename=filePrefix + 'discord.log', encoding='utf-8', mode='w')
     handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
     logger.addHandler(handler)
 
@@ -27,7 +29,7 @@ def setup_logging(
         with open(pathLogSettings, 'rt') as f:
             config = json.load(f)
         for i in ['info_file_handler','debug_file_handler','error_file_handler']:
-            config['handlers'][i]['filename'] = path + "../" + config['handlers'][i]['filename']
+            config['handlers'][i]['filename'] = path + "../" + filePrefix + config['handlers'][i]['filename']
 
         logging.config.dictConfig(config)
     else:
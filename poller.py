@@ -0,0 +1,42 @@
+"""
+Poller process of the multi process mode. It runs the schedulers and the live poller and forwards the rendered events,
+channels and scoreboards over the bridge to the discord process, which starts it:
+
+    python __main__.py --split
+"""
+import os
+import sys
+import asyncio
+import logging
+from django.core.wsgi import get_wsgi_application
+# Django specific settings
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+# Ensure settings are read
+application = get_wsgi_application()
+from loghandler.loghandler import setup_logging
+from discord_handler.handler import Scheduler, setupPollerBridge
+from discord_handler.bridge import bridge
+from discord_handler.livePoller import livePoller
+from discord_handler.jobScheduler import jobScheduler
+from support.helper import loopLagMonitor
+
+setup_logging(filePrefix="poller-")
+logger = logging.getLogger(__name__)
+
+
+async def runPoller(bridgePath: str):
+    await bridge.connect(bridgePath)
+    setupPollerBridge()
+    loop = asyncio.get_event_loop()
+    loopLagMonitor.start(loop)
+    livePoller.start(loop)
+    jobScheduler.start(loop)
+    loop.create_task(Scheduler.maintananceScheduler())
+    loop.create_task(Scheduler.matchScheduler())
+    # the poller process ends with the discord process
+    await bridge.receive()
+
+
+if __name__ == "__main__":
+    logger.info("------------------Soccerbot poller is starting-----------------------")
+    asyncio.get_event_loop().run_until_complete(runPoller(sys.argv[1]))
@@ -3,7 +3,8 @@ logger = logging.getLogger(__name__)
 import asyncio
 import logging
 import sys
-from typing import Callable
+import time
+from typing import Callable, Dict
 from datetime import datetime,timezone
 import os
 from git import Git,Repo
@@ -50,6 +51,59 @@ def task(fun:Callable):
         return res
     return func_wrapper
 
+class LoopLagMonitor:
+    """
+    Measures how long the event loop is blocked. A coroutine sleeps for a fixed interval, anything it wakes up later
+    than planned is time the loop was busy with something else, i.e. blocking work within a coroutine.
+    """
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, clock: Callable = time.monotonic):
+        """
+        :param interval: Sleep interval of the probe in seconds
+        :param threshold: Lag in seconds from which a wake up counts as a stall
+        :param clock: Monotonic clock, replaceable for tests
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.clock = clock
+        self.samples = 0
+        self.totalLag = 0.0
+        self.maxLag = 0.0
+        self.stalls = 0
+        self.future = None
+
+    def record(self, lag: float):
+        self.samples += 1
+        self.totalLag += lag
+        self.maxLag = max(self.maxLag, lag)
+        if lag >= self.threshold:
+            self.stalls += 1
+            logger.warning(f"Event loop was blocked for {lag:.3f}s")
+
+    async def run(self):
+        while True:
+            before = self.clock()
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, self.clock() - before - self.interval))
+
+    def start(self, loop=None):
+        if self.future is None:
+            self.future = asyncio.ensure_future(self.run(), loop=loop)
+
+    def stop(self):
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def statistics(self) -> Dict:
+        return {'samples': self.samples,
+                'meanLag': self.totalLag / self.samples if self.samples else 0.0,
+                'maxLag': self.maxLag,
+                'blocked': self.totalLag,
+                'stalls': self.stalls}
+
+
+loopLagMonitor = LoopLagMonitor()
+
 async def shutdown():
     await asyncio.sleep(10)
     logger.info("Shutting down!")
@@ -2,9 +2,13 @@ import pytest
 from api.calls import *
 from database.models import *
 from httmock import all_requests, HTTMock
-from typing import Dict
+from typing import Dict, Iterator
 import json
 import os
+import threading
+import asyncio
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 
 
 def loadJsonFile(fileName: str) -> Dict:
@@ -44,30 +48,44 @@ getCallList = [
     (Team, [1885546],  getSpecificTeam),
 ]
 
-def unifiedHttMock(url,request):
-    print(request.path_url)
-    if ApiCalls.federations in request.path_url:
+def loadFixtureForPath(pathUrl: str) -> Dict:
+    if ApiCalls.federations in pathUrl:
         data = loadJsonFile(path + "federation.json")
-    elif ApiCalls.competitions in request.path_url:
+    elif ApiCalls.competitions in pathUrl:
         data = loadJsonFile(path + "competitions.json")
-    elif ApiCalls.seasons in request.path_url:
+    elif ApiCalls.seasons in pathUrl:
         data = loadJsonFile(path + "seasons.json")
-    elif ApiCalls.matches in request.path_url:
+    elif ApiCalls.matches in pathUrl:
         data = loadJsonFile(path + "matches.json")
-    elif ApiCalls.teams in request.path_url:
+    elif ApiCalls.teams in pathUrl:
         data = loadJsonFile(path + "teams.json")
-    elif ApiCalls.countries in request.path_url:
+    elif ApiCalls.countries in pathUrl:
         data = loadJsonFile(path + "countries.json")
-    elif ApiCalls.specificTeam in request.path_url:
+    elif ApiCalls.specificTeam in pathUrl:
         data = loadJsonFile(path+ "specificTeam.json")
-    elif DataCalls.liveData in request.path_url:
+    elif DataCalls.liveData in pathUrl:
         data = loadJsonFile(path + "live.json")
     else:
         data = {}
+    return data
+
+def unifiedHttMock(url,request):
+    print(request.path_url)
+    data = loadFixtureForPath(request.path_url)
+    if "continuationToken" in request.path_url:
+        # follow up pages are the last page
+        data['ContinuationToken'] = None
     return {'status_code': 200,
             'content': data}
 
 
+async def unifiedAsyncMock(url : str, params : Dict) -> bytes:
+    """
+    Replacement for api.calls.asyncFetch, serving the same files as unifiedHttMock
+    """
+    return json.dumps(loadFixtureForPath(url)).encode()
+
+
 def testAPICallObjects():
     """
     Checking API keywords.
@@ -134,6 +152,28 @@ def testMakeMiddlewareCall():
         assert isinstance(result, dict)
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize("values", apiCallList)
+async def testAsyncMakeAPICall(values, monkeypatch):
+    """
+    Tries all different request possibilities for the async API call
+    """
+    monkeypatch.setattr("api.calls.asyncFetch", unifiedAsyncMock)
+    result = await asyncMakeAPICall(values[0], values[1])
+    assert isinstance(result, list)
+
+
+@pytest.mark.asyncio
+async def testAsyncMakeMiddlewareCall(monkeypatch):
+    """
+    Tries the live dataset for the async Middleware call
+    """
+    monkeypatch.setattr("api.calls.asyncFetch", unifiedAsyncMock)
+    result = await asyncMakeMiddlewareCall(DataCalls.liveData)
+    assert isinstance(result, dict)
+    assert "match" in result.keys()
+
+
 @pytest.mark.parametrize("values", getCallList)
 def testGetCalls(values):
     """
@@ -146,8 +186,216 @@ def testGetCalls(values):
         except:
             feds = values[2](*values[1])
         if values[2] != getSpecificTeam:
-            assert isinstance(feds, list)
+            assert isinstance(feds, Iterator)
+            feds = list(feds)
+            assert len(feds) != 0
             for i in feds:
                 assert isinstance(i, values[0])
         else:
             assert isinstance(feds, Team)
+
+
+def testMakePagedAPICall():
+    """
+    All pages are read by following the continuation token
+    """
+    pages = {
+        None: {"ContinuationToken": "page2", "Results": [{"id": 1}, {"id": 2}]},
+        "page2": {"ContinuationToken": "page3", "Results": [{"id": 3}]},
+        "page3": {"ContinuationToken": None, "Results": [{"id": 4}]},
+    }
+    requestedTokens = []
+
+    def pagingMock(url, request):
+        query = parse_qs(urlparse(request.url).query)
+        token = query.get("continuationToken", [None])[0]
+        requestedTokens.append(token)
+        assert query["count"] == [str(PagedCalls.pageSize)]
+        return {'status_code': 200, 'content': pages[token]}
+
+    with HTTMock(pagingMock):
+        result = makePagedAPICall(ApiCalls.matches, {"idCompetition": 1})
+        assert isinstance(result, Iterator)
+        assert [i["id"] for i in result] == [1, 2, 3, 4]
+    assert requestedTokens == [None, "page2", "page3"]
+
+
+def testMakePagedAPICallRepeatedToken():
+    """
+    A continuation token that is handed out twice ends the iteration
+    """
+    def loopingMock(url, request):
+        return {'status_code': 200, 'content': {"ContinuationToken": "same", "Results": [{"id": 1}]}}
+
+    with HTTMock(loopingMock):
+        assert len(list(makePagedAPICall(ApiCalls.teams))) == 2
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        content = json.dumps({"Results": []}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def keepAliveServer():
+    server = HTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def testSessionManagerConfigure():
+    """
+    Pool size is applied to the adapters of the session
+    """
+    SessionManager.configure(poolSize=3, connectTimeout=2, readTimeout=4)
+    try:
+        session = SessionManager.session()
+        assert session is SessionManager.session()
+        assert session.get_adapter(ApiCalls.api_home)._pool_maxsize == 3
+        assert "gzip" in session.headers['Accept-Encoding']
+        assert SessionManager.timeout() == (2, 4)
+    finally:
+        SessionManager.configure(poolSize=10, connectTimeout=5, readTimeout=30)
+
+
+def testSessionManagerReusesConnections(keepAliveServer):
+    """
+    Consecutive requests to the same host share one connection
+    """
+    SessionManager.close()
+    for i in range(4):
+        SessionManager.session().get(keepAliveServer, timeout=SessionManager.timeout())
+
+    stats = SessionManager.poolStatistics()['sync']
+    assert stats['requests'] == 4
+    assert stats['connections'] == 1
+    assert stats['reuseRatio'] == 0.75
+    assert stats['openConnections'] == 1
+    SessionManager.close()
+    assert SessionManager.poolStatistics()['sync']['requests'] == 0
+
+
+@pytest.mark.asyncio
+async def testAsyncSessionReusesConnections(keepAliveServer):
+    """
+    Consecutive async requests to the same host share one connection
+    """
+    SessionManager.close()
+    for i in range(4):
+        await asyncFetch(keepAliveServer, {})
+
+    stats = SessionManager.poolStatistics()['async']
+    assert stats['requests'] == 4
+    assert stats['connections'] == 1
+    assert stats['reuseRatio'] == 0.75
+    SessionManager.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def countingMiddleware(monkeypatch):
+    calls = []
+
+    async def middleware(keyword, payload=None):
+        calls.append(keyword)
+        await asyncio.sleep(0.01)
+        return {"match": {"id": keyword}}
+
+    monkeypatch.setattr("api.calls.asyncMakeMiddlewareCall", middleware)
+    return calls
+
+
+@pytest.mark.asyncio
+async def testLiveDataCacheSingleFlight(countingMiddleware):
+    """
+    Concurrent callers for the same match share one request
+    """
+    cache = LiveDataCache()
+    results = await asyncio.gather(*[cache.get(1) for i in range(5)], cache.get(2))
+
+    assert len(countingMiddleware) == 2
+    assert all(i is results[0] for i in results[:5])
+    assert cache.statistics() == {'hits': 0, 'misses': 2, 'shared': 4, 'size': 2}
+
+    await cache.get(1)
+    assert cache.statistics()['hits'] == 1
+    assert len(countingMiddleware) == 2
+
+
+@pytest.mark.asyncio
+async def testLiveDataCacheTTL(countingMiddleware):
+    """
+    Entries are fetched again once their ttl has passed
+    """
+    clock = FakeClock()
+    cache = LiveDataCache(ttl=20, clock=clock)
+    await cache.get(1)
+    clock.now = 19
+    await cache.get(1)
+    assert len(countingMiddleware) == 1
+    clock.now = 21
+    await cache.get(1)
+    assert len(countingMiddleware) == 2
+
+    cache.invalidate(1)
+    await cache.get(1)
+    assert len(countingMiddleware) == 3
+
+    # matches polled more often than the ttl don't get older documents than their interval
+    clock.now = 27
+    await cache.get(1, maxAge=10)
+    assert len(countingMiddleware) == 3
+    await cache.get(1, maxAge=5)
+    assert len(countingMiddleware) == 4
+    clock.now = 60
+    await cache.get(1, maxAge=60)
+    assert len(countingMiddleware) == 5
+
+
+@pytest.mark.asyncio
+async def testLiveDataCacheLRU(countingMiddleware):
+    """
+    The least recently used match is dropped when the cache is full
+    """
+    cache = LiveDataCache(maxSize=2)
+    await cache.get(1)
+    await cache.get(2)
+    await cache.get(1)
+    await cache.get(3)
+    assert list(cache.entries.keys()) == [1, 3]
+
+
+@pytest.mark.asyncio
+async def testLiveDataCacheError(monkeypatch):
+    """
+    Failed requests are passed to all waiting callers and not cached
+    """
+    async def middleware(keyword, payload=None):
+        await asyncio.sleep(0.01)
+        raise json.decoder.JSONDecodeError("msg", "doc", 0)
+
+    monkeypatch.setattr("api.calls.asyncMakeMiddlewareCall", middleware)
+    cache = LiveDataCache()
+    results = await asyncio.gather(cache.get(1), cache.get(1), return_exceptions=True)
+    assert all(isinstance(i, json.decoder.JSONDecodeError) for i in results)
+    assert cache.statistics()['size'] == 0
+    assert cache.inFlight == {}
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+import pytest
+
+from database.executor import DBExecutor, runDB, dbCall
+from database.models import Settings
+from support.helper import LoopLagMonitor
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def testRunDB():
+    Settings(name="prefix", value="?").save()
+
+    def job():
+        return threading.current_thread().name, Settings.objects.get(name="prefix").value
+
+    threadName, value = await runDB(job)
+    assert threadName.startswith("database")
+    assert value == "?"
+
+    with pytest.raises(Settings.DoesNotExist):
+        await runDB(Settings.objects.get, name="notAvailable")
+
+
+@pytest.mark.asyncio
+async def testDBExecutorIsBounded():
+    DBExecutor.configure(maxWorkers=2)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    @dbCall
+    def job():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+
+    try:
+        await asyncio.gather(*[job() for _ in range(6)])
+        assert max(peak) == 2
+    finally:
+        DBExecutor.configure(maxWorkers=4)
+
+
+@pytest.mark.asyncio
+async def testLoopLagMonitor(event_loop):
+    blockingMonitor = LoopLagMonitor(interval=0.01)
+    blockingMonitor.start(event_loop)
+    await asyncio.sleep(0.05)
+    time.sleep(0.3)
+    await asyncio.sleep(0.05)
+    blockingMonitor.stop()
+
+    executorMonitor = LoopLagMonitor(interval=0.01)
+    executorMonitor.start(event_loop)
+    await asyncio.sleep(0.05)
+    await runDB(time.sleep, 0.3)
+    await asyncio.sleep(0.05)
+    executorMonitor.stop()
+
+    assert blockingMonitor.statistics()['maxLag'] >= 0.2
+    assert blockingMonitor.statistics()['stalls'] >= 1
+    assert executorMonitor.statistics()['maxLag'] < 0.1
+    assert executorMonitor.statistics()['samples'] > blockingMonitor.statistics()['samples']
@@ -11,8 +11,9 @@ import pytest
 from httmock import all_requests, HTTMock
 
 from database.handler import *
-from database.models import DiscordServer
-from tests.testAPI.test_calls import unifiedHttMock
+from database.models import DiscordServer, Association, Team
+from api.calls import ApiCalls
+from tests.testAPI.test_calls import unifiedHttMock, loadJsonFile, path
 
 @pytest.fixture(autouse=True)
 def enable_db_access_for_all_tests(db):
@@ -41,15 +42,135 @@ def testUpdateMatches():
 
 @pytest.fixture
 def preUpdate():
-    getAndSaveData(getAllFederations)
-    getAndSaveData(getAllCountries)
-    getAndSaveData(getAllCompetitions, idFederation="UEFA")
-    getAndSaveData(getAllSeasons, idCompetitions=2000000019)
-    comp = Competition.objects.get(id=2000000019)
-    season = Season.objects.get(id=2000011119)
-    getAndSaveData(getAllMatches, idCompetitions=comp.id, idSeason=season.id)
+    with HTTMock(unifiedHttMock):
+        getAndSaveData(getAllFederations)
+        getAndSaveData(getAllCountries)
+        getAndSaveData(getAllCompetitions, idFederation="UEFA")
+        getAndSaveData(getAllSeasons, idCompetitions=2000000019)
+        comp = Competition.objects.get(id=2000000019)
+        season = Season.objects.get(id=2000011119)
+        getAndSaveData(getAllMatches, idCompetitions=comp.id, idSeason=season.id)
     return comp,season
 
+def teamEchoHttMock(url, request):
+    """
+    Like unifiedHttMock, but a specific team request returns the requested team id
+    """
+    response = unifiedHttMock(url, request)
+    if ApiCalls.teams not in request.path_url and ApiCalls.specificTeam in request.path_url:
+        response['content']['IdTeam'] = request.path_url.split("/")[-1].split("?")[0]
+    return response
+
+def testGetAndSaveDataBulk():
+    with HTTMock(teamEchoHttMock):
+        getAndSaveData(getAllFederations, bulk=True)
+        stats = getAndSaveData(getAllCountries, bulk=True, batchSize=50)
+        assert stats.inserted == Association.objects.count()
+        # the countries fixture only holds the first page
+        Association(id="GER", clear_name="Germany").save()
+
+        getAndSaveData(getAllCompetitions, bulk=True, idFederation="UEFA")
+        getAndSaveData(getAllSeasons, bulk=True, idCompetitions=2000000019)
+
+        stats = getAndSaveData(getAllMatches, bulk=True, idCompetitions=2000000019, idSeason=2000011119)
+        assert stats.inserted == Match.objects.count() == 306
+        assert stats.skipped == 0
+        assert Team.objects.count() == 18
+
+        stats = getAndSaveData(getAllMatches, bulk=True, idCompetitions=2000000019, idSeason=2000011119)
+        assert (stats.inserted, stats.updated, stats.skipped) == (0, 306, 0)
+
+def testGetAndSaveDataBulkUpdatesFields(preUpdate):
+    comp,season = preUpdate
+    match = Match.objects.first()
+    Match.objects.filter(pk=match.pk).update(score_home_team=17, match_status=12)
+    with HTTMock(teamEchoHttMock):
+        getAndSaveData(getAllMatches, bulk=True, idCompetitions=comp.id, idSeason=season.id)
+    match.refresh_from_db()
+    assert match.score_home_team != 17
+    assert match.match_status != 12
+
+def testGetAndSaveDataBulkSkipsCompetitionsWithoutCountry():
+    with HTTMock(unifiedHttMock):
+        getAndSaveData(getAllFederations, bulk=True)
+        stats = getAndSaveData(getAllCompetitions, bulk=True, idFederation="UEFA")
+    # no countries were loaded, so every competition lacks its association
+    assert stats.inserted == Competition.objects.count() == 0
+    assert stats.skipped == len(loadJsonFile(path + "competitions.json")['Results'])
+
+def testGetAndSaveDataBulkMissingForeignKey():
+    with HTTMock(unifiedHttMock):
+        with pytest.raises(IntegrityError):
+            getAndSaveData(getAllSeasons, bulk=True, idCompetitions=2000000019)
+
+def testUpdateMatchesSingleCompetitionChangeSet(preUpdate, django_assert_num_queries):
+    comp,season = preUpdate
+    matches = list(Match.objects.order_by('id')[:3])
+
+    def finishedMatchMock(url, request):
+        # the api reports the second match as played
+        response = teamEchoHttMock(url, request)
+        if ApiCalls.matches in request.path_url:
+            for i in response['content']['Results']:
+                if int(i['IdMatch']) == matches[1].id:
+                    i['MatchStatus'] = MatchStatus.Played.value
+                    i['HomeTeamScore'] = 2
+                    i['AwayTeamScore'] = 1
+        return response
+
+    with HTTMock(teamEchoHttMock):
+        changeSet = updateMatchesSingleCompetition(comp,season)
+        assert changeSet.isEmpty()
+        assert changeSet.unchanged == 306
+
+    Match.objects.filter(pk=matches[0].pk).update(date=matches[0].date + timedelta(days=1))
+    Match.objects.filter(pk=matches[2].pk).delete()
+
+    with HTTMock(finishedMatchMock):
+        changeSet = updateMatchesSingleCompetition(comp,season)
+        assert [i.id for i in changeSet.rescheduled] == [matches[0].id]
+        assert [i.id for i in changeSet.finalScores] == [matches[1].id]
+        assert sorted(i.id for i in changeSet.updated) == [matches[0].id, matches[1].id]
+        assert [i.id for i in changeSet.newFixtures] == [matches[2].id]
+        assert changeSet.unchanged == 303
+        # the scheduler applies the changes on the event loop, so they must not access the database
+        with django_assert_num_queries(0):
+            for match in changeSet.updated + changeSet.newFixtures:
+                assert match.home_team.id == match.home_team_id and match.competition.id == comp.id
+
+        assert Match.objects.get(pk=matches[0].pk).date == matches[0].date
+        assert Match.objects.get(pk=matches[1].pk).score_home_team == 2
+        assert Match.objects.filter(pk=matches[2].pk).exists()
+        assert updateMatchesSingleCompetition(comp,season).isEmpty()
+
+def testCompDict(preUpdate, django_assert_num_queries):
+    comp,season = preUpdate
+    with HTTMock(teamEchoHttMock):
+        getAndSaveData(getAllMatches, bulk=True, idCompetitions=comp.id, idSeason=season.id)
+    watcher = CompetitionWatcher(competition=comp, current_season=season,
+                                 applicable_server=DiscordServer(name="temp"), current_matchday=1)
+
+    with django_assert_num_queries(1):
+        result = compDict(watcher)
+        for md, data in result.items():
+            for key in ['passedMatches', 'currentMatches', 'upcomingMatches']:
+                for liveMatch in data[key]:
+                    assert liveMatch.match.matchday == md
+                    assert liveMatch.title != "**** - : - ****"
+                    liveMatch.match.competition.clear_name
+
+    assert len(result) == 34
+    assert sum(len(data['passedMatches']) for data in result.values()) == 306
+    firstMatchDay = Match.objects.filter(matchday=1).order_by('date')
+    assert result[1]['start'] == firstMatchDay.first().date - timedelta(hours=1)
+    assert result[1]['end'] == firstMatchDay.last().date + timedelta(hours=3)
+    assert result[1]['channel_name'] == "bundesliga-matchday-1"
+    assert result[1]['channel_created'] == False
+
+def testChunked():
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(chunked([], 2)) == []
+
 def testUpdateMatchesSingleCompetition(preUpdate):
     with HTTMock(unifiedHttMock):
         comp,season = preUpdate
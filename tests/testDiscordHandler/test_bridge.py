@@ -0,0 +1,156 @@
+import asyncio
+import os
+import tempfile
+import pytest
+
+from discord_handler.bridge import Bridge
+from discord_handler.liveMatch import EventTracker, LiveMatch, MatchState
+from discord_handler.templates import TemplateSheet
+from database.models import MatchEvents
+from tests.testAPI.test_calls import loadJsonFile, path
+
+
+@pytest.fixture
+def bridgePath():
+    bridgePath = tempfile.mktemp(suffix=".sock")
+    yield bridgePath
+    if os.path.exists(bridgePath):
+        os.remove(bridgePath)
+
+
+@pytest.mark.asyncio
+async def testBridgeForwarding(event_loop, bridgePath):
+    received = []
+    done = asyncio.Event()
+
+    async def createChannel(competition, channelName):
+        await asyncio.sleep(0.05)
+        received.append(("createChannel", channelName))
+
+    discord = Bridge()
+    discord.on("createChannel", createChannel)
+    discord.on("post", lambda competition, channelName, embeds: received.append(("post", embeds)))
+    discord.on("done", done.set)
+    await discord.serve(bridgePath)
+
+    poller = Bridge()
+    await poller.connect(bridgePath)
+    assert poller.isPoller() and discord.isDiscord()
+    poller.send("createChannel", competition="Serie A", channelName="serie-a-matchday-1")
+    poller.send("post", competition="Serie A", channelName="serie-a-matchday-1", embeds=[[{"title": "Goal"}, 0]])
+    poller.send("unknown")
+    poller.send("done")
+    await poller.drain()
+    await asyncio.wait_for(done.wait(), 1)
+
+    # messages are handled in order, the channel exists before the events are posted
+    assert received == [("createChannel", "serie-a-matchday-1"), ("post", [[{"title": "Goal"}, 0]])]
+    assert discord.statistics()['received'] == 4
+    assert poller.statistics() == {'role': 'poller', 'connected': True, 'sent': 4, 'received': 0, 'errors': 0}
+
+    # and the other way round
+    answered = asyncio.Event()
+    poller.on("removeCompetition", lambda competition: answered.set())
+    receiving = asyncio.ensure_future(poller.receive())
+    discord.send("removeCompetition", competition="Serie A")
+    await asyncio.wait_for(answered.wait(), 1)
+
+    discord.close()
+    await asyncio.wait_for(receiving, 1)
+    assert not poller.statistics()['connected']
+    poller.close()
+
+
+@pytest.mark.asyncio
+async def testBridgeRequest(event_loop, bridgePath):
+    discord = Bridge()
+    await discord.serve(bridgePath)
+    poller = Bridge()
+    poller.on("query", lambda query, **fields: {'query': query, 'fields': fields})
+    poller.on("failing", lambda: 1 / 0)
+    await poller.connect(bridgePath)
+    receiving = asyncio.ensure_future(poller.receive())
+    # the connection is accepted by the discord process in the meantime
+    while discord.writer is None:
+        await asyncio.sleep(0.01)
+
+    assert await discord.request("query", query="scores", channelName="serie-a-matchday-1") == \
+        {'query': "scores", 'fields': {'channelName': "serie-a-matchday-1"}}
+    with pytest.raises(RuntimeError):
+        await discord.request("failing")
+    with pytest.raises(RuntimeError):
+        await discord.request("unknown")
+    assert discord.pending == {}
+
+    discord.close()
+    await asyncio.wait_for(receiving, 1)
+    poller.close()
+    with pytest.raises(ConnectionError):
+        await discord.request("query", query="scores")
+
+
+@pytest.mark.asyncio
+async def testBridgeMalformedMessages(event_loop, bridgePath, monkeypatch):
+    monkeypatch.setattr(Bridge, "lineLimit", 1024)
+    received = []
+    done = asyncio.Event()
+    discord = Bridge()
+    discord.on("post", lambda embeds: received.append(embeds))
+    discord.on("done", done.set)
+    await discord.serve(bridgePath)
+    poller = Bridge()
+    await poller.connect(bridgePath)
+
+    # broken lines are skipped, the bridge keeps handling the following messages
+    poller.writer.write(b"{not json\n")
+    poller.writer.write(b"[1, 2]\n")
+    poller.send("post", embeds=["x" * 2048])
+    poller.send("post", embeds=["goal"])
+    poller.send("done")
+    await poller.drain()
+    await asyncio.wait_for(done.wait(), 1)
+
+    assert received == [["goal"]]
+    assert discord.statistics()['errors'] >= 3
+    assert discord.statistics()['connected']
+    poller.close()
+    discord.close()
+
+
+def testBridgeNotConnected():
+    bridge = Bridge()
+    bridge.send("post", embeds=[])
+    assert bridge.role is None
+    assert bridge.statistics()['sent'] == 0
+
+
+@pytest.mark.asyncio
+async def testBridgeEmojis(event_loop, bridgePath):
+    emojis = TemplateSheet.emojis
+    discord = Bridge()
+    await discord.serve(bridgePath, onConnect=lambda: discord.send("emojis", emojis={"GoalScored": "<:gs:1>"}))
+
+    poller = Bridge()
+    updated = asyncio.Event()
+
+    def updateEmojis(emojis):
+        TemplateSheet.updateEmojis(emojis)
+        updated.set()
+
+    poller.on("emojis", updateEmojis)
+    await poller.connect(bridgePath)
+    receiving = asyncio.ensure_future(poller.receive())
+    try:
+        TemplateSheet.updateEmojis({})
+        await asyncio.wait_for(updated.wait(), 1)
+
+        # the poller process renders the events with the emojis of the discord process
+        data = loadJsonFile(path + "live.json")["match"]
+        goal = [i for i in EventTracker().update(data["events"]) if i.event == MatchEvents.goal][0]
+        title, content, goalListing = LiveMatch.beautifyEvent(goal, MatchState.fromLiveData(data))
+        assert content.startswith("<:gs:1>")
+    finally:
+        TemplateSheet.updateEmojis(emojis)
+        discord.close()
+        await asyncio.wait_for(receiving, 1)
+        poller.close()
@@ -0,0 +1,99 @@
+import pytest
+
+import discord_handler.cdo_meta
+from discord_handler.cdos import *
+from discord_handler.cdo_meta import CommandoIndex, UserLevels, getUserLevel, loadCommandoCaches
+from database.models import DiscordUsers
+
+
+class FakeAuthor:
+    def __init__(self, id: str, bot: bool = False):
+        self.id = id
+        self.name = f"user{id}"
+        self.bot = bot
+
+
+class FakeMessage:
+    def __init__(self, content: str, author: FakeAuthor = None):
+        self.content = content
+        self.author = author if author is not None else FakeAuthor("1")
+        self.channel = None
+
+
+@pytest.fixture
+def levels():
+    UserLevels.levels = None
+    yield
+    UserLevels.levels = None
+
+
+@pytest.fixture
+def prefix():
+    previous = CommandoIndex.prefix
+    CommandoIndex.prefix = "!"
+    yield
+    CommandoIndex.prefix = previous
+
+
+def testCommandoIndexLookup():
+    assert CommandoIndex.lookup("scores").commando == "scores"
+    assert CommandoIndex.lookup("scoreboard").commando == "scoreboard"
+    # a commando doesn't match longer tokens anymore
+    assert CommandoIndex.lookup("scoresXYZ") is None
+    # aliases have to be registered and match completely
+    assert CommandoIndex.lookup("monitored").commando == "monitoredCompetitions"
+    assert CommandoIndex.lookup("Upcoming").commando == "upcomingGames"
+    assert CommandoIndex.lookup("monitor") is None
+    assert CommandoIndex.lookup("monitoredX") is None
+    # abbreviations don't run commandos
+    assert CommandoIndex.lookup("sco") is None
+    assert CommandoIndex.lookup("setP") is None
+    assert CommandoIndex.lookup("Scores") is None
+
+
+def testCommandoIndexResolve():
+    assert CommandoIndex.resolve("!scores Bundesliga", "!").commando == "scores"
+    assert CommandoIndex.resolve("$scores Bundesliga", "$").commando == "scores"
+    assert CommandoIndex.resolve("!scores", "$") is None
+    assert CommandoIndex.resolve("!", "!") is None
+    assert CommandoIndex.resolve("hello !scores", "!") is None
+
+
+@pytest.mark.asyncio
+async def testCmdHandlerWithoutDatabase(prefix, monkeypatch):
+    async def noDatabase(*args, **kwargs):
+        raise AssertionError("Chat messages must not access the database")
+
+    monkeypatch.setattr(discord_handler.cdo_meta, "runDB", noDatabase)
+    for content in ["hello there", "!scoresXYZ", "!", "!!!", "!unknown commando"]:
+        assert await cmdHandler(FakeMessage(content)) is None
+    # bots are ignored before the user level is read
+    assert await cmdHandler(FakeMessage("!scores", FakeAuthor("2", bot=True))) is None
+
+
+@pytest.mark.django_db
+def testUserLevels(levels, prefix, monkeypatch):
+    monkeypatch.setattr(discord_handler.cdo_meta, "masterUserID", "100")
+    DiscordUsers(id=1, name="user1", userLevel=3).save()
+    assert UserLevels.get(FakeAuthor("1")) is None
+    loadCommandoCaches()
+    assert CommandoIndex.prefix == "!"
+    assert UserLevels.get(FakeAuthor("1")) == 3
+    assert UserLevels.get(FakeAuthor("2")) == 0
+    UserLevels.save(FakeAuthor("2"), 5)
+    assert UserLevels.get(FakeAuthor("2")) == 5
+    assert DiscordUsers.objects.get(id=2).userLevel == 5
+
+    # the master user is added on its first commando, afterwards it is read from memory as well
+    assert UserLevels.get(FakeAuthor("100")) is None
+    assert getUserLevel(FakeAuthor("100")) == 6
+    assert UserLevels.get(FakeAuthor("100")) == 6
+    assert DiscordUsers.objects.get(id=100).userLevel == 6
+
+
+@pytest.mark.django_db
+def testSavePrefix(prefix):
+    CommandoIndex.savePrefix("$")
+    assert CommandoIndex.prefix == "$"
+    assert CommandoIndex.loadPrefix() == "$"
+    assert CommandoIndex.resolve("$scores", CommandoIndex.prefix).commando == "scores"
@@ -0,0 +1,78 @@
+import pytest
+
+from discord_handler.channelRegistry import ChannelRegistry
+
+
+class FakeServer:
+    def __init__(self, id):
+        self.id = id
+        self.channels = []
+
+
+class FakeChannel:
+    def __init__(self, id, name, server, is_private=False):
+        self.id = id
+        self.name = name
+        self.server = server
+        self.is_private = is_private
+        if server is not None:
+            server.channels.append(self)
+
+
+@pytest.fixture
+def registry():
+    first = FakeServer("1")
+    second = FakeServer("2")
+    FakeChannel("a", "general", first)
+    FakeChannel("b", "bundesliga-matchday-1", first)
+    FakeChannel("c", "bundesliga-matchday-1", second)
+    ChannelRegistry.rebuild([first, second])
+    yield first, second
+    ChannelRegistry.rebuild([])
+
+
+def testChannelRegistryLookup(registry):
+    first, second = registry
+    assert ChannelRegistry.get(first, "general").id == "a"
+    assert ChannelRegistry.get(second, "general") is None
+    assert ChannelRegistry.get(first, "Bundesliga Matchday 1").id == "b"
+    assert sorted(i.id for i in ChannelRegistry.getByName("bundesliga-matchday-1")) == ["b", "c"]
+    assert ChannelRegistry.getByName("unknown") == []
+    assert len(ChannelRegistry.allChannels()) == 3
+
+
+def testChannelRegistryEvents(registry):
+    first, second = registry
+    channel = FakeChannel("d", "bundesliga-matchday-2", first)
+    ChannelRegistry.add(channel)
+    assert ChannelRegistry.get(first, "bundesliga-matchday-2") is channel
+
+    renamed = FakeChannel("d", "bundesliga-matchday-3", first)
+    ChannelRegistry.update(channel, renamed)
+    assert ChannelRegistry.get(first, "bundesliga-matchday-2") is None
+    assert ChannelRegistry.get(first, "bundesliga-matchday-3") is renamed
+
+    ChannelRegistry.remove(renamed)
+    assert ChannelRegistry.get(first, "bundesliga-matchday-3") is None
+    assert "bundesliga-matchday-3" not in ChannelRegistry.byName.keys()
+
+    # a stale delete event doesn't remove a recreated channel with the same name
+    recreated = FakeChannel("e", "general", first)
+    ChannelRegistry.add(recreated)
+    ChannelRegistry.remove(FakeChannel("a", "general", first))
+    assert ChannelRegistry.get(first, "general") is recreated
+
+    # private channels are ignored
+    ChannelRegistry.add(FakeChannel("f", "private", None, is_private=True))
+    assert ChannelRegistry.getByName("private") == []
+
+
+def testChannelRegistryServers(registry):
+    first, second = registry
+    ChannelRegistry.removeServer(second)
+    assert [i.id for i in ChannelRegistry.getByName("bundesliga-matchday-1")] == ["b"]
+
+    third = FakeServer("3")
+    FakeChannel("g", "general", third)
+    ChannelRegistry.addServer(third)
+    assert ChannelRegistry.get(third, "general").id == "g"
@@ -0,0 +1,105 @@
+import pytest
+from datetime import datetime, timedelta
+from pytz import UTC
+
+from discord_handler.coordinator import Coordinator, LocalLeaseStore, DatabaseLeaseStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2018, 8, 18, 15, tzinfo=UTC)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def nodes():
+    store = LocalLeaseStore()
+    clock = Clock()
+    first = Coordinator(store, "first", leaseTime=30, renewInterval=10, clock=clock)
+    second = Coordinator(store, "second", leaseTime=30, renewInterval=10, clock=clock)
+    return first, second, clock
+
+
+def names(acquired):
+    return [competition for competition, previousOwner in acquired]
+
+
+def testCoordinatorBalancing(nodes):
+    first, second, clock = nodes
+    competitions = ["A", "B", "C", "D"]
+    acquired, lost = first.cycle(competitions)
+    assert names(acquired) == competitions
+    assert first.duties == {Coordinator.maintenanceDuty, Coordinator.commandsDuty}
+
+    acquired, lost = second.cycle(competitions)
+    assert acquired == [] and lost == []
+    assert not second.ownsDuty(Coordinator.commandsDuty)
+    assert not second.ownsCompetition("A")
+
+    # the first node gives up one idle competition per cycle until both nodes have their share
+    for i in range(3):
+        clock.advance(10)
+        first.cycle(competitions, busy={"A"})
+        second.cycle(competitions)
+    assert first.competitions == {"A", "D"}
+    assert second.competitions == {"B", "C"}
+    assert first.duties == {Coordinator.maintenanceDuty, Coordinator.commandsDuty}
+
+    # competitions that aren't watched anymore are released
+    acquired, lost = first.cycle(["A", "B", "C"])
+    assert lost == ["D"]
+
+
+def testCoordinatorFailover(nodes):
+    first, second, clock = nodes
+    competitions = ["A", "B"]
+    first.cycle(competitions)
+    second.cycle(competitions)
+
+    # the first node stops renewing, the second node takes everything over once the leases expire
+    clock.advance(20)
+    assert second.cycle(competitions) == ([], [])
+    clock.advance(15)
+    acquired, lost = second.cycle(competitions)
+    assert acquired == [("A", "first"), ("B", "first")]
+    assert second.duties == {Coordinator.maintenanceDuty, Coordinator.commandsDuty}
+    assert second.statistics()['takeovers'] == 2
+
+    # the first node comes back and notices it lost everything
+    assert first.expired()
+    acquired, lost = first.cycle(competitions)
+    assert acquired == [] and lost == ["A", "B"]
+    assert first.duties == set()
+    assert first.dropAll() == []
+
+
+def testCoordinatorDisabled():
+    coordinator = Coordinator()
+    assert not coordinator.enabled
+    assert coordinator.ownsDuty(Coordinator.commandsDuty)
+    assert coordinator.ownsCompetition("A")
+
+
+@pytest.mark.django_db
+def testDatabaseLeaseStore():
+    store = DatabaseLeaseStore()
+    now = datetime(2018, 8, 18, 15, tzinfo=UTC)
+    later = now + timedelta(seconds=30)
+    assert store.acquire("competition:A", "first", later, now) == (True, None)
+    assert store.acquire("competition:A", "second", later, now) == (False, None)
+    assert store.acquire("competition:A", "first", later + timedelta(seconds=10), now) == (True, None)
+    assert store.holders("competition:", now) == {"competition:A": "first"}
+
+    # expired leases are taken over
+    expired = later + timedelta(seconds=20)
+    assert store.holders("competition:", expired) == {}
+    assert store.acquire("competition:A", "second", expired + timedelta(seconds=30), expired) == (True, "first")
+    store.release("competition:A", "first")
+    assert store.holders("competition:", expired) == {"competition:A": "second"}
+    store.release("competition:A", "second")
+    assert store.holders("competition:", expired) == {}
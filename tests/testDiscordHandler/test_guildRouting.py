@@ -0,0 +1,59 @@
+import pytest
+
+from tests.testDatabase.test_handler import preUpdate
+
+from database.models import CompetitionWatcher, DiscordServer
+from discord_handler.channelRegistry import ChannelRegistry
+from discord_handler.guildRouting import GuildRouting
+from tests.testDiscordHandler.test_channelRegistry import FakeServer, FakeChannel
+
+
+@pytest.fixture
+def routing():
+    first = FakeServer("1")
+    second = FakeServer("2")
+    third = FakeServer("3")
+    FakeChannel("a", "serie-a-matchday-1", first)
+    FakeChannel("b", "serie-a-matchday-1", second)
+    FakeChannel("c", "serie-a-matchday-1", third)
+    ChannelRegistry.rebuild([first, second, third])
+    GuildRouting.servers = {}
+    GuildRouting.add("Serie A", "1")
+    GuildRouting.add("Serie A", "2")
+    GuildRouting.add("Bundesliga", "3")
+    yield
+    GuildRouting.servers = {}
+    ChannelRegistry.rebuild([])
+
+
+def testGuildRoutingChannels(routing):
+    # channels with the same name on servers that don't watch the competition are ignored
+    assert sorted(i.id for i in GuildRouting.channels("Serie A", "Serie A Matchday 1")) == ["a", "b"]
+    assert GuildRouting.channels("Bundesliga", "serie-a-matchday-1")[0].id == "c"
+    assert GuildRouting.channels("Unknown", "serie-a-matchday-1") == []
+    assert GuildRouting.statistics() == {'competitions': 2, 'servers': 3, 'routes': 3}
+
+
+def testGuildRoutingRemove(routing):
+    assert GuildRouting.remove("Serie A", "1")
+    assert [i.id for i in GuildRouting.channels("Serie A", "serie-a-matchday-1")] == ["b"]
+    assert not GuildRouting.remove("Serie A", "2")
+    assert "Serie A" not in GuildRouting.servers.keys()
+    assert not GuildRouting.remove("Unknown", "2")
+
+
+@pytest.mark.django_db
+def testGuildRoutingLoad(preUpdate):
+    comp,season = preUpdate
+    legacy = DiscordServer(name="legacy")
+    legacy.save()
+    known = DiscordServer(name="renamed", discord_id="2")
+    known.save()
+    for server in [legacy, known, DiscordServer.objects.create(name="left")]:
+        CompetitionWatcher(competition=comp, current_season=season, applicable_server=server).save()
+
+    GuildRouting.load({"legacy": "1", "other": "3"})
+    assert GuildRouting.serverIDs(comp.clear_name) == {"1", "2"}
+    # servers stored by name get their id
+    assert DiscordServer.objects.get(name="legacy").discord_id == "1"
+    GuildRouting.servers = {}
@@ -4,5 +4,183 @@ from httmock import HTTMock
 from tests.testDatabase.test_handler import preUpdate
 from tests.testAPI.test_calls import unifiedHttMock
 
+from discord_handler import handler
 from discord_handler.handler import *
+from discord_handler.jobScheduler import JobScheduler
+from discord_handler.bridge import bridge, BridgeRole
+from database.handler import compDict, windowMatches, Match, getAndSaveData, getAllMatches
+from database.models import DiscordServer
+from tests.testDatabase.test_handler import teamEchoHttMock
 
+
+@pytest.fixture
+def scheduledCompetition(preUpdate):
+    comp,season = preUpdate
+    with HTTMock(teamEchoHttMock):
+        # loads the teams of the matches
+        getAndSaveData(getAllMatches, bulk=True, idCompetitions=comp.id, idSeason=season.id)
+    watcher = CompetitionWatcher(competition=comp, current_season=season, applicable_server=DiscordServer(name="temp"))
+    Scheduler.matchDayObject = {comp.clear_name: compDict(watcher)}
+    yield comp,season
+    Scheduler.matchDayObject = {}
+
+
+def matchDayOf(competition, matchId):
+    for md, data in Scheduler.matchDayObject[competition].items():
+        for key in ['passedMatches', 'currentMatches', 'upcomingMatches']:
+            for liveMatch in data[key]:
+                if liveMatch.match.id == matchId:
+                    return md, liveMatch
+
+
+@pytest.mark.django_db
+def testApplyChangeSet(scheduledCompetition):
+    comp,season = scheduledCompetition
+    matchDays = Scheduler.matchDayObject[comp.clear_name]
+    oldEnd = matchDays[2]['end']
+
+    moved = Match.objects.filter(matchday=1, season=season).order_by('date').first()
+    moved.matchday = 2
+    moved.date = moved.date + timedelta(days=200)
+    newFixture = Match(id=1, competition=comp, season=season, matchday=2, stage=0,
+                       date=moved.date - timedelta(days=1))
+    # matchdays that aren't loaded are left to the window
+    unloadedFixture = Match(id=2, competition=comp, season=season, matchday=35, stage=0,
+                            date=datetime(2019, 6, 1, tzinfo=UTC))
+
+    changeSet = MatchChangeSet()
+    changeSet.updated.append(moved)
+    changeSet.rescheduled.append(moved)
+    changeSet.newFixtures += [newFixture, unloadedFixture]
+    Scheduler.applyChangeSet(comp.clear_name, changeSet)
+
+    md, liveMatch = matchDayOf(comp.clear_name, moved.id)
+    assert md == 2
+    assert liveMatch.match.date == moved.date
+    assert matchDays[2]['end'] == moved.date + timedelta(hours=3)
+    assert matchDays[2]['end'] > oldEnd
+
+    md, liveMatch = matchDayOf(comp.clear_name, 1)
+    assert md == 2
+    assert liveMatch.match.date == newFixture.date
+    assert matchDayOf(comp.clear_name, 2) is None
+    assert 35 not in matchDays.keys()
+
+
+@pytest.mark.django_db
+def testApplyEmptyChangeSet(scheduledCompetition):
+    comp,season = scheduledCompetition
+    before = {md: dict(data) for md, data in Scheduler.matchDayObject[comp.clear_name].items()}
+    Scheduler.applyChangeSet(comp.clear_name, MatchChangeSet())
+    Scheduler.applyChangeSet("Unknown competition", MatchChangeSet())
+    assert {md: dict(data) for md, data in Scheduler.matchDayObject[comp.clear_name].items()} == before
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    jobs = JobScheduler()
+    monkeypatch.setattr(handler, "jobScheduler", jobs)
+    return jobs
+
+
+def asUpcoming(competition):
+    # the fixtures are in the past, the scheduler is tested as if they were still to come
+    for data in Scheduler.matchDayObject[competition].values():
+        data['upcomingMatches'] += data['passedMatches'] + data['currentMatches']
+        data['passedMatches'] = []
+        data['currentMatches'] = []
+
+
+@pytest.mark.django_db
+def testScheduleMatchDays(scheduledCompetition, jobs):
+    comp,season = scheduledCompetition
+    matchDays = Scheduler.matchDayObject[comp.clear_name]
+    asUpcoming(comp.clear_name)
+    jobs.clock = lambda: matchDays[2]['start'] - timedelta(days=1)
+    Scheduler.scheduleCompetition(comp.clear_name)
+
+    # ended matchdays without channel have no jobs
+    assert jobs.due(("createChannel", comp.clear_name, 1)) is None
+    assert jobs.due(("deleteChannel", comp.clear_name, 1)) is None
+    assert jobs.due(("createChannel", comp.clear_name, 2)) == matchDays[2]['start']
+    assert jobs.due(("deleteChannel", comp.clear_name, 2)) == matchDays[2]['end']
+
+    liveMatch = matchDays[2]['upcomingMatches'][-1]
+    assert jobs.due(("startMatch", liveMatch.match.id)) == liveMatch.match.date - timedelta(hours=1)
+
+    # a rescheduled match only touches the jobs of its matchday
+    sequences = dict((key, job[1]) for key, job in jobs.jobs.items())
+    moved = Match.objects.get(id=liveMatch.match.id)
+    # the matchday is sorted by the real time again, so the new date is in the future
+    moved.date = datetime.utcnow().replace(tzinfo=UTC, microsecond=0) + timedelta(days=30)
+    changeSet = MatchChangeSet()
+    changeSet.updated.append(moved)
+    changeSet.rescheduled.append(moved)
+    Scheduler.applyChangeSet(comp.clear_name, changeSet)
+
+    assert jobs.due(("startMatch", liveMatch.match.id)) == moved.date - timedelta(hours=1)
+    assert jobs.due(("deleteChannel", comp.clear_name, 2)) == moved.date + timedelta(hours=3)
+    changed = [key for key, job in jobs.jobs.items() if sequences.get(key) != job[1]]
+    assert changed != []
+    assert all(key[0] == "startMatch" or key[2] == 2 for key in changed)
+    assert all(Match.objects.get(id=key[1]).matchday == 2 for key in changed if key[0] == "startMatch")
+
+
+@pytest.mark.django_db
+def testScheduleEndedMatchDaysInPoller(scheduledCompetition, jobs, monkeypatch):
+    comp,season = scheduledCompetition
+    matchDays = Scheduler.matchDayObject[comp.clear_name]
+    jobs.clock = lambda: matchDays[2]['end'] + timedelta(days=1)
+    # channels created before a restart of the poller process are still deleted by the discord process
+    monkeypatch.setattr(bridge, "role", BridgeRole.poller)
+    Scheduler.scheduleCompetition(comp.clear_name)
+    assert jobs.due(("createChannel", comp.clear_name, 2)) is None
+    assert jobs.due(("deleteChannel", comp.clear_name, 2)) == matchDays[2]['end']
+
+
+@pytest.mark.django_db
+def testSlidingWindow(scheduledCompetition, jobs):
+    comp,season = scheduledCompetition
+    watcher = CompetitionWatcher(competition=comp, current_season=season)
+    full = Scheduler.matchDayObject[comp.clear_name]
+    last = max(full.keys())
+    jobs.clock = lambda: full[2]['start']
+    Scheduler.matchDayObject = {comp.clear_name: compDict(watcher, Scheduler.window())}
+    matchDays = Scheduler.matchDayObject[comp.clear_name]
+    assert 2 in matchDays.keys()
+    assert last not in matchDays.keys()
+    assert len(matchDays[2]['passedMatches']) == len(full[2]['passedMatches'])
+
+    # the matchdays entering the window are loaded, the passed ones are evicted
+    jobs.clock = lambda: full[last]['start']
+    Scheduler.loadMatches(comp.clear_name, list(windowMatches(watcher, Scheduler.window())))
+    Scheduler.evictMatchDays(comp.clear_name, Scheduler.window()[0])
+    assert last in matchDays.keys()
+    assert 2 not in matchDays.keys()
+    assert len(matchDays[last]['passedMatches']) == len(full[last]['passedMatches'])
+    assert jobs.due(("deleteChannel", comp.clear_name, 2)) is None
+    assert Scheduler.statistics()['matchDays'] == len(matchDays)
+
+
+@pytest.mark.django_db
+def testStartEndMatchDay(scheduledCompetition, monkeypatch, event_loop):
+    comp,season = scheduledCompetition
+    asUpcoming(comp.clear_name)
+    data = Scheduler.matchDayObject[comp.clear_name][2]
+    joined = []
+    deleted = []
+
+    async def deleteChannel(competition, channelName):
+        deleted.append((competition, channelName))
+
+    monkeypatch.setattr(livePoller, "join", joined.append)
+    monkeypatch.setattr(handler, "asyncDeleteChannel", deleteChannel)
+    liveMatch = data['upcomingMatches'][0]
+    Scheduler.startMatch(comp.clear_name, liveMatch)
+    assert joined == [liveMatch]
+    assert liveMatch in data['currentMatches'] and liveMatch not in data['upcomingMatches']
+
+    liveMatch.passed = True
+    event_loop.run_until_complete(Scheduler.endMatchDay(comp.clear_name, 2))
+    assert liveMatch in data['passedMatches'] and liveMatch not in data['currentMatches']
+    assert deleted == [(comp.clear_name, data['channel_name'])]
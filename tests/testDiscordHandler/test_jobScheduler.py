@@ -0,0 +1,64 @@
+import asyncio
+from datetime import timedelta
+import pytest
+
+from discord_handler.jobScheduler import JobScheduler, utcNow
+
+
+@pytest.mark.asyncio
+async def testJobSchedulerOrder(event_loop):
+    scheduler = JobScheduler()
+    scheduler.start(event_loop)
+    ran = []
+
+    async def job(name):
+        ran.append(name)
+
+    now = utcNow()
+    scheduler.schedule("second", now + timedelta(seconds=0.1), job, "second")
+    scheduler.schedule("first", now + timedelta(seconds=0.05), job, "first")
+    scheduler.schedule("overdue", now - timedelta(days=1), ran.append, "overdue")
+    await asyncio.sleep(0.01)
+    assert ran == ["overdue"]
+    await asyncio.sleep(0.2)
+    assert ran == ["overdue", "first", "second"]
+
+    stats = scheduler.statistics()
+    assert stats['jobs'] == 0
+    assert stats['executed'] == 3
+    assert stats['maxLateness'] >= 86400
+    scheduler.stop()
+
+
+@pytest.mark.asyncio
+async def testJobSchedulerReplaceCancel(event_loop):
+    scheduler = JobScheduler()
+    scheduler.start(event_loop)
+    ran = []
+
+    def failing():
+        raise ValueError("job failed")
+
+    now = utcNow()
+    scheduler.schedule("match", now + timedelta(seconds=0.05), ran.append, "old date")
+    # rescheduled, the first entry becomes stale
+    scheduler.schedule("match", now + timedelta(seconds=0.1), ran.append, "new date")
+    scheduler.schedule("cancelled", now + timedelta(seconds=0.05), ran.append, "cancelled")
+    scheduler.schedule("failing", now, failing)
+    scheduler.cancel("cancelled")
+    assert scheduler.due("match") == now + timedelta(seconds=0.1)
+    assert scheduler.due("cancelled") is None
+
+    await asyncio.sleep(0.2)
+    assert ran == ["new date"]
+    assert scheduler.statistics()['executed'] == 2
+    scheduler.stop()
+
+
+def testJobSchedulerCompaction():
+    scheduler = JobScheduler()
+    now = utcNow()
+    for i in range(1000):
+        scheduler.schedule("match", now + timedelta(seconds=i), print)
+    assert len(scheduler.jobs) == 1
+    assert len(scheduler.heap) <= 2 * len(scheduler.jobs) + 65
@@ -0,0 +1,232 @@
+import asyncio
+import copy
+import pytest
+from datetime import datetime
+
+from discord_handler.liveMatch import EventTracker, EventStatus, LiveMatch, MatchState
+from discord_handler.messageQueue import messageQueue, MessagePriority
+from discord_handler.guildRouting import GuildRouting
+from discord_handler.pollingPolicy import PollingPolicies, PollingPolicy
+from discord_handler.client import client
+from api.calls import liveDataCache
+from database.models import MatchEvents
+from tests.testAPI.test_calls import loadJsonFile, path
+
+
+def liveEvents():
+    return loadJsonFile(path + "live.json")["match"]["events"]
+
+
+def testEventTrackerNewEvents():
+    events = liveEvents()
+    tracker = EventTracker()
+
+    # first poll, only the first half is available
+    firstHalf = [i for i in events if i['phaseDescriptionShort'] == "1H"]
+    result = tracker.update(firstHalf)
+    assert [i.event for i in result] == [MatchEvents.kickoffFirstHalf, MatchEvents.yellowCard,
+                                         MatchEvents.firstHalfEnd]
+    assert all(i.status == EventStatus.new for i in result)
+
+    result = tracker.update(events)
+    assert len(result) == len(events) - len(firstHalf)
+    assert result[-1].event == MatchEvents.secondHalfEnd
+    assert result[-1].id == events[0]['id']
+
+    assert tracker.update(events) == []
+    assert tracker.update(copy.deepcopy(events)) == []
+
+
+def testEventTrackerCorrection():
+    events = liveEvents()
+    tracker = EventTracker()
+    tracker.update(events)
+
+    corrected = copy.deepcopy(events)
+    goal = [i for i in corrected if i['eventCode'] == 3][0]
+    goal['playerName'] = "CORRECTED PLAYER"
+
+    result = tracker.update(corrected)
+    assert len(result) == 1
+    assert result[0].status == EventStatus.corrected
+    assert result[0].id == goal['id']
+    assert result[0].player == "CORRECTED PLAYER"
+    assert tracker.update(corrected) == []
+
+
+def testEventTrackerRetraction():
+    events = liveEvents()
+    tracker = EventTracker()
+    tracker.update(events)
+
+    goal = [i for i in events if i['eventCode'] == 3][0]
+    retracted = [i for i in events if i['id'] != goal['id']]
+
+    result = tracker.update(retracted)
+    assert len(result) == 1
+    assert result[0].status == EventStatus.retracted
+    assert result[0].event == MatchEvents.goal
+    assert result[0].id == goal['id']
+
+    # an empty feed is treated as a glitch and doesn't retract everything
+    assert tracker.update([]) == []
+    assert tracker.update(retracted) == []
+
+    # the goal is given after all
+    result = tracker.update(events)
+    assert len(result) == 1
+    assert result[0].status == EventStatus.new
+
+
+def testEventTrackerWithoutIds():
+    events = liveEvents()
+    for i in events:
+        del i['id']
+    tracker = EventTracker()
+    assert len(tracker.update(events)) == len(events)
+    assert tracker.update(events) == []
+
+
+def testParseEventUnhandled():
+    event = liveEvents()[0]
+    event['eventCode'] = 99
+    assert LiveMatch.parseEvent(event) is None
+
+    tracker = EventTracker()
+    assert tracker.update([event]) == []
+    assert tracker.update([event]) == []
+
+
+def testBeautifyEvent():
+    data = loadJsonFile(path + "live.json")["match"]
+    state = MatchState.fromLiveData(data)
+    events = EventTracker().update(data["events"])
+    goals = [i for i in events if i.event == MatchEvents.goal]
+
+    title, content, goalListing = LiveMatch.beautifyEvent(goals[0], state)
+    assert data["teamHomeName"] in title and data["teamAwayName"] in title
+    assert f"{data['scoreHome']}" in title and f"{data['scoreAway']}" in title
+    assert goals[0].player in content
+    assert goalListing.endswith(goals[0].player)
+
+    title, content, goalListing = LiveMatch.beautifyEvent(events[0], state)
+    assert goalListing == ""
+
+
+@pytest.mark.asyncio
+async def testSendMatchEventWithoutFetch(monkeypatch, event_loop):
+    async def noFetch(matchID, maxAge=None):
+        raise AssertionError("Rendering must not fetch the live document")
+
+    sent = []
+
+    async def sendMessage(channel, content=None, embed=None):
+        sent.append((channel, embed))
+
+    monkeypatch.setattr(liveDataCache, "get", noFetch)
+    monkeypatch.setattr(client, "send_message", sendMessage)
+
+    data = loadJsonFile(path + "live.json")["match"]
+    state = MatchState.fromLiveData(data)
+    goal = [i for i in EventTracker().update(data["events"]) if i.event == MatchEvents.goal][0]
+    match = type("Match", (), {"competition": type("Competition", (), {"clear_name": "Serie A"})})
+
+    messageQueue.start(event_loop)
+    channel = type("Channel", (), {"id": "1"})
+    title, goalString = await LiveMatch.sendMatchEvent(channel, match, goal, state)
+    await messageQueue.drain()
+    messageQueue.stop()
+    assert len(sent) == 1
+    assert sent[0][1].title == title
+    assert goalString != ""
+
+
+@pytest.mark.asyncio
+async def testPostLineups(monkeypatch, event_loop):
+    sent = []
+
+    async def sendMessage(channel, content=None, embed=None):
+        sent.append(embed)
+
+    monkeypatch.setattr(client, "send_message", sendMessage)
+    data = loadJsonFile(path + "live.json")["match"]
+    team = type("Team", (), {"clear_name": "Home"})
+    match = type("Match", (), {"home_team": team, "away_team": type("Team", (), {"clear_name": "Away"})})
+
+    messageQueue.start(event_loop)
+    await LiveMatch.postLineups(type("Channel", (), {"id": "1"}), match, data)
+    await messageQueue.drain()
+    messageQueue.stop()
+    embed = sent[0].to_dict()
+    assert embed["description"] == "**Home** vs **Away**"
+    assert [i["name"] for i in embed["fields"]] == ["**Home**", "**Away**"]
+    home = embed["fields"][0]["value"]
+    assert home.startswith("_Starting lineup:_\n\n\n1 - ÉVERSON  **(GK)** ")
+    assert "**Coach:**\n" in home
+    assert "$" not in home
+
+
+def competitionMatch():
+    competition = type("Competition", (), {"clear_name": "Serie A"})
+    return type("Match", (), {"id": 1, "competition": competition, "matchday": 1, "date": datetime.utcnow()})
+
+
+def testEventEmbedsCoalesced():
+    data = loadJsonFile(path + "live.json")["match"]
+    state = MatchState.fromLiveData(data)
+    events = EventTracker().update(data["events"])
+    rendered = [(i,) + LiveMatch.beautifyEvent(i, state)[:2] for i in events]
+    match = competitionMatch()
+
+    assert len(LiveMatch.eventEmbeds(match, rendered, False)) == len(events)
+
+    embeds = LiveMatch.eventEmbeds(match, rendered, True)
+    assert len(embeds) == (len(events) + LiveMatch.maxEmbedFields - 1) // LiveMatch.maxEmbedFields
+    fields = [field for embObj, _ in embeds for field in embObj.to_dict()["fields"]]
+    assert [i["value"] for i in fields] == [i[2] for i in rendered]
+    assert embeds[0][1] == MessagePriority.critical
+
+    # a single event looks like an uncoalesced one
+    embObj, priority = LiveMatch.eventEmbeds(match, rendered[:1], True)[0]
+    assert embObj.description == rendered[0][2]
+    assert "fields" not in embObj.to_dict()
+
+
+@pytest.mark.asyncio
+async def testPollCoalesceWindow(monkeypatch, event_loop):
+    queued = []
+    data = loadJsonFile(path + "live.json")
+    # the feed lists the newest event first
+    events = list(reversed(data["match"]["events"]))
+    polls = [events[:2], events[:3], events[:4]]
+
+    async def get(matchID, maxAge=None):
+        result = copy.deepcopy(data)
+        result["match"]["events"] = list(reversed(polls.pop(0)))
+        return result
+
+    monkeypatch.setattr(liveDataCache, "get", get)
+    monkeypatch.setattr(messageQueue, "put", lambda channel, embed=None, priority=None: queued.append(embed))
+    monkeypatch.setattr(GuildRouting, "channels", lambda competition, name: ["channel"])
+    policy = PollingPolicy(coalesceWindow=0.05)
+    monkeypatch.setattr(PollingPolicies, "get", lambda competition: policy)
+
+    liveMatch = LiveMatch(competitionMatch())
+    liveMatch.begin()
+    liveMatch.running = True
+    liveMatch.lineupsPosted = True
+
+    await liveMatch.poll()
+    await liveMatch.poll()
+    assert queued == []
+    await asyncio.sleep(0.1)
+    assert len(queued) == 1
+    assert len(queued[0].to_dict()["fields"]) == 3
+
+    # held events are posted when the match ends
+    policy.coalesceWindow = 10
+    await liveMatch.poll()
+    assert len(queued) == 1
+    liveMatch.end()
+    assert len(queued) == 2
+    assert liveMatch.flushHandle is None
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+
+from discord_handler.livePoller import LivePoller
+
+
+class FakeMatch:
+    def __init__(self, id, delays, pollTime=0.0, running=None):
+        self.match = type("Match", (), {"id": id})
+        self.title = f"Match {id}"
+        self.delays = list(delays)
+        self.pollTime = pollTime
+        self.running = running if running is not None else []
+        self.polls = 0
+        self.begun = 0
+        self.ended = 0
+
+    def begin(self):
+        self.begun += 1
+
+    async def poll(self):
+        self.polls += 1
+        self.running.append(self)
+        try:
+            await asyncio.sleep(self.pollTime)
+        finally:
+            self.running.remove(self)
+        delay = self.delays.pop(0)
+        if isinstance(delay, Exception):
+            raise delay
+        return delay
+
+    def end(self):
+        self.ended += 1
+
+
+@pytest.mark.asyncio
+async def testLivePollerPollsUntilDone(event_loop):
+    poller = LivePoller()
+    poller.start(event_loop)
+    match = FakeMatch(1, [0.01, 0.01, None])
+    poller.join(match)
+    await asyncio.sleep(0.2)
+
+    assert match.begun == 1
+    assert match.polls == 3
+    assert match.ended == 1
+    assert poller.matches == {}
+    stats = poller.statistics()
+    assert stats['polls'] == 3
+    assert stats['pollsPerSecond'] > 0
+    poller.stop()
+
+
+@pytest.mark.asyncio
+async def testLivePollerBoundedConcurrency(event_loop):
+    poller = LivePoller(concurrency=2)
+    poller.start(event_loop)
+    running = []
+    peak = []
+
+    class PeakMatch(FakeMatch):
+        async def poll(self):
+            peak.append(len(running) + 1)
+            return await super().poll()
+
+    matches = [PeakMatch(i, [None], pollTime=0.05, running=running) for i in range(6)]
+    for match in matches:
+        poller.join(match)
+    await asyncio.sleep(0.3)
+
+    assert all(match.polls == 1 for match in matches)
+    assert max(peak) == 2
+    # the last two polls waited for two rounds of polls
+    assert poller.statistics()['maxLag'] >= 0.09
+    poller.stop()
+
+
+@pytest.mark.asyncio
+async def testLivePollerJoinLeave(event_loop):
+    poller = LivePoller()
+    poller.start(event_loop)
+    match = FakeMatch(1, [0.02] * 100)
+    other = FakeMatch(2, [0.02] * 100)
+    poller.join(match)
+    poller.join(other, delay=0.05)
+    poller.join(match)
+    await asyncio.sleep(0.03)
+    assert match.polls >= 1
+    assert other.polls == 0
+
+    poller.leave(match)
+    polls = match.polls
+    assert match.ended == 1
+    await asyncio.sleep(0.1)
+    assert match.polls == polls
+    assert other.polls >= 2
+
+    # rejoining while the old entry is still in the heap doesn't poll the match twice
+    poller.join(match)
+    poller.leave(match)
+    poller.join(match)
+    await asyncio.sleep(0.05)
+    assert match.begun == 3
+    assert len([i for i in poller.heap if poller.scheduled.get(i[2]) == i[1]]) == 2
+    poller.stop()
+
+
+@pytest.mark.asyncio
+async def testLivePollerRetriesFailedPolls(event_loop):
+    poller = LivePoller(retryDelay=0.01)
+    poller.start(event_loop)
+    match = FakeMatch(1, [ValueError("broken"), None])
+    poller.join(match)
+    await asyncio.sleep(0.1)
+
+    assert match.polls == 2
+    assert match.ended == 1
+    assert poller.statistics()['errors'] == 1
+    poller.stop()
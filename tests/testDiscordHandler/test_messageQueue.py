@@ -0,0 +1,155 @@
+import asyncio
+import time
+import pytest
+from discord.errors import Forbidden, HTTPException, NotFound
+
+from discord_handler.client import client
+from discord_handler.messageQueue import MessageQueue, MessagePriority
+
+
+class FakeChannel:
+    def __init__(self, id):
+        self.id = id
+        self.name = f"channel-{id}"
+        self.server = None
+
+
+class FakeResponse:
+    status = 500
+    reason = "Internal Server Error"
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    sent = []
+
+    async def sendMessage(channel, content=None, embed=None):
+        sent.append((channel.id, content, time.monotonic()))
+        return content
+
+    monkeypatch.setattr(client, "send_message", sendMessage)
+    return sent
+
+
+@pytest.mark.asyncio
+async def testMessageQueuePriorities(event_loop, sent):
+    queue = MessageQueue()
+    channel = FakeChannel("1")
+    queue.put(channel, "substitution", priority=MessagePriority.low)
+    queue.put(channel, "kickoff", priority=MessagePriority.event)
+    queue.put(channel, "goal", priority=MessagePriority.critical)
+    queue.put(channel, "second goal", priority=MessagePriority.critical)
+    stats = queue.statistics()
+    assert stats['depth'] == 4
+    assert stats['depthByPriority']['critical'] == 2
+
+    queue.start(event_loop)
+    await queue.drain()
+    assert [i[1] for i in sent] == ["goal", "second goal", "kickoff", "substitution"]
+    stats = queue.statistics()
+    assert stats['depth'] == 0
+    assert stats['sent'] == 4
+    assert stats['maxLatency'] >= stats['meanLatency'] > 0
+    queue.stop()
+
+
+@pytest.mark.asyncio
+async def testMessageQueueRateLimits(event_loop, sent):
+    queue = MessageQueue(channelLimit=2, channelPer=0.1)
+    queue.start(event_loop)
+    first = FakeChannel("1")
+    second = FakeChannel("2")
+    for i in range(3):
+        queue.put(first, f"first {i}")
+    queue.put(second, "second")
+    assert await queue.send(second, "response") == "response"
+    await queue.drain()
+
+    firstTimes = [t for channel, _, t in sent if channel == "1"]
+    assert len(firstTimes) == 3
+    # the third message waits for the window of the channel, the other channel isn't held up by it
+    assert firstTimes[2] - firstTimes[0] >= 0.09
+    # command responses are sent ahead of events
+    assert [i[1] for i in sent if i[0] == "2"] == ["response", "second"]
+    assert max(t for channel, _, t in sent if channel == "2") < firstTimes[2]
+    queue.stop()
+
+
+@pytest.mark.asyncio
+async def testMessageQueueRetries(event_loop, monkeypatch):
+    attempts = []
+
+    async def sendMessage(channel, content=None, embed=None):
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise HTTPException(FakeResponse(), "failed")
+        return content
+
+    monkeypatch.setattr(client, "send_message", sendMessage)
+    queue = MessageQueue(baseBackoff=0.02, jitter=lambda: 0.0)
+    queue.start(event_loop)
+
+    assert await queue.send(FakeChannel("1"), "goal") == "goal"
+    assert len(attempts) == 3
+    # half of 0.02 and 0.04 without jitter
+    assert attempts[1] - attempts[0] >= 0.009
+    assert attempts[2] - attempts[1] >= 0.019
+    assert queue.statistics()['retries'] == 2
+    assert MessageQueue(jitter=lambda: 0.0).backoff(10) == 30
+    queue.stop()
+
+
+@pytest.mark.asyncio
+async def testMessageQueueDrops(event_loop, monkeypatch):
+    async def sendMessage(channel, content=None, embed=None):
+        if channel.id == "1":
+            raise Forbidden(FakeResponse(), "missing permissions")
+        raise HTTPException(FakeResponse(), "failed")
+
+    monkeypatch.setattr(client, "send_message", sendMessage)
+    queue = MessageQueue(maxAttempts=2, baseBackoff=0.01)
+    queue.start(event_loop)
+
+    with pytest.raises(Forbidden):
+        await queue.send(FakeChannel("1"), "response")
+    queue.put(FakeChannel("2"), "goal")
+    await queue.drain()
+
+    stats = queue.statistics()
+    assert stats['dropped'] == 2
+    assert stats['retries'] == 1
+    assert stats['sent'] == 0
+    queue.stop()
+
+
+@pytest.mark.asyncio
+async def testMessageQueueEdits(event_loop, sent, monkeypatch):
+    async def editMessage(message, embed=None):
+        if message.id == "deleted":
+            raise NotFound(FakeResponse(), "Unknown Message")
+        sent.append((message.channel.id, "edit", time.monotonic()))
+        return message
+
+    async def pinMessage(message):
+        sent.append((message.channel.id, "pin", time.monotonic()))
+
+    monkeypatch.setattr(client, "edit_message", editMessage)
+    monkeypatch.setattr(client, "pin_message", pinMessage)
+    channel = FakeChannel("1")
+    message = type("Message", (), {"id": "1", "channel": channel})
+    queue = MessageQueue(channelLimit=5, channelPer=1)
+    # edits and pins share the queue and the rate limit of their channel, events are sent first
+    edit = asyncio.ensure_future(queue.edit(message, None))
+    pin = asyncio.ensure_future(queue.pin(message))
+    await asyncio.sleep(0)
+    queue.put(channel, "goal", priority=MessagePriority.critical)
+    queue.start(event_loop)
+    assert await edit is message
+    await pin
+    assert [i[1] for i in sent] == ["goal", "edit", "pin"]
+
+    # deleted messages are not retried
+    with pytest.raises(NotFound):
+        await queue.edit(type("Message", (), {"id": "deleted", "channel": channel}), None)
+    assert queue.statistics()['retries'] == 0
+    queue.stop()
@@ -0,0 +1,129 @@
+import copy
+import pytest
+from datetime import datetime, timedelta
+from pytz import UTC
+
+from discord_handler.pollingPolicy import PollingPolicy, PollingPolicies, PollingState, MatchPhase, matchPhase
+from tests.testAPI.test_calls import loadJsonFile, path
+
+kickoff = datetime(2018, 8, 8, 22, 30, tzinfo=UTC)
+
+
+def liveDocument(**kwargs):
+    data = loadJsonFile(path + "live.json")["match"]
+    data.update(kwargs)
+    return data
+
+
+@pytest.fixture
+def statistics():
+    calls, fixedCalls = PollingPolicies.calls, PollingPolicies.fixedCalls
+    PollingPolicies.calls, PollingPolicies.fixedCalls = 0, 0.0
+    yield
+    PollingPolicies.calls, PollingPolicies.fixedCalls = calls, fixedCalls
+
+
+def testMatchPhase():
+    assert matchPhase(liveDocument()) == MatchPhase.finished
+    assert matchPhase(liveDocument(isFinished=False, isLive=True)) == MatchPhase.live
+    assert matchPhase(liveDocument(isFinished=False, isLive=False, isStarted=False, events=[])) == \
+        MatchPhase.preMatch
+
+    data = liveDocument(isFinished=False, isLive=True)
+    firstHalf = [i for i in data['events'] if i['phaseDescriptionShort'] == "1H"]
+    assert firstHalf[0]['eventCode'] == 14
+    data['events'] = firstHalf
+    assert matchPhase(data) == MatchPhase.halfTime
+    data['events'] = firstHalf[1:]
+    assert matchPhase(data) == MatchPhase.live
+
+
+def testPollingPolicyPreMatch(statistics):
+    policy = PollingPolicy()
+    data = liveDocument(isFinished=False, isLive=False, isStarted=False, hasLineup=False, events=[])
+
+    assert policy.nextInterval(data, kickoff, PollingState(), kickoff - timedelta(hours=3)) == 600
+    # wakes up when the time shortly before kickoff starts
+    assert policy.nextInterval(data, kickoff, PollingState(), kickoff - timedelta(minutes=20)) == 300
+    assert policy.nextInterval(data, kickoff, PollingState(), kickoff - timedelta(minutes=10)) == 60
+    assert policy.nextInterval(data, kickoff, PollingState(), kickoff + timedelta(minutes=1)) == 20
+
+
+def testPollingPolicyDelayedKickoff(statistics):
+    policy = PollingPolicy(kickoffPolls=3)
+    state = PollingState()
+    data = liveDocument(isFinished=False, isLive=False, isStarted=False, hasLineup=False, events=[])
+
+    # a match that doesn't go live after its kickoff is polled at the pre match interval again
+    assert [policy.nextInterval(data, kickoff, state, kickoff + timedelta(minutes=i)) for i in range(5)] == \
+        [20, 20, 20, 600, 600]
+
+
+def testPollingPolicyLive(statistics):
+    policy = PollingPolicy(idlePolls=3)
+    state = PollingState()
+    data = liveDocument(isFinished=False, isLive=True)
+
+    assert [policy.nextInterval(data, kickoff, state) for i in range(5)] == [20, 20, 20, 30, 30]
+    assert state.phase == MatchPhase.live
+
+    changed = copy.deepcopy(data)
+    changed['events'] = changed['events'][1:]
+    assert policy.nextInterval(changed, kickoff, state) == 20
+
+    halfTime = copy.deepcopy(data)
+    halfTime['events'] = [i for i in halfTime['events'] if i['phaseDescriptionShort'] == "1H"]
+    assert policy.nextInterval(halfTime, kickoff, state) == 60
+
+
+def testPollingPolicyFinished(statistics):
+    policy = PollingPolicy(finishedInterval=60, finishedPolls=2)
+    state = PollingState()
+    data = liveDocument()
+
+    assert [policy.nextInterval(data, kickoff, state) for i in range(3)] == [60, 60, None]
+    # the fixed schedule polled 10 more times after full time
+    assert PollingPolicies.statistics() == {'calls': 3, 'fixedCalls': 10, 'saved': 7}
+
+
+def testPollingPolicySavedCalls(statistics):
+    policy = PollingPolicy()
+    state = PollingState()
+    data = liveDocument(isFinished=False, isLive=False, isStarted=True, hasLineup=True)
+    data['events'] = [i for i in data['events'] if i['phaseDescriptionShort'] == "1H"]
+
+    # half time: one call every 60 seconds instead of every 20
+    for i in range(15):
+        policy.nextInterval(data, kickoff, state)
+    assert PollingPolicies.statistics() == {'calls': 15, 'fixedCalls': 45, 'saved': 30}
+
+
+@pytest.mark.django_db
+def testPollingPolicies():
+    try:
+        policy = PollingPolicies.save("Bundesliga", {'liveInterval': 15})
+        assert policy.liveInterval == 15
+        assert policy.halfTimeInterval == PollingPolicies.default.halfTimeInterval
+
+        PollingPolicies.policies = {}
+        PollingPolicies.load()
+        assert PollingPolicies.get("Bundesliga").liveInterval == 15
+        assert PollingPolicies.get("Premier League") is PollingPolicies.default
+
+        assert PollingPolicies.save("Bundesliga", None) is PollingPolicies.default
+        PollingPolicies.load()
+        assert PollingPolicies.policies == {}
+    finally:
+        PollingPolicies.policies = {}
+
+
+def testPollingPolicyCheckParameter():
+    assert PollingPolicy.checkParameter("liveInterval", 5) is None
+    assert PollingPolicy.checkParameter("nearKickoff", 0) is None
+    for key, value in [("liveInterval", 0), ("liveInterval", -5), ("liveInterval", float("nan")),
+                       ("liveInterval", float("inf")), ("nearKickoff", -1), ("unknown", 5)]:
+        assert PollingPolicy.checkParameter(key, value) is not None
+
+    policy = PollingPolicies.fromJson('{"liveInterval": 0, "halfTimeInterval": 30}')
+    assert policy.liveInterval == PollingPolicies.default.liveInterval
+    assert policy.halfTimeInterval == 30
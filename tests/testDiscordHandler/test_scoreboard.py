@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from discord.errors import NotFound
+
+from discord_handler.guildRouting import GuildRouting
+from discord_handler.messageQueue import messageQueue
+from discord_handler.pollingPolicy import MatchPhase, PollingState
+from discord_handler.scoreboard import Scoreboards
+
+
+class FakeLiveMatch:
+    def __init__(self, id, title):
+        self.match = type("Match", (), {"id": id})
+        self.title = title
+        self.goalList = []
+        self.pollingState = PollingState()
+        self.competition = "Serie A"
+        self.channelName = "serie-a-matchday-1"
+
+
+class FakeResponse:
+    status = 404
+    reason = "Not Found"
+
+
+@pytest.fixture
+def discord(monkeypatch):
+    calls = []
+
+    async def send(channel, content=None, embed=None, priority=None):
+        calls.append(("send", embed))
+        return f"message {len(calls)}"
+
+    async def pin(message, priority=None):
+        calls.append(("pin", message))
+
+    async def edit(message, embed, priority=None):
+        calls.append(("edit", embed))
+        return message
+
+    channel = type("Channel", (), {"id": "1", "name": "serie-a-matchday-1"})
+    monkeypatch.setattr(messageQueue, "send", send)
+    monkeypatch.setattr(messageQueue, "pin", pin)
+    monkeypatch.setattr(messageQueue, "edit", edit)
+    monkeypatch.setattr(GuildRouting, "channels", lambda competition, name: [channel])
+    monkeypatch.setattr(Scoreboards, "enabled", True)
+    monkeypatch.setattr(Scoreboards, "debounce", 0.05)
+    yield calls
+    for channelName in list(Scoreboards.boards.keys()):
+        Scoreboards.remove(channelName)
+
+
+@pytest.mark.asyncio
+async def testScoreboardDebounce(event_loop, discord):
+    first = FakeLiveMatch(1, "**A** 1 : 0 **B**")
+    second = FakeLiveMatch(2, "**C** 0 : 0 **D**")
+    first.goalList = ["12' Goal A"]
+    first.pollingState.phase = MatchPhase.live
+
+    Scoreboards.touch(first)
+    Scoreboards.touch(second)
+    Scoreboards.touch(first)
+    assert discord == []
+    await asyncio.sleep(0.2)
+    assert [i[0] for i in discord] == ["send", "pin"]
+    fields = discord[0][1].to_dict()["fields"]
+    assert [i["name"] for i in fields] == ["**A** 1 : 0 **B**", "**C** 0 : 0 **D**"]
+    assert fields[0]["value"] == "_Live_\n12' Goal A"
+    assert fields[1]["value"] == "No goals yet"
+
+    # several goals within the debounce time lead to one edit
+    for i in range(3):
+        first.goalList.append(f"{20 + i}' Goal A")
+        Scoreboards.touch(first)
+    await asyncio.sleep(0.2)
+    assert [i[0] for i in discord] == ["send", "pin", "edit"]
+    assert discord[2][1].to_dict()["fields"][0]["value"].endswith("22' Goal A")
+    assert Scoreboards.statistics()['edits'] == 1
+
+
+@pytest.mark.asyncio
+async def testScoreboardDeletedMessage(event_loop, discord, monkeypatch):
+    async def edit(message, embed, priority=None):
+        raise NotFound(FakeResponse(), "Unknown Message")
+
+    Scoreboards.touch(FakeLiveMatch(1, "**A** 0 : 0 **B**"))
+    await asyncio.sleep(0.2)
+    monkeypatch.setattr(messageQueue, "edit", edit)
+    Scoreboards.touch(FakeLiveMatch(1, "**A** 1 : 0 **B**"))
+    await asyncio.sleep(0.3)
+    # the deleted message is sent again
+    assert [i[0] for i in discord] == ["send", "pin", "send", "pin"]
+
+
+@pytest.mark.asyncio
+async def testScoreboardDisabled(event_loop, discord, monkeypatch):
+    monkeypatch.setattr(Scoreboards, "enabled", False)
+    Scoreboards.touch(FakeLiveMatch(1, "**A** 0 : 0 **B**"))
+    await asyncio.sleep(0.2)
+    assert discord == []
+    assert Scoreboards.boards == {}
+
+
+@pytest.mark.django_db
+def testScoreboardsSetting(monkeypatch):
+    monkeypatch.setattr(Scoreboards, "enabled", False)
+    Scoreboards.load()
+    assert not Scoreboards.enabled
+    Scoreboards.save(True)
+    # saving doesn't touch the state of the event loop
+    assert not Scoreboards.enabled
+    Scoreboards.load()
+    assert Scoreboards.enabled
+    Scoreboards.save(False)
+    Scoreboards.load()
+    assert not Scoreboards.enabled
+
+
+@pytest.mark.asyncio
+async def testScoreboardsApply(event_loop, discord):
+    Scoreboards.touch(FakeLiveMatch(1, "**A** 0 : 0 **B**"))
+    assert list(Scoreboards.boards.keys()) == ["serie-a-matchday-1"]
+    Scoreboards.apply(False)
+    await asyncio.sleep(0.2)
+    # the pending update was cancelled
+    assert discord == []
+    assert Scoreboards.boards == {}
+    assert not Scoreboards.enabled
@@ -0,0 +1,71 @@
+import json
+import os
+
+from discord_handler.templates import Template, TemplateSheet
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def testTemplateCompile():
+    template = Template(":GoalScored:  **$minute$**:**GOAL**! $player$ (**$team$**)", {"GoalScored": "<:gs:1>"})
+    assert template.slotNames() == ["minute", "player", "team"]
+    assert template.parts[0] == "<:gs:1>  **"
+    assert template.render(minute="12'", player="MÜLLER", team="Bayern") == \
+        "<:gs:1>  **12'**:**GOAL**! MÜLLER (**Bayern**)"
+
+    # unknown emojis are removed, missing values are empty
+    template = Template(":sub: $player$ :Subin: , $playerTo$ :Subout: ", {"Subin": "<:in:2>"})
+    assert template.render(player="A", playerTo=None) == " A <:in:2> ,   "
+
+    assert Template("").render() == ""
+    assert Template("$a$$b$").render(a=1, b=2) == "12"
+
+
+def testTemplateSheetReload(tmpdir):
+    fileName = str(tmpdir.join("sheet.json"))
+    with open(fileName, "w") as f:
+        f.write(json.dumps({"title": "**$homeTeam$** $tally$ **$awayTeam$**"}))
+
+    clock = FakeClock()
+    sheet = TemplateSheet(fileName, checkInterval=5, clock=clock)
+    try:
+        assert sheet.render("title", homeTeam="A", awayTeam="B", tally="1 : 0") == "**A** 1 : 0 **B**"
+        assert sheet.render("unknown") == ""
+
+        with open(fileName, "w") as f:
+            f.write(json.dumps({"title": "$homeTeam$ - $awayTeam$"}))
+        os.utime(fileName, (sheet.mtime + 10, sheet.mtime + 10))
+
+        # the file is only checked after checkInterval
+        assert sheet.render("title", homeTeam="A", awayTeam="B") == "**A**  **B**"
+        clock.now = 6
+        assert sheet.render("title", homeTeam="A", awayTeam="B") == "A - B"
+    finally:
+        TemplateSheet.sheets.remove(sheet)
+
+
+def testTemplateSheetEmojis(tmpdir):
+    fileName = str(tmpdir.join("sheet.json"))
+    with open(fileName, "w") as f:
+        f.write(json.dumps({"Goal": ":GoalScored: $player$"}))
+
+    sheet = TemplateSheet(fileName)
+    emojis = TemplateSheet.emojis
+    try:
+        assert sheet.render("Goal", player="A") == " A"
+        TemplateSheet.updateEmojis({"GoalScored": "<:GoalScored:1>"})
+        assert sheet.render("Goal", player="A") == "<:GoalScored:1> A"
+    finally:
+        TemplateSheet.sheets.remove(sheet)
+        TemplateSheet.updateEmojis(emojis)
+
+
+def testTemplateSpecialCharacters():
+    template = Template('{"$1$"} \'$class$\' \\n $player$ $player$', {})
+    assert template.render(player="A", **{"1": 2, "class": "B"}) == '{"2"} \'B\' \\n A A'